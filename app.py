@@ -28,13 +28,14 @@ server_config.debug_api_enabled = True
 server_config.debug_ui_enabled = True
 server_config.voice_speed = 1
 runtime_config.initial_activity_level = 1
+emf_sequence_upload = False  # Only for meter firmware that implements COMMAND_PLAY_SEQUENCE
 ###### Configuration ends here
 
 ###### Initialize HAL
 mic = get_microphone()
 disp = get_display()
 spk = get_audio()
-emf = get_emf_driver()
+emf = get_emf_driver(sequence_upload=emf_sequence_upload)
 
 disp.begin()
 
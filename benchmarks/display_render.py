@@ -0,0 +1,90 @@
+"""Benchmark for DisplayRenderer frame composition.
+
+Renders sweep, scrolling text, idle and glitch frames with the original
+draw-everything-per-frame renderer and with the cached-tile renderer, and reports the
+per-frame cost plus the largest pixel difference between the two.
+Run from the repository root: python -m benchmarks.display_render
+"""
+import time
+import random
+import types
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from ghostsnstuff_spiritbox_fw.hal.display import DisplayRenderer, FONT_PATH, GLITCH_CHARACTERS, icons
+
+FRAMES = 451
+
+
+class LegacyRenderer:
+    # The original DisplayRenderer.render, kept here as the reference
+    def __init__(self):
+        self.font = ImageFont.truetype(FONT_PATH, 30)
+        self.icons = {name: (icons[name], icons[f"{name}_disabled"]) for name in ("mic", "response", "no_response", "thinking")}
+
+    def render(self, display):
+        imgbuf = Image.new('RGB', (160, 80), color=(248, 133, 18))
+        draw = ImageDraw.Draw(imgbuf)
+        if display._glitch_enabled:
+            mic, no_response, response, thinking = (bool(random.getrandbits(1)) for _ in range(4))
+            self._draw_icons(imgbuf, mic, thinking, no_response, response)
+            text = "".join([random.choice(GLITCH_CHARACTERS) for _ in range(6)])
+            draw.text((3, 45), text, (0, 0, 0), self.font)
+        elif display._text:
+            draw.text((3, 45), display._text[:6], (0, 0, 0), self.font)
+        elif display._sweep_enabled:
+            frequency = display._sweep_value
+            freq_text = f"{frequency:.1f} FM" if frequency >= 100 else f"    {frequency:.1f} FM"
+            draw.text((3, 45), freq_text, (0, 0, 0), self.font)
+        if not display._glitch_enabled:
+            self._draw_icons(imgbuf, display._mic_active, display._thinking_active, display._no_response_active, display._response_active)
+        return imgbuf
+
+    def _draw_icons(self, imgbuf, mic_active, thinking_active, no_response_active, response_active):
+        positions = [(3, 3), (32, 3), (72, 3), (112, 3)]
+        for pos, icon, active in zip(positions, ["mic", "thinking", "no_response", "response"], [mic_active, thinking_active, no_response_active, response_active]):
+            imgbuf.paste(self.icons[icon][0] if active else self.icons[icon][1], pos)
+
+
+def make_state(**overrides):
+    state = dict(
+        _glitch_enabled=False, _text=None, _text_ticks=0, _text_duration=None, _sweep_enabled=False,
+        _sweep_value=63.0, _mic_active=False, _thinking_active=False, _no_response_active=False, _response_active=False
+    )
+    state.update(overrides)
+    return types.SimpleNamespace(**state)
+
+
+def scenarios():
+    yield "sweep", [make_state(_sweep_enabled=True, _sweep_value=round(63 + i / 10, 1), _mic_active=i % 40 < 20) for i in range(FRAMES)]
+    yield "static text", [make_state(_text="HELLO", _text_ticks=i) for i in range(FRAMES)]
+    yield "idle", [make_state() for _ in range(FRAMES)]
+    yield "glitch", [make_state(_glitch_enabled=True) for _ in range(FRAMES)]
+
+
+def run(renderer, states, seed=0):
+    random.seed(seed)
+    frames = []
+    start = time.perf_counter()
+    for state in states:
+        frames.append(np.asarray(renderer.render(state)).copy())
+    return (time.perf_counter() - start) / len(states), frames
+
+
+def main():
+    start = time.perf_counter()
+    cached = DisplayRenderer()
+    print(f"DisplayRenderer setup (glyph atlas + sweep strips): {(time.perf_counter() - start) * 1000:.0f} ms")
+    legacy = LegacyRenderer()
+
+    for name, states in scenarios():
+        legacy_time, legacy_frames = run(legacy, states)
+        cached_time, cached_frames = run(cached, states)
+        difference = max(int(np.abs(a.astype(int) - b.astype(int)).max()) for a, b in zip(legacy_frames, cached_frames))
+        print(
+            f"{name:12s}: legacy {legacy_time * 1e6:7.0f} us/frame, cached {cached_time * 1e6:7.0f} us/frame "
+            f"({legacy_time / cached_time:5.1f}x), max pixel difference {difference}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark for EMF command delivery over BLE.
+
+Replays the command pattern of a lost game (a burst of glitches) and a run of turns with
+activity updates against the fake gatt device, once with the original driver that writes
+on the caller's thread and waits for the acknowledgement, and once with the queued
+driver. Reports how long the game loop was blocked, the end-to-end write latency and
+how many commands the meter actually received, and checks the meter ends up in the
+same state.
+Run from the repository root: python -m benchmarks.emf_queue
+"""
+import time
+import random
+import threading
+from ghostsnstuff_spiritbox_fw.hal.emf import BluetoothEMFDriver, COMMAND_SET_ACTIVITY, COMMAND_GLITCH
+from ghostsnstuff_spiritbox_fw.debug.fake_gatt import FakeEMFDevice
+
+
+class LegacyEMFDriver:
+    # The original BluetoothEMFDriver: every command is written on the caller's thread
+    def __init__(self, device):
+        self.device = device
+        self._done = threading.Event()
+        device.connect_callback = lambda: None
+        device.write_callback = lambda error: self._done.set()
+        device.connect()
+
+    def _write_buffer(self, data):
+        self._done.clear()
+        self.device.write_command(bytes(data), False)
+        self._done.wait()
+        return True
+
+    def set_activity(self, level):
+        return self._write_buffer([COMMAND_SET_ACTIVITY, level])
+
+    def glitch(self):
+        return self._write_buffer([COMMAND_GLITCH])
+
+
+def game_lost(emf):
+    random.seed(0)
+    emf.set_activity(6)
+    for _ in range(30):
+        emf.glitch()
+        time.sleep(random.uniform(0.005, 0.015))
+    emf.set_activity(0)
+
+
+def turns(emf):
+    # Activity bounces around while the loop also reacts to the player, faster than the link
+    random.seed(1)
+    for _ in range(40):
+        emf.set_activity(random.randint(1, 5))
+        time.sleep(random.uniform(0.0, 0.01))
+    emf.set_activity(3)
+
+
+def run(scenario, queued: bool, supports_write_without_response: bool):
+    device = FakeEMFDevice(supports_write_without_response=supports_write_without_response)
+    if queued:
+        emf = BluetoothEMFDriver(device=device)
+        while not emf.is_connected():
+            time.sleep(0.01)
+        emf.flush(timeout=1.0)
+        device.writes.clear()
+    else:
+        emf = LegacyEMFDriver(device)
+
+    start = time.perf_counter()
+    blocked = 0.0
+    for name in ("set_activity", "glitch"):
+        method = getattr(emf, name)
+
+        def timed(*args, method=method):
+            nonlocal blocked
+            call_start = time.perf_counter()
+            result = method(*args)
+            blocked += time.perf_counter() - call_start
+            return result
+        setattr(emf, name, timed)
+    scenario(emf)
+    loop_time = time.perf_counter() - start
+    if queued:
+        emf.flush(timeout=5.0)
+        stats = emf.get_stats()
+        emf.close()
+        latency = f"write {stats['write_latency_mean_ms']:5.1f} ms + queue {stats['queue_wait_mean_ms']:5.1f} ms"
+    else:
+        latency = f"write {device.write_request_latency * 1000:5.1f} ms + queue   0.0 ms"
+    return loop_time, blocked, latency, len(device.writes), device.activity
+
+
+def main():
+    for scenario in (game_lost, turns):
+        for name, queued, without_response in (("legacy", False, False), ("queued", True, False), ("queued wwr", True, True)):
+            loop_time, blocked, latency, writes, activity = run(scenario, queued, without_response)
+            print(
+                f"{scenario.__name__:10s} {name:11s}: loop {loop_time * 1000:6.0f} ms, blocked {blocked * 1000:6.1f} ms, "
+                f"{latency}, {writes:3d} writes, final activity {activity}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark for EMF choreography timing.
+
+Plays the lost-game glitch burst and the won-game activity ramp on the fake gatt device,
+once step by step from the host (one write per step, timed with time.sleep) and once
+uploaded as a single sequence that the simulated meter decodes and runs on its own
+timer. Reports the radio writes needed and how far each step landed from its intended
+time, after checking that the meter performed exactly the intended steps.
+Run from the repository root: python -m benchmarks.emf_sequence
+"""
+import time
+import random
+import numpy as np
+from ghostsnstuff_spiritbox_fw.hal.emf import BluetoothEMFDriver, EMFSequence
+from ghostsnstuff_spiritbox_fw.debug.fake_gatt import FakeEMFDevice
+
+
+def game_lost() -> EMFSequence:
+    random.seed(0)
+    sequence = EMFSequence()
+    for _ in range(30):
+        sequence.glitch().wait(random.uniform(0.05, 0.15))
+    return sequence.wait(0.5).activity(0)
+
+
+def game_won() -> EMFSequence:
+    random.seed(1)
+    sequence = EMFSequence().activity(6).wait(0.5)
+    for i in range(5):
+        sequence.activity(5 - i).wait(random.uniform(0.07, 0.1))
+    return sequence.wait(0.2).activity(0)
+
+
+def run(sequence: EMFSequence, upload: bool):
+    # Write requests: the host pays a full round trip for every step it sends itself
+    device = FakeEMFDevice(supports_write_without_response=False)
+    emf = BluetoothEMFDriver(device=device, sequence_upload=upload)
+    while not emf.is_connected():
+        time.sleep(0.01)
+    emf.flush(timeout=1.0)
+    device.writes.clear()
+    device.events.clear()
+
+    start = time.monotonic()
+    emf.play_sequence(sequence)
+    time.sleep(sequence.duration + 0.5)
+    emf.flush(timeout=5.0)
+    emf.close()
+
+    performed = [(command, value) for _, command, value in device.events]
+    expected = [(command, value) for command, value, _ in sequence.steps]
+    assert performed == expected, "meter did not perform the intended steps"
+    assert not device.malformed_sequences
+
+    intended = np.cumsum([delay for _, _, delay in sequence.steps])
+    actual = np.array([timestamp for timestamp, _, _ in device.events]) - start
+    # The offset of the first step is the transport latency, the rest is timing drift
+    drift = (actual - actual[0]) - (intended - intended[0])
+    return len(device.writes), (actual[0] - intended[0]) * 1000, np.abs(drift).max() * 1000, drift[-1] * 1000
+
+
+def main():
+    for scenario in (game_lost, game_won):
+        sequence = scenario()
+        print(f"{scenario.__name__}: {len(sequence.steps)} steps over {sequence.duration:.2f}s, {len(sequence.encode())} byte upload")
+        for name, upload in (("step by step", False), ("uploaded", True)):
+            writes, first_ms, max_drift_ms, end_drift_ms = run(sequence, upload)
+            print(
+                f"  {name:12s}: {writes:3d} writes, first step after {first_ms:5.1f} ms, "
+                f"max drift {max_drift_ms:5.1f} ms, last step drift {end_drift_ms:5.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
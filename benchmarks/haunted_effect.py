@@ -0,0 +1,65 @@
+"""Before/after benchmark for the ghost voice effect.
+
+Run from the repository root: python -m benchmarks.haunted_effect
+"""
+import time
+import numpy as np
+from ghostsnstuff_spiritbox_fw.utils import (
+    bit_reduction, sample_rate_reduction, bandpass_filter,
+    amplitude_modulation, add_noise, random_dropouts, haunted_effect
+)
+
+SAMPLE_RATE = 16000
+DURATIONS = [0.5, 1.5, 5.0]
+ITERATIONS = 20
+
+
+def legacy_haunted_effect(audio, sample_rate):
+    # The original six-pass chain, kept here as the reference implementation
+    audio = bit_reduction(audio, bit_depth=5, mix=0.8)
+    audio = sample_rate_reduction(audio, sample_rate, 8000, mix=0.8)
+    audio = bandpass_filter(audio, 300, 3000, sample_rate)
+    audio = amplitude_modulation(audio, sample_rate, mod_freq=2, depth=0.2)
+    audio = add_noise(audio, noise_level=0.00001)
+    audio = random_dropouts(audio, dropout_rate=0.2, dropout_length=0.05, sample_rate=sample_rate)
+    return np.clip(audio, -1.0, 1.0)
+
+
+def make_speech_like(duration: float) -> np.ndarray:
+    # Odd, FFT-unfriendly lengths like the ones TTS responses actually have
+    t = np.arange(int(duration * SAMPLE_RATE) + 7) / SAMPLE_RATE
+    voice = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate([180, 360, 720, 1400, 2600]))
+    syllables = 0.5 * (1 + np.sin(2 * np.pi * 4 * t))
+    return (0.3 * voice * syllables).astype(np.float32)
+
+
+def measure(fn, audio) -> float:
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn(audio, SAMPLE_RATE)
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+def main():
+    for duration in DURATIONS:
+        audio = make_speech_like(duration)
+        haunted_effect(audio, SAMPLE_RATE)  # warm the per-rate cache
+
+        legacy_ms = measure(legacy_haunted_effect, audio)
+        fused_ms = measure(haunted_effect, audio)
+
+        # Only the dropouts and the -100 dB noise floor are random, so the outputs should track closely
+        np.random.seed(0)
+        reference = legacy_haunted_effect(audio, SAMPLE_RATE)
+        np.random.seed(0)
+        fused = haunted_effect(audio, SAMPLE_RATE)
+        correlation = np.corrcoef(reference, fused)[0, 1]
+
+        print(
+            f"{duration:4.1f}s buffer: legacy {legacy_ms:7.2f} ms, fused {fused_ms:7.2f} ms "
+            f"({legacy_ms / fused_ms:4.1f}x), output correlation {correlation:.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Benchmark for the display pipeline on a machine without a screen.
+
+Runs HeadlessDisplay through a sweep, a few hint texts and a glitch burst, like a game
+turn, then reads the frame log back and reports render cost, frame intervals and the
+latency from set_text to the first frame showing the text.
+Run from the repository root: python -m benchmarks.headless_display
+"""
+import time
+import tempfile
+import numpy as np
+from pathlib import Path
+from ghostsnstuff_spiritbox_fw.hal.display import HeadlessDisplay, read_frame_log
+
+HINTS = ["HELLO", "THE ANSWER IS IN THE BASEMENT", "GO AWAY"]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = Path(directory) / "frames.log"
+        display = HeadlessDisplay(framebuffer_path=Path(directory) / "framebuffer.raw", frame_log_path=log_path)
+        display.enable_sweep(True)
+        display.begin()
+        time.sleep(1)
+
+        latencies = []
+        for hint in HINTS:
+            requested = time.monotonic()
+            display.set_text(hint, duration=2.0)
+            shown = display.wait_for_text(hint, timeout=1.0)
+            latencies.append((shown - requested) * 1000 if shown else float("nan"))
+            time.sleep(2.5)
+
+        display.enable_glitch(True)
+        time.sleep(1)
+        display.enable_glitch(False)
+        time.sleep(0.5)
+        display.close()
+
+        frames = list(read_frame_log(log_path))
+        timestamps = np.array([timestamp for timestamp, _, _, _ in frames])
+        render_times = np.array([render_time for _, render_time, _, _ in frames]) * 1000
+        intervals = np.diff(timestamps) * 1000
+        stats = display.get_frame_stats()
+        print(f"Frames rendered {stats['frames']}, recorded {len(frames)} ({log_path.stat().st_size / 1024:.0f} KB log)")
+        print(f"Render time of recorded frames: mean {render_times.mean():.2f} ms, p99 {np.percentile(render_times, 99):.2f} ms")
+        print(f"Interval between recorded frames: median {np.median(intervals):.1f} ms, max {intervals.max():.1f} ms")
+        print(f"Missed deadlines {stats['missed_deadlines']}, dropped frames {stats['dropped_frames']}")
+        print("set_text to text on screen: " + ", ".join(f"{latency:.1f} ms" for latency in latencies))
+
+
+if __name__ == "__main__":
+    main()
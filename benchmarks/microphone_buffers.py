@@ -0,0 +1,60 @@
+"""Benchmark for the per-frame buffering work done on the microphone audio thread.
+
+Simulates a long utterance frame by frame and compares the original deque + np.append
+path with the preallocated HistoryBuffer/GrowableBuffer path.
+Run from the repository root: python -m benchmarks.microphone_buffers
+"""
+import collections
+import time
+import numpy as np
+from ghostsnstuff_spiritbox_fw.hal.buffers import HistoryBuffer, GrowableBuffer
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 480  # 30 ms
+PREROLL_SAMPLES = SAMPLE_RATE
+UTTERANCE_SECONDS = [10, 60, 120]
+
+
+def legacy_capture(frames):
+    # The original _mic_callback/_detect_vad buffering, kept here as the reference
+    circular_buffer = collections.deque(maxlen=PREROLL_SAMPLES)
+    result = np.array([], dtype=np.int16)
+    frame_times = []
+    for frame in frames:
+        start = time.perf_counter()
+        circular_buffer.extend(frame)
+        result = np.append(result, frame)
+        np.array(circular_buffer)[-FRAME_SIZE:].tobytes()
+        frame_times.append(time.perf_counter() - start)
+    return frame_times
+
+
+def preallocated_capture(frames):
+    history = HistoryBuffer(PREROLL_SAMPLES)
+    result = GrowableBuffer(30 * SAMPLE_RATE)
+    frame_times = []
+    for frame in frames:
+        start = time.perf_counter()
+        history.append(frame)
+        result.append(frame)
+        history.latest(FRAME_SIZE).tobytes()
+        frame_times.append(time.perf_counter() - start)
+    return frame_times
+
+
+def main():
+    rng = np.random.default_rng(0)
+    for seconds in UTTERANCE_SECONDS:
+        frame_count = seconds * SAMPLE_RATE // FRAME_SIZE
+        frames = [rng.integers(-3000, 3000, FRAME_SIZE, dtype=np.int16) for _ in range(frame_count)]
+        for name, capture in (("legacy", legacy_capture), ("preallocated", preallocated_capture)):
+            frame_times = np.array(capture(frames)) * 1e6
+            print(
+                f"{seconds:4d}s utterance, {name:12s}: total {frame_times.sum() / 1000:8.1f} ms, "
+                f"first 100 frames {frame_times[:100].mean():7.1f} us/frame, "
+                f"last 100 frames {frame_times[-100:].mean():7.1f} us/frame"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark for converting TTS buffers into mixer-ready PCM.
+
+Compares the original FFT resample + column_stack path with PlaybackConverter, both
+resampling to the 44.1 kHz mixer rate and with the mixer opened at the TTS rate.
+Run from the repository root: python -m benchmarks.playback
+"""
+import time
+import tracemalloc
+import numpy as np
+from scipy.signal import resample
+from ghostsnstuff_spiritbox_fw.hal.speaker import PlaybackConverter, DEFAULT_MIXER_SAMPLE_RATE
+
+TTS_SAMPLE_RATE = 16000
+DURATIONS = [1.0, 3.0, 8.0]
+ITERATIONS = 10
+
+
+def legacy_normalize_buffer(buffer, sample_rate, mixer_rate=DEFAULT_MIXER_SAMPLE_RATE):
+    # The original AudioDriver.normalize_buffer, kept here as the reference implementation
+    if sample_rate != mixer_rate:
+        num_samples = round(len(buffer) * mixer_rate / sample_rate)
+        buffer = resample(buffer, num_samples)
+    max_val = np.max(np.abs(buffer))
+    if max_val > 0:
+        buffer = (buffer / max_val * 32767).astype(np.int16)
+    return np.column_stack((buffer, buffer))
+
+
+def measure(fn, buffer):
+    fn(buffer)  # warm up caches and the preallocated buffer
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn(buffer)
+    elapsed_ms = (time.perf_counter() - start) / ITERATIONS * 1000
+
+    tracemalloc.start()
+    fn(buffer)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_ms, peak / 1024
+
+
+def main():
+    resampling = PlaybackConverter(DEFAULT_MIXER_SAMPLE_RATE, enable_stereo=True)
+    native = PlaybackConverter(TTS_SAMPLE_RATE, enable_stereo=True)
+    cases = [
+        ("legacy 44.1k", lambda b: legacy_normalize_buffer(b, TTS_SAMPLE_RATE)),
+        ("polyphase 44.1k", lambda b: resampling.convert(b, TTS_SAMPLE_RATE)),
+        ("native 16k", lambda b: native.convert(b, TTS_SAMPLE_RATE)),
+    ]
+
+    for duration in DURATIONS:
+        # Odd, FFT-unfriendly lengths like the ones TTS responses actually have
+        buffer = (np.random.default_rng(0).standard_normal(int(duration * TTS_SAMPLE_RATE) + 7) * 0.1).astype(np.float32)
+        for name, fn in cases:
+            elapsed_ms, peak_kib = measure(fn, buffer)
+            print(f"{duration:4.1f}s {name:16s} {elapsed_ms:8.2f} ms  peak {peak_kib:9.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Benchmark for how much of each agent request a provider-side prompt cache can reuse.
+
+Plays a scripted game through GameRuntime with a stand-in client that records every
+request, once with the original user prompt layout (game state and timer first, then a
+transcript that re-marks the latest user message) and once with the current layout. For
+each request it finds the prefix shared with the same agent's previous request and
+counts it the way OpenAI prompt caching does: nothing below 1024 tokens, then in 128
+token blocks. Tokens are estimated at 4 characters each.
+Run from the repository root: python -m benchmarks.prompt_prefix
+"""
+import types
+import random
+from pathlib import Path
+from jinja2 import Template
+from ghostsnstuff_spiritbox_fw import agents, runtime as runtime_module
+from ghostsnstuff_spiritbox_fw.runtime import GameRuntime, RuntimeConfig
+from ghostsnstuff_spiritbox_fw.scenario import load_scenario
+from ghostsnstuff_spiritbox_fw.events import EventTimeline
+from ghostsnstuff_spiritbox_fw.models.ghost import GhostResponse
+
+SCENARIO = Path("scenarios/scenario_1.json")
+QUERIES = [
+    "Is anybody here?", "What is your name?", "How did you die?", "Where should we look?",
+    "Is it in the basement?", "Give us a sign", "Why are you still here?", "What do you want from us?",
+    "Can you spell it out?", "We found a key, what now?", "Say that again", "Are you angry?",
+]
+TURNS = [12, 48]
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+
+# The original user prompts, kept here as the reference
+LEGACY_CURATOR_USER_PROMPT = """
+### **Current Game State**:
+- **Activity Level**: {{ game_state.activity_level }}
+- **Timer**: {% if game_state.get_remaining_time() == -1 %}N/A{% else %}{{ game_state.get_remaining_time() }} seconds remaining{% endif %}
+- **Curator Notes**:
+  - **Primary Ghost**: {{ curator_notes.primary_ghost_note }}
+  - **Secondary Ghost**: {{ curator_notes.secondary_ghost_note }}
+- **Transcript**:
+```
+{{ transcript }}
+```
+- **Ghost that is about to speak in this turn**: {{ ghost_turn }}
+- **User question**: {{ query }}
+"""
+
+LEGACY_GHOST_USER_PROMPT = """
+### **Current Game State**:
+- **Activity Level**: {{ game_state.activity_level }}
+- **Timer**: {% if game_state.get_remaining_time() == -1 %}N/A{% else %}{{ game_state.get_remaining_time() }} seconds remaining{% endif %}
+- **Curator Note**: {{ curator_note }}
+- **Transcript**:
+```
+{{ transcript }}
+```
+- **User question**: {{ query }}
+"""
+
+
+def legacy_transcript(conv) -> str:
+    """The original transcript rendering, which marks the latest user message in place."""
+    buffer = []
+    user_message_found = False
+    for message in reversed(conv.history):
+        if message.role == "user" and not user_message_found:
+            buffer.append(f"(current interaction) >> {message.role}: {message.content}")
+            user_message_found = True
+        else:
+            buffer.append(f"{message.role}: {message.content}")
+    return "\n".join(reversed(buffer))
+
+
+class LegacyCurator(agents.Curator):
+    def ask(self, state, conv, notes, query, ghost_turn):
+        prompt = Template(LEGACY_CURATOR_USER_PROMPT).render(
+            game_state=state, transcript=legacy_transcript(conv), curator_notes=notes, ghost_turn=ghost_turn, query=query
+        )
+        return self.agent.ask(prompt)
+
+
+class LegacyGhost(agents.Ghost):
+    def ask(self, state, conv, note, query):
+        prompt = Template(LEGACY_GHOST_USER_PROMPT).render(
+            game_state=state, transcript=legacy_transcript(conv), curator_note=note or "N/A", query=query
+        )
+        return self.agent.ask(prompt)
+
+
+class RecordingCompletions:
+    """Stands in for client.beta.chat.completions and answers with a fixed ghost line."""
+
+    def __init__(self):
+        self.requests = []
+
+    def parse(self, messages, model, temperature, response_format):
+        self.requests.append((messages[0]["content"], messages[0]["content"] + messages[1]["content"]))
+        if response_format is GhostResponse:
+            parsed = response_format.model_construct(reasoning="", glitch=False, content="follow my voice")
+        else:
+            fields = {name: None for name in response_format.model_fields}
+            fields.update(action_reasoning="", state_reasoning="")
+            parsed = response_format.model_construct(**fields)
+        usage = types.SimpleNamespace(prompt_tokens=0, completion_tokens=0, prompt_tokens_details=None)
+        message = types.SimpleNamespace(parsed=parsed)
+        return types.SimpleNamespace(usage=usage, choices=[types.SimpleNamespace(message=message)])
+
+
+def cacheable_tokens(prompt: str, previous: str | None) -> int:
+    if previous is None:
+        return 0
+    shared = 0
+    for a, b in zip(prompt, previous):
+        if a != b:
+            break
+        shared += 1
+    tokens = shared // 4
+    return 0 if tokens < CACHE_MIN_TOKENS else tokens // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS
+
+
+def run(legacy: bool, turns: int):
+    completions = RecordingCompletions()
+    client = types.SimpleNamespace(beta=types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions)))
+    config = RuntimeConfig()
+    config.initial_activity_level = 7
+    random.seed(0)  # The same ghosts answer in both layouts
+    if legacy:
+        runtime_module.Curator, runtime_module.Ghost = LegacyCurator, LegacyGhost
+    try:
+        runtime = GameRuntime(client, load_scenario(SCENARIO), config, EventTimeline())
+    finally:
+        runtime_module.Curator, runtime_module.Ghost = agents.Curator, agents.Ghost
+    for turn in range(turns):
+        runtime.execute(QUERIES[turn % len(QUERIES)])
+
+    # Requests of the same agent share a system prompt, the previous one is what the cache holds
+    previous = {}
+    prompt_tokens = cached_tokens = 0
+    for system_prompt, prompt in completions.requests:
+        cached_tokens += cacheable_tokens(prompt, previous.get(system_prompt))
+        prompt_tokens += len(prompt) // 4
+        previous[system_prompt] = prompt
+    return len(completions.requests), prompt_tokens, cached_tokens
+
+
+def main():
+    for turns in TURNS:
+        for name, legacy in (("legacy layout", True), ("stable prefix", False)):
+            requests, prompt_tokens, cached_tokens = run(legacy, turns)
+            print(
+                f"{turns:3d} turns, {name:14s}: {requests:3d} requests, ~{prompt_tokens} prompt tokens, "
+                f"~{cached_tokens} cacheable ({cached_tokens / prompt_tokens:.0%}), ~{prompt_tokens - cached_tokens} billed in full"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark for the latency from a TTS request to the ghost becoming audible.
+
+Streams a few lines from the fake TTS server into an AudioDriver running on the
+capturing backend, and compares when the first sound starts playing with the original
+wait-for-the-whole-response-then-play_buffer path. Times come from the captured
+segments, so they are what the mixer would have played, not when the calls returned.
+Run from the repository root: python -m benchmarks.speech_latency
+"""
+import time
+import numpy as np
+from openai import OpenAI
+from ghostsnstuff_spiritbox_fw.speech import TTSClient
+from ghostsnstuff_spiritbox_fw.hal.speaker import AudioDriver, CaptureBackend
+from ghostsnstuff_spiritbox_fw.debug.fake_tts import FakeTTSServer
+
+TTS_SAMPLE_RATE = 24000
+LINES = ["Hello.", "Who is there?", "The answer is hidden somewhere in the basement, go and look."]
+VOICE = "onyx"
+
+
+def first_audible(backend: CaptureBackend, requested: float) -> float:
+    segments = [segment for segment in backend.get_segments() if segment.start >= requested]
+    return min(segment.start for segment in segments) - requested
+
+
+def run(tts: TTSClient, streaming: bool):
+    backend = CaptureBackend(realtime=True)
+    driver = AudioDriver(backend=backend)
+    latencies = []
+    for line in LINES:
+        requested = backend.now()
+        if streaming:
+            stream = driver.open_stream(TTS_SAMPLE_RATE)
+            for chunk in tts.synthesize_stream(line, VOICE):
+                stream.write(chunk)
+            stream.close()
+            stream.wait()
+        else:
+            # The original path: the whole response is downloaded before anything plays
+            buffer = np.concatenate(list(tts.synthesize_stream(line, VOICE)))
+            driver.play_buffer(buffer, TTS_SAMPLE_RATE)
+        latencies.append(first_audible(backend, requested) * 1000)
+        time.sleep(max(0.0, max(segment.end for segment in backend.get_segments()) - backend.now()))
+    return latencies
+
+
+def main():
+    server = FakeTTSServer(sample_rate=TTS_SAMPLE_RATE, first_chunk_latency=0.3, realtime_factor=4.0)
+    server.start()
+    try:
+        tts = TTSClient(OpenAI(base_url=server.base_url, api_key="fake"))
+        for name, streaming in (("buffered", False), ("streaming", True)):
+            latencies = run(tts, streaming)
+            print(f"{name:10s}: request to first audio " + ", ".join(f"{latency:6.0f} ms" for latency in latencies))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark for SPI traffic of the ST7735 display driver.
+
+Drives ST7735Display against the fake panel through a few typical display states and
+compares bytes sent and conversion time with the original full-frame push, checking
+after every frame that the panel ends up showing the same picture.
+At 4 MHz the SPI bus moves 500 KB/s, so the byte counts translate directly into bus time.
+Run from the repository root: python -m benchmarks.st7735_updates
+"""
+import time
+import numpy as np
+from ghostsnstuff_spiritbox_fw.hal.display import ST7735Display, ST7735_SPI_SPEED_HZ
+from ghostsnstuff_spiritbox_fw.debug.fake_st7735 import FakeST7735
+
+FRAMES = 200
+
+
+def sweep(display, tick):
+    display._sweep_enabled = True
+    display._sweep_value = round(63 + (tick % 450) / 10, 1)
+    display._mic_active = tick % 60 < 30
+
+
+def idle(display, tick):
+    display._sweep_enabled = False
+    display.set_text(None)
+    display._thinking_active = True
+
+
+def static_text(display, tick):
+    if tick == 0:
+        display.set_text("HELLO")
+    display._text_ticks = tick
+
+
+def scrolling_text(display, tick):
+    if tick == 0:
+        display.set_text("THE ANSWER IS IN THE BASEMENT")
+    display._text_ticks = tick
+
+
+def glitch(display, tick):
+    display._glitch_enabled = True
+
+
+def run(scenario, partial: bool):
+    panel = FakeST7735()
+    display = ST7735Display(device=panel)
+    reference = FakeST7735()
+    # Glitch frames are random, so the reference is built from the very frame that was rendered
+    rendered = []
+    render = display.renderer.render
+    display.renderer.render = lambda state: rendered.append(render(state).copy()) or rendered[-1]
+
+    elapsed = 0.0
+    for tick in range(FRAMES):
+        scenario(display, tick)
+        start = time.perf_counter()
+        if partial:
+            display._render()
+        else:
+            # The original _render: every frame converted and pushed whole
+            panel.display(display.renderer.render(display))
+        elapsed += time.perf_counter() - start
+        reference.display(rendered[-1])
+        assert np.array_equal(panel.framebuffer, reference.framebuffer), f"{scenario.__name__}: panel differs at frame {tick}"
+    return panel.bytes_sent, elapsed / FRAMES
+
+
+def main():
+    bytes_per_second = ST7735_SPI_SPEED_HZ / 8
+    for scenario in (sweep, idle, static_text, scrolling_text, glitch):
+        full_bytes, full_time = run(scenario, partial=False)
+        partial_bytes, partial_time = run(scenario, partial=True)
+        print(
+            f"{scenario.__name__:15s}: full {full_bytes / FRAMES / 1024:5.1f} KB/frame "
+            f"({full_bytes / FRAMES / bytes_per_second * 1000:5.1f} ms SPI), "
+            f"partial {partial_bytes / FRAMES / 1024:5.1f} KB/frame "
+            f"({partial_bytes / FRAMES / bytes_per_second * 1000:5.1f} ms SPI), "
+            f"host {full_time * 1e6:6.0f} -> {partial_time * 1e6:6.0f} us/frame"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,43 @@ from .scenario import ScenarioDefinition
 from .conversation import Conversation
 from .prompts import CURATOR_SYSTEM_PROMPT, CURATOR_USER_PROMPT, WRITER_SYSTEM_PROMPT, WRITER_USER_PROMPT, GHOST_SYSTEM_PROMPT, GHOST_USER_PROMPT, MOCKUSER_SYSTEM_PROMPT, MOCKUSER_QUERY_PROMPT
 
+class TokenUsage:
+    """Token counts of one or more completions, as reported in the response usage.
+    cached_tokens is the part of prompt_tokens served from the provider's prompt cache."""
+
+    def __init__(self, prompt_tokens: int = 0, cached_tokens: int = 0, completion_tokens: int = 0, requests: int = 0) -> Self:
+        self.prompt_tokens = prompt_tokens
+        self.cached_tokens = cached_tokens
+        self.completion_tokens = completion_tokens
+        self.requests = requests
+
+    @staticmethod
+    def from_response(usage) -> "TokenUsage":
+        if usage is None:
+            return TokenUsage(requests=1)
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+        return TokenUsage(usage.prompt_tokens, cached_tokens, usage.completion_tokens, 1)
+
+    def add(self, other: "TokenUsage"):
+        self.prompt_tokens += other.prompt_tokens
+        self.cached_tokens += other.cached_tokens
+        self.completion_tokens += other.completion_tokens
+        self.requests += other.requests
+
+    @property
+    def cache_hit_ratio(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cache_hit_ratio": self.cache_hit_ratio
+        }
+
 class BaseAgent:
     def __init__(self, client: OpenAI, model: str, temperature: float, response_schema: BaseModel, prompt: str) -> Self:
         self.client = client
@@ -18,8 +55,12 @@ class BaseAgent:
         self.temperature = temperature
         self.schema = response_schema
         self.prompt = prompt
+        self.usage = TokenUsage()
+        self.last_usage = TokenUsage()
         
     def ask(self, question: str) -> BaseModel:
+        # The system prompt stays the same for the whole game and question is laid out stable
+        # parts first, so consecutive requests share a long prefix the provider can cache
         messages = [
             {"role": "system", "content": self.prompt},
             {"role": "user", "content": question}
@@ -31,7 +72,9 @@ class BaseAgent:
             temperature=self.temperature,
             response_format=self.schema
         )
-        
+
+        self.last_usage = TokenUsage.from_response(response.usage)
+        self.usage.add(self.last_usage)
         return response.choices[0].message.parsed
     
 class Curator:
@@ -52,7 +95,8 @@ class Curator:
     def ask(self, state: GameState, conv: Conversation, notes: CuratorNotes, query: str, ghost_turn: str) -> CuratorActionResponse:
         prompt = self.query_tpl.render(
             game_state=state,
-            transcript=str(conv),
+            transcript=conv.transcript(),
+            current_interaction=conv.current_interaction(),
             curator_notes=notes,
             ghost_turn=ghost_turn,
             query=query
@@ -111,7 +155,8 @@ class Ghost:
     def ask(self, state: GameState, conv: Conversation, note: str, query: str) -> GhostResponse:
         prompt = self.query_tpl.render(
             game_state=state,
-            transcript=str(conv),
+            transcript=conv.transcript(),
+            current_interaction=conv.current_interaction(),
             curator_note=note or "N/A",
             query=query
         )
@@ -12,17 +12,22 @@ class Conversation:
     def __init__(self, history: Optional[list[Message]] = None):
         self.history = history or []
 
-    def __str__(self):
-        buffer = []
-        user_message_found = False
-        for message in reversed(self.history):
-            if message.role == "user" and not user_message_found:
-                buffer.append(f"(current interaction) >> {message.role}: {message.content}")
-                user_message_found = True
-            else:
-                buffer.append(f"{message.role}: {message.content}")
-        return "\n".join(reversed(buffer))
-    
+    def _current_start(self) -> int:
+        # Index of the latest user message, where the interaction being answered begins
+        for index in range(len(self.history) - 1, -1, -1):
+            if self.history[index].role == "user":
+                return index
+        return len(self.history)
+
+    def transcript(self) -> str:
+        """Everything said before the current interaction. Earlier messages are never reworded,
+        so from one turn to the next this only grows and works as a cacheable prompt prefix."""
+        return "\n".join(f"{message.role}: {message.content}" for message in self.history[:self._current_start()])
+
+    def current_interaction(self) -> str:
+        """The latest user message and everything after it."""
+        return "\n".join(f"{message.role}: {message.content}" for message in self.history[self._current_start():])
+
     def push(self, message: Message):
         self.history.append(message)
 
@@ -35,6 +35,11 @@ class DebugAPI:
         self.app.post("/scenario/stop")(self.stop_scenario)
         self.app.post("/system/call")(self.execute_system_call)
         self.app.get("/events")(self.get_events)
+        self.app.get("/stats/tts_cache")(self.get_tts_cache_stats)
+        self.app.get("/stats/capture_gate")(self.get_capture_gate_stats)
+        self.app.get("/stats/display")(self.get_display_stats)
+        self.app.get("/stats/emf")(self.get_emf_stats)
+        self.app.get("/stats/token_usage")(self.get_token_usage_stats)
 
     def run(self):
         """Runs FastAPI in a background thread."""
@@ -112,3 +117,34 @@ class DebugAPI:
             return [event.to_dict() for event in timeline.list()[-150:]]
         else:
             raise HTTPException(status_code=404, detail="No events found")
+
+    def get_tts_cache_stats(self) -> Dict[str, int]:
+        stats = self.server.get_tts_cache_stats()
+        if stats is not None:
+            return stats
+        else:
+            raise HTTPException(status_code=404, detail="TTS cache is disabled")
+
+    def get_display_stats(self) -> Dict[str, Any]:
+        return self.server.get_display_stats()
+
+    def get_capture_gate_stats(self) -> Dict[str, int]:
+        stats = self.server.get_capture_gate_stats()
+        if stats is not None:
+            return stats
+        else:
+            raise HTTPException(status_code=404, detail="Capture gate is disabled")
+
+    def get_emf_stats(self) -> Dict[str, Any]:
+        stats = self.server.get_emf_stats()
+        if stats is not None:
+            return stats
+        else:
+            raise HTTPException(status_code=404, detail="Bluetooth EMF driver is not in use")
+
+    def get_token_usage_stats(self) -> Dict[str, Any]:
+        stats = self.server.get_token_usage_stats()
+        if stats is not None:
+            return stats
+        else:
+            raise HTTPException(status_code=404, detail="No scenario is running")
@@ -0,0 +1,176 @@
+import time
+import random
+import threading
+from ..hal.emf import COMMAND_RESET, COMMAND_SLEEP, COMMAND_SET_ACTIVITY, COMMAND_GLITCH, COMMAND_PLAY_SEQUENCE, SEQUENCE_STEP, ATT_WRITE_HEADER_BYTES
+
+
+class FakeEMFDevice:
+    """Stand-in for hal.emf.EMFDevice (a gatt.Device) that acknowledges writes like BlueZ would.
+
+    Implements the parts of the device the driver uses (connect, disconnect,
+    command_characteristic, write_command and the connect, disconnect and write callbacks).
+    Connecting and each write complete from a separate thread, like the gatt main loop
+    does: writes after write_request_latency, or write_command_latency for writes without
+    response. Every written command is recorded with its arrival time and applied to a
+    simulated meter state, which starts over on every connect like the real meter after
+    a power cycle. The first failed_connects attempts fail, and drop_connection (or
+    mean_connection_seconds) simulates the meter going out of range.
+
+    Uploaded sequences are decoded the way the meter firmware does it and played on
+    their own timer; a malformed one fails the write and is kept in malformed_sequences.
+    Everything the meter does, whether from a single command or a sequence step, ends up
+    in events with its time. mtu is what the connection reports as negotiated, None for a
+    BlueZ that does not report it. Pass it to BluetoothEMFDriver(device=FakeEMFDevice())."""
+
+    def __init__(
+        self,
+        write_request_latency: float = 0.03,
+        write_command_latency: float = 0.008,
+        supports_write_without_response: bool = True,
+        mtu: int | None = 247,
+        connect_delay: float = 0.0,
+        failure_rate: float = 0.0,
+        failed_connects: int = 0,
+        mean_connection_seconds: float | None = None
+    ):
+        self.mac_address = "00:00:00:00:00:00"
+        self.write_request_latency = write_request_latency
+        self.write_command_latency = write_command_latency
+        self.supports_write_without_response = supports_write_without_response
+        self.mtu = mtu
+        self.connect_delay = connect_delay
+        self.failure_rate = failure_rate
+        self.failed_connects = failed_connects
+        self.mean_connection_seconds = mean_connection_seconds
+        self.is_connected = False
+        self.command_characteristic = None
+        self.connect_callback = None
+        self.disconnect_callback = None
+        self.write_callback = None
+        self.connect_attempts = 0
+        self.signal_handlers = 0  # BlueZ signal handlers a gatt.Device holds: connect() adds them, only disconnect() removes them
+        self.max_signal_handlers = 0
+        self.writes = []  # (arrival time, command bytes, without response)
+        self.activity = None
+        self.glitches = 0
+        self.resets = 0
+        self.asleep = False
+        self.events = []  # (time, command, value) of every activity change and glitch
+        self.sequences = []  # Decoded steps of every accepted sequence
+        self.malformed_sequences = []
+        self._lock = threading.Lock()
+        self._sequence_stop = threading.Event()
+
+    def connect(self):
+        self.connect_attempts += 1
+        self.signal_handlers += 1
+        self.max_signal_handlers = max(self.max_signal_handlers, self.signal_handlers)
+        threading.Timer(self.connect_delay, self._complete_connect).start()
+
+    def _complete_connect(self):
+        if self.connect_attempts <= self.failed_connects:
+            self.disconnect_callback()
+            return
+
+        with self._lock:
+            self.activity = None
+            self.asleep = False
+            self.is_connected = True
+            self.command_characteristic = object()
+        if self.mean_connection_seconds is not None:
+            threading.Timer(random.expovariate(1 / self.mean_connection_seconds), self._drop_if_current, (self.command_characteristic,)).start()
+        self.connect_callback()
+
+    def _drop_if_current(self, characteristic):
+        if self.command_characteristic is characteristic:
+            self.drop_connection()
+
+    def disconnect(self):
+        self.signal_handlers = 0
+        self.drop_connection()
+
+    def drop_connection(self):
+        with self._lock:
+            if not self.is_connected:
+                return
+            self.is_connected = False
+            self.command_characteristic = None
+            self._stop_sequence()
+        self.disconnect_callback()
+
+    def write_command(self, data: bytes, without_response: bool):
+        latency = self.write_command_latency if without_response else self.write_request_latency
+        threading.Timer(latency, self._complete_write, (bytes(data), without_response)).start()
+
+    def _complete_write(self, data: bytes, without_response: bool):
+        if not self.is_connected:
+            # Lost with the connection, BlueZ never answers
+            return
+        if random.random() < self.failure_rate:
+            self.write_callback(Exception("Simulated write failure"))
+            return
+
+        with self._lock:
+            self.writes.append((time.monotonic(), data, without_response))
+            if data[0] == COMMAND_PLAY_SEQUENCE:
+                # BlueZ refuses writes longer than the MTU allows
+                fits = self.mtu is None or len(data) <= self.mtu - ATT_WRITE_HEADER_BYTES
+                steps = self.decode_sequence(data) if fits else None
+                if steps is None:
+                    self.malformed_sequences.append(data)
+            else:
+                steps = None
+                self._stop_sequence()
+                self._apply(data)
+
+        if data[0] != COMMAND_PLAY_SEQUENCE:
+            self.write_callback(None)
+        elif steps is None:
+            self.write_callback(Exception("Malformed sequence"))
+        else:
+            self._start_sequence(steps)
+            self.write_callback(None)
+
+    @staticmethod
+    def decode_sequence(data: bytes) -> list[tuple[int, int, int]] | None:
+        """Parses a COMMAND_PLAY_SEQUENCE payload into (command, value, delay ms) steps, None if malformed."""
+        if len(data) < 2 or len(data) != 2 + data[1] * SEQUENCE_STEP.size:
+            return None
+        steps = list(SEQUENCE_STEP.iter_unpack(data[2:]))
+        if any(command not in (COMMAND_SET_ACTIVITY, COMMAND_GLITCH) for command, _, _ in steps):
+            return None
+        return steps
+
+    def _stop_sequence(self):
+        self._sequence_stop.set()
+
+    def _start_sequence(self, steps: list[tuple[int, int, int]]):
+        self._stop_sequence()
+        stop = self._sequence_stop = threading.Event()
+        self.sequences.append(steps)
+        threading.Thread(target=self._run_sequence, args=(steps, stop), daemon=True).start()
+
+    def _run_sequence(self, steps: list[tuple[int, int, int]], stop: threading.Event):
+        deadline = time.monotonic()
+        for command, value, delay_ms in steps:
+            deadline += delay_ms / 1000
+            if stop.wait(max(0.0, deadline - time.monotonic())):
+                return
+            with self._lock:
+                if not self.is_connected or stop.is_set():
+                    return
+                self._apply(bytes([command, value]))
+
+    def _apply(self, data: bytes):
+        if data[0] == COMMAND_RESET:
+            self.resets += 1
+            self.activity = None
+            self.asleep = False
+        elif data[0] == COMMAND_SLEEP:
+            self.asleep = True
+        elif data[0] == COMMAND_SET_ACTIVITY:
+            self.activity = data[1]
+            self.events.append((time.monotonic(), COMMAND_SET_ACTIVITY, data[1]))
+        elif data[0] == COMMAND_GLITCH:
+            self.glitches += 1
+            self.events.append((time.monotonic(), COMMAND_GLITCH, 0))
@@ -0,0 +1,87 @@
+import numpy as np
+from PIL import Image
+from ..hal.display import rgb_to_rgb565
+
+# st7735 command bytes sent by set_window
+ST7735_CASET = 0x2A
+ST7735_RASET = 0x2B
+ST7735_RAMWR = 0x2C
+
+
+class FakeST7735:
+    """Stand-in for st7735.ST7735 that records what would go over SPI.
+
+    Implements the parts of the driver the display uses (set_window, data, command and
+    display) and writes pixel data into a native RGB565 framebuffer through the address
+    window, like the panel does, so tests can check both the traffic and the picture.
+    Pass it to ST7735Display(device=FakeST7735())."""
+
+    def __init__(self, width: int = 80, height: int = 160, rotation: int = 90):
+        self._width = width
+        self._height = height
+        self._rotation = rotation
+        self.framebuffer = np.zeros((height, width), dtype=np.uint16)
+        self.bytes_sent = 0  # Everything that goes over SPI, commands and window setup included
+        self.pixel_bytes_sent = 0
+        self.windows = []
+        self._window = (0, 0, width - 1, height - 1)
+        self._cursor = 0
+        self._pending_byte = None
+
+    @property
+    def width(self) -> int:
+        return self._width if self._rotation in (0, 180) else self._height
+
+    @property
+    def height(self) -> int:
+        return self._height if self._rotation in (0, 180) else self._width
+
+    def command(self, data):
+        self.bytes_sent += 1
+
+    def set_window(self, x0=0, y0=0, x1=None, y1=None):
+        x1 = self._width - 1 if x1 is None else x1
+        y1 = self._height - 1 if y1 is None else y1
+        # CASET and RASET with four bytes each, then RAMWR
+        for command in (ST7735_CASET, ST7735_RASET):
+            self.command(command)
+            self.bytes_sent += 4
+        self.command(ST7735_RAMWR)
+        self._window = (x0, y0, x1, y1)
+        self._cursor = 0
+        self._pending_byte = None
+        self.windows.append(self._window)
+
+    def data(self, data):
+        if isinstance(data, int):
+            data = [data & 0xFF]
+        self.bytes_sent += len(data)
+        self.pixel_bytes_sent += len(data)
+
+        data = np.asarray(data, dtype=np.uint8)
+        if self._pending_byte is not None:
+            data = np.concatenate(([self._pending_byte], data)).astype(np.uint8)
+            self._pending_byte = None
+        if len(data) % 2:
+            self._pending_byte = data[-1]
+            data = data[:-1]
+
+        x0, y0, x1, y1 = self._window
+        window_width = x1 - x0 + 1
+        window_pixels = window_width * (y1 - y0 + 1)
+        pixels = (data[0::2].astype(np.uint16) << 8) | data[1::2]
+        # The panel wraps around inside the window once it is full
+        indices = (self._cursor + np.arange(len(pixels))) % window_pixels
+        self.framebuffer[y0 + indices // window_width, x0 + indices % window_width] = pixels
+        self._cursor += len(pixels)
+
+    def display(self, image: Image.Image):
+        self.set_window()
+        pixels = np.rot90(rgb_to_rgb565(np.asarray(image.convert("RGB"))), self._rotation // 90)
+        self.data(np.ascontiguousarray(pixels, dtype=">u2").view(np.uint8).ravel().tolist())
+
+    def image(self) -> Image.Image:
+        """The panel contents converted back to an upright RGB image (at RGB565 precision)."""
+        pixels = np.rot90(self.framebuffer, -(self._rotation // 90))
+        rgb = np.dstack(((pixels >> 8) & 0xF8, (pixels >> 3) & 0xFC, (pixels << 3) & 0xF8)).astype(np.uint8)
+        return Image.fromarray(rgb, "RGB")
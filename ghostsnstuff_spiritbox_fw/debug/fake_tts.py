@@ -0,0 +1,92 @@
+import json
+import time
+import threading
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .. import logging
+
+class FakeTTSServer:
+    """Local stand-in for the OpenAI speech endpoint, for testing streaming TTS offline.
+
+    Answers POST /v1/audio/speech with raw 16-bit PCM sent as a chunked response. The
+    audio is a buzzing tone whose length follows the input text, and chunks are paced
+    at a multiple of real time after a configurable first-byte latency, so playback
+    can be exercised against a slow or jittery "network". Point the client at it with
+    OpenAI(base_url=server.base_url, api_key="fake")."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        sample_rate: int = 16000,
+        first_chunk_latency: float = 0.3,
+        realtime_factor: float = 4.0,
+        jitter: float = 0.0,
+        chunk_seconds: float = 0.05,
+        seconds_per_character: float = 0.07
+    ):
+        self.sample_rate = sample_rate
+        self.first_chunk_latency = first_chunk_latency
+        self.realtime_factor = realtime_factor
+        self.jitter = jitter
+        self.chunk_seconds = chunk_seconds
+        self.seconds_per_character = seconds_per_character
+        self.requests = []
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logging.print(f"Fake TTS server listening on {self.base_url}")
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def synthesize(self, text: str, speed: float = 1.0) -> np.ndarray:
+        duration = max(0.2, len(text) * self.seconds_per_character / max(speed, 0.25))
+        t = np.arange(int(duration * self.sample_rate)) / self.sample_rate
+        tone = np.sign(np.sin(2 * np.pi * 140 * t)) * 0.3 + np.sin(2 * np.pi * 700 * t) * 0.2
+        envelope = np.minimum(1.0, np.minimum(t, duration - t) / 0.02)
+        return (tone * envelope * 32767).astype(np.int16)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/audio/speech"):
+                    self.send_error(404)
+                    return
+
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests.append(body)
+                pcm = server.synthesize(body.get("input", ""), body.get("speed", 1.0)).tobytes()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/pcm")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                time.sleep(server.first_chunk_latency)
+                chunk_bytes = int(server.chunk_seconds * server.sample_rate) * 2
+                for start in range(0, len(pcm), chunk_bytes):
+                    chunk = pcm[start:start + chunk_bytes]
+                    self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+                    self.wfile.flush()
+                    delay = server.chunk_seconds / server.realtime_factor
+                    time.sleep(max(0.0, delay + np.random.uniform(-server.jitter, server.jitter)))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,465 @@
+import numpy as np
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from math import gcd
+from typing import Self, List, Dict
+from scipy.signal import butter, firwin, sosfilt, sosfiltfilt, resample_poly
+from .scenario import (
+    VoiceEffectDefinition, EffectStageDefinition, BitReductionEffect, SampleRateReductionEffect,
+    BandpassEffect, AmplitudeModulationEffect, NoiseEffect, DropoutsEffect
+)
+from . import logging
+
+FLUSH_BLOCK_SIZE = 256
+NOISE_TABLE_SECONDS = 3
+DEFAULT_VOICE_PRESET = "haunted"
+
+
+def design_resampling_window(up: int, down: int) -> np.ndarray:
+    """The kaiser low-pass resample_poly designs on every call, so callers can compute it once."""
+    max_rate = max(up, down)
+    return firwin(20 * max_rate + 1, 1.0 / max_rate, window=("kaiser", 5.0)).astype(np.float32)
+
+
+class EffectStage(ABC):
+    """A single step of a voice effect chain.
+
+    Stages precompute everything that only depends on the sample rate and their
+    parameters in __init__, so processing a buffer does no filter design or table setup."""
+
+    @abstractmethod
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """Processes a whole float32 buffer, in place where possible, and returns the result."""
+        pass
+
+    def new_state(self):
+        """Returns the per-stream state used by process_block, or None for stateless stages."""
+        return None
+
+    def process_block(self, block: np.ndarray, state) -> np.ndarray:
+        """Processes the next block of a stream. Stateless stages behave exactly like process."""
+        return self.process(block)
+
+
+class BitReduction(EffectStage):
+    def __init__(self, bit_depth: int = 8, mix: float = 0.7) -> Self:
+        self.factor = float(2 ** (16 - bit_depth))
+        self.mix = mix
+
+    def process(self, audio):
+        degraded = np.multiply(audio, self.factor)
+        np.round(degraded, out=degraded)
+        degraded *= (1 - self.mix) / self.factor
+        audio *= self.mix
+        audio += degraded
+        return audio
+
+
+class SampleRateReduction(EffectStage):
+    def __init__(self, sample_rate: int, target_rate: int, mix: float = 0.7) -> Self:
+        divisor = gcd(sample_rate, target_rate)
+        self.up = target_rate // divisor
+        self.down = sample_rate // divisor
+        self.mix = mix
+        # At the target rate already there is nothing to reduce (and no filter to design)
+        self.window = design_resampling_window(self.up, self.down) if self.up != self.down else None
+
+    def process(self, audio):
+        if self.window is None:
+            return audio
+        # Polyphase round trip through the target rate instead of two FFT resamples
+        reduced = resample_poly(audio, self.up, self.down, window=self.window)
+        restored = resample_poly(reduced, self.down, self.up, window=self.window)
+        length = min(len(audio), len(restored))
+        audio *= self.mix
+        audio[:length] += (1 - self.mix) * restored[:length]
+        return audio
+
+    def new_state(self):
+        if self.window is None:
+            return None
+        # Both causal FIRs delay the wet signal, so the dry signal is delayed to match
+        half_len = (len(self.window) - 1) // 2
+        delay = round(2 * half_len / self.up)
+        return SampleRateReductionState(
+            reduce=PolyphaseStream(self.window, self.up, self.down),
+            restore=PolyphaseStream(self.window, self.down, self.up),
+            dry=np.zeros(delay, dtype=np.float32),
+        )
+
+    def process_block(self, block, state):
+        if self.window is None:
+            return block
+        wet = state.restore.process(state.reduce.process(block))
+        state.wet = np.concatenate((state.wet, wet))
+        state.dry = np.concatenate((state.dry, block))
+
+        # The wet path emits a varying number of samples per block, only hand out aligned pairs
+        length = min(len(state.wet), len(state.dry))
+        mixed = state.dry[:length] * self.mix
+        mixed += (1 - self.mix) * state.wet[:length]
+        state.wet = state.wet[length:]
+        state.dry = state.dry[length:]
+        return mixed
+
+
+class PolyphaseStream:
+    """Causal, stateful rational resampler.
+
+    Equivalent to zero-stuffing by up, running the FIR and keeping every down-th sample,
+    but only the polyphase branch each output actually needs is evaluated."""
+
+    def __init__(self, window: np.ndarray, up: int, down: int) -> Self:
+        self.up = up
+        self.down = down
+        self.taps = -(-len(window) // up)
+        h = np.zeros(self.taps * up, dtype=np.float32)
+        h[:len(window)] = window * up
+        self.phases = h.reshape(self.taps, up).T.copy()  # phases[p, j] = h[p + j * up]
+        self.history = np.zeros(self.taps - 1, dtype=np.float32)
+        self.consumed = 0
+        self.next_output = 0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        samples = np.concatenate((self.history, block))
+        base = self.consumed - len(self.history)  # Stream index of samples[0]
+        self.consumed += len(block)
+
+        # Every output whose newest input sample has arrived can be computed now
+        end = -(-(self.consumed * self.up) // self.down)
+        positions = np.arange(self.next_output, end) * self.down
+        self.next_output = end
+
+        newest = positions // self.up - base
+        window = samples[newest[:, None] - np.arange(self.taps)]
+        output = np.einsum("ij,ij->i", window, self.phases[positions % self.up])
+
+        self.history = samples[len(samples) - len(self.history):]
+        return output.astype(np.float32, copy=False)
+
+
+class SampleRateReductionState:
+    def __init__(self, reduce: PolyphaseStream, restore: PolyphaseStream, dry: np.ndarray) -> Self:
+        self.reduce = reduce
+        self.restore = restore
+        self.dry = dry
+        self.wet = np.empty(0, dtype=np.float32)
+
+
+class BandpassFilter(EffectStage):
+    def __init__(self, sample_rate: int, lowcut: float, highcut: float, order: int = 5) -> Self:
+        nyquist = 0.5 * sample_rate
+        self.sos = butter(order, [lowcut / nyquist, highcut / nyquist], btype="band", output="sos").astype(np.float32)
+        # Same default padding sosfiltfilt would pick, clamped for very short buffers
+        self.padlen = 3 * (2 * len(self.sos) + 1 - min((self.sos[:, 2] == 0).sum(), (self.sos[:, 5] == 0).sum()))
+        # Streams can't run backwards, so they cascade the filter with itself instead:
+        # same magnitude response as filtfilt, just not zero-phase
+        self.stream_sos = np.vstack((self.sos, self.sos))
+
+    def process(self, audio):
+        if len(audio) < 2:
+            return audio
+        filtered = sosfiltfilt(self.sos, audio, padlen=min(self.padlen, len(audio) - 1))
+        return filtered.astype(np.float32, copy=False)
+
+    def new_state(self):
+        return np.zeros((len(self.stream_sos), 2), dtype=np.float32)
+
+    def process_block(self, block, state):
+        filtered, state[:] = sosfilt(self.stream_sos, block, zi=state)
+        return filtered.astype(np.float32, copy=False)
+
+
+class AmplitudeModulation(EffectStage):
+    def __init__(self, sample_rate: int, mod_freq: float = 2, depth: float = 0.3) -> Self:
+        self.phase_step = 2 * np.pi * mod_freq / sample_rate
+        self.depth = depth
+        self._envelope = np.empty(0, dtype=np.float32)
+
+    def envelope(self, start: int, length: int) -> np.ndarray:
+        envelope = np.arange(start, start + length, dtype=np.float64)
+        envelope *= self.phase_step
+        np.sin(envelope, out=envelope)
+        envelope += 1
+        envelope *= -self.depth / 2
+        envelope += 1
+        return envelope.astype(np.float32)
+
+    def process(self, audio):
+        # Whole buffers always start at phase 0, so the longest envelope seen so far is reused.
+        # Stages are shared between threads: the cached array is never modified, only replaced,
+        # and each call keeps using the one it read, so a concurrent replacement cannot shorten it.
+        envelope = self._envelope
+        if len(envelope) < len(audio):
+            envelope = self.envelope(0, len(audio))
+            self._envelope = envelope
+        audio *= envelope[:len(audio)]
+        return audio
+
+    def new_state(self):
+        return StreamPosition()
+
+    def process_block(self, block, state):
+        block *= self.envelope(state.position, len(block))
+        state.position += len(block)
+        return block
+
+
+class Noise(EffectStage):
+    def __init__(self, sample_rate: int, noise_level: float = 0.01) -> Self:
+        # Noise is read from a precomputed table at a random offset instead of drawn per call
+        self.rng = np.random.default_rng()
+        self.table = self.rng.standard_normal(NOISE_TABLE_SECONDS * sample_rate, dtype=np.float32)
+        self.table *= noise_level
+
+    def _add_from_table(self, audio: np.ndarray, start: int) -> int:
+        written = 0
+        while written < len(audio):
+            count = min(len(audio) - written, len(self.table) - start)
+            audio[written:written + count] += self.table[start:start + count]
+            written += count
+            start = (start + count) % len(self.table)
+        return start
+
+    def process(self, audio):
+        self._add_from_table(audio, int(self.rng.integers(len(self.table))))
+        return audio
+
+    def new_state(self):
+        state = StreamPosition()
+        state.position = int(self.rng.integers(len(self.table)))
+        return state
+
+    def process_block(self, block, state):
+        state.position = self._add_from_table(block, state.position)
+        return block
+
+
+class RandomDropouts(EffectStage):
+    def __init__(self, sample_rate: int, dropout_rate: float = 0.1, dropout_length: float = 0.05, interval: float = 2.0) -> Self:
+        self.dropout_rate = dropout_rate
+        self.dropout_samples = int(dropout_length * sample_rate)
+        self.interval_samples = int(interval * sample_rate)
+
+    def process(self, audio):
+        # One dropout candidate at the start of every interval, all decided in a single draw
+        starts = np.arange(0, len(audio), self.interval_samples)
+        starts = starts[np.random.rand(len(starts)) < self.dropout_rate]
+        if len(starts):
+            muted = (starts[:, None] + np.arange(self.dropout_samples)).ravel()
+            audio[muted[muted < len(audio)]] = 0
+        return audio
+
+    def new_state(self):
+        return StreamPosition()
+
+    def process_block(self, block, state):
+        start = state.position
+        end = start + len(block)
+
+        # Finish a dropout that started in an earlier block
+        if state.muted_until > start:
+            block[:state.muted_until - start] = 0
+
+        first = -(-start // self.interval_samples) * self.interval_samples
+        for candidate in range(first, end, self.interval_samples):
+            if np.random.rand() < self.dropout_rate:
+                block[candidate - start:candidate - start + self.dropout_samples] = 0
+                state.muted_until = candidate + self.dropout_samples
+
+        state.position = end
+        return block
+
+
+class StreamPosition:
+    def __init__(self) -> Self:
+        self.position = 0
+        self.muted_until = 0
+
+
+class EffectChain:
+    def __init__(self, stages: List[EffectStage]) -> Self:
+        self.stages = stages
+
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """Runs every stage over a private float32 copy of the buffer and clips the result to [-1.0, 1.0]."""
+        buffer = np.array(audio, dtype=np.float32)
+        for stage in self.stages:
+            buffer = stage.process(buffer)
+        return np.clip(buffer, -1.0, 1.0, out=buffer)
+
+    def stream(self) -> 'EffectStream':
+        """Starts a new chunk-at-a-time run of this chain, see EffectStream."""
+        return EffectStream(self)
+
+
+class EffectStream:
+    """Chunk-at-a-time run of an EffectChain.
+
+    Filter memory, modulation phase and dropout scheduling carry over between blocks, so
+    PCM can be processed as it arrives. Blocks may come out slightly shorter or longer than
+    they went in (the resampling stage adds a few ms of latency), so call flush() after the
+    last block to get the remaining tail."""
+
+    def __init__(self, chain: EffectChain) -> Self:
+        self.chain = chain
+        self.states = [stage.new_state() for stage in chain.stages]
+        self.samples_in = 0
+        self.samples_out = 0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        self.samples_in += len(block)
+        buffer = self._run(block)
+        self.samples_out += len(buffer)
+        return buffer
+
+    def flush(self) -> np.ndarray:
+        """Drains the latency tail with silence so every input sample has made it to the output."""
+        tail = []
+        pending = self.samples_in - self.samples_out
+        while pending > 0:
+            block = self._run(np.zeros(FLUSH_BLOCK_SIZE, dtype=np.float32))
+            tail.append(block[:pending])
+            pending -= len(block)
+
+        self.samples_in = self.samples_out = 0
+        return np.concatenate(tail) if tail else np.empty(0, dtype=np.float32)
+
+    def _run(self, block: np.ndarray) -> np.ndarray:
+        buffer = np.array(block, dtype=np.float32)
+        for stage, state in zip(self.chain.stages, self.states):
+            if not len(buffer):
+                break
+            buffer = stage.process_block(buffer, state)
+        return np.clip(buffer, -1.0, 1.0, out=buffer)
+
+
+VOICE_PRESETS: Dict[str, List[EffectStageDefinition]] = {
+    # The original spirit box voice
+    "haunted": [
+        BitReductionEffect(type="bit_reduction"),
+        SampleRateReductionEffect(type="sample_rate_reduction"),
+        BandpassEffect(type="bandpass"),
+        AmplitudeModulationEffect(type="amplitude_modulation"),
+        NoiseEffect(type="noise"),
+        DropoutsEffect(type="dropouts"),
+    ],
+    # Thin and airy, with a noticeable hiss
+    "whisper": [
+        SampleRateReductionEffect(type="sample_rate_reduction", target_rate=12000, mix=0.6),
+        BandpassEffect(type="bandpass", lowcut=900, highcut=5000, order=3),
+        AmplitudeModulationEffect(type="amplitude_modulation", mod_freq=0.7, depth=0.3),
+        NoiseEffect(type="noise", noise_level=0.004),
+    ],
+    # Low, crushed and wobbling
+    "demonic": [
+        BitReductionEffect(type="bit_reduction", bit_depth=3, mix=0.5),
+        SampleRateReductionEffect(type="sample_rate_reduction", target_rate=6000, mix=0.5),
+        BandpassEffect(type="bandpass", lowcut=80, highcut=1800),
+        AmplitudeModulationEffect(type="amplitude_modulation", mod_freq=5, depth=0.35),
+        NoiseEffect(type="noise", noise_level=0.0005),
+    ],
+    # Narrow band and frequently cutting out
+    "distant": [
+        SampleRateReductionEffect(type="sample_rate_reduction", target_rate=4000, mix=0.7),
+        BandpassEffect(type="bandpass", lowcut=500, highcut=1800, order=4),
+        AmplitudeModulationEffect(type="amplitude_modulation", mod_freq=0.5, depth=0.5),
+        NoiseEffect(type="noise", noise_level=0.002),
+        DropoutsEffect(type="dropouts", dropout_rate=0.5, dropout_length=0.08, interval=0.7),
+    ],
+}
+
+
+STAGE_DEFAULTS: Dict[str, Dict[str, float]] = {
+    "bit_reduction": {"bit_depth": 5, "mix": 0.8},
+    "sample_rate_reduction": {"target_rate": 8000, "mix": 0.8},
+    "bandpass": {"lowcut": 300, "highcut": 3000, "order": 5},
+    "amplitude_modulation": {"mod_freq": 2, "depth": 0.2},
+    "noise": {"noise_level": 0.00001},
+    "dropouts": {"dropout_rate": 0.2, "dropout_length": 0.05, "interval": 2.0},
+}
+
+
+# Accepted (min, max) of every parameter, None for no bound. Definitions come from the
+# scenario writer, so values outside are clamped instead of failing the filter design.
+STAGE_LIMITS: Dict[str, Dict[str, tuple[float | None, float | None]]] = {
+    "bit_reduction": {"bit_depth": (1, 16), "mix": (0.0, 1.0)},
+    "sample_rate_reduction": {"target_rate": (1000, None), "mix": (0.0, 1.0)},
+    "bandpass": {"lowcut": (20, None), "highcut": (40, None), "order": (1, 10)},
+    "amplitude_modulation": {"mod_freq": (0.0, 50.0), "depth": (0.0, 1.0)},
+    "noise": {"noise_level": (0.0, 0.5)},
+    "dropouts": {"dropout_rate": (0.0, 1.0), "dropout_length": (0.0, 1.0), "interval": (0.05, None)},
+}
+BANDPASS_MAX_HIGHCUT = 0.45  # Of the sample rate, keeps the upper edge below Nyquist
+BANDPASS_MAX_LOWCUT = 0.8  # Of the highcut, keeps the band from collapsing
+
+
+def stage_parameters(definition: EffectStageDefinition, sample_rate: int | None = None) -> Dict[str, float]:
+    """The stage's parameters, with the ones the definition leaves out filled in from STAGE_DEFAULTS
+    and all of them clamped to STAGE_LIMITS (and, given the sample rate, to what it can represent)."""
+    defaults = STAGE_DEFAULTS.get(definition.type)
+    if defaults is None:
+        raise ValueError(f"Unknown effect stage type: {definition.type}")
+    params = {name: default if getattr(definition, name) is None else getattr(definition, name) for name, default in defaults.items()}
+
+    limits = dict(STAGE_LIMITS[definition.type])
+    if sample_rate is not None:
+        if definition.type == "sample_rate_reduction":
+            limits["target_rate"] = (limits["target_rate"][0], sample_rate)
+        elif definition.type == "bandpass":
+            limits["highcut"] = (limits["highcut"][0], BANDPASS_MAX_HIGHCUT * sample_rate)
+    for name, (low, high) in limits.items():
+        value = params[name]
+        if low is not None:
+            value = max(low, value)
+        if high is not None:
+            value = min(high, value)
+        params[name] = value
+    if definition.type == "bandpass":
+        params["lowcut"] = min(params["lowcut"], BANDPASS_MAX_LOWCUT * params["highcut"])
+
+    clamped = {name: value for name, value in params.items() if getattr(definition, name) is not None and value != getattr(definition, name)}
+    if clamped:
+        logging.warn(f"Clamped out of range {definition.type} parameters: {clamped}")
+    return params
+
+
+def compile_stage(definition: EffectStageDefinition, sample_rate: int) -> EffectStage:
+    params = stage_parameters(definition, sample_rate)
+    if definition.type == "bit_reduction":
+        return BitReduction(int(params["bit_depth"]), params["mix"])
+    elif definition.type == "sample_rate_reduction":
+        return SampleRateReduction(sample_rate, int(params["target_rate"]), params["mix"])
+    elif definition.type == "bandpass":
+        return BandpassFilter(sample_rate, params["lowcut"], params["highcut"], int(params["order"]))
+    elif definition.type == "amplitude_modulation":
+        return AmplitudeModulation(sample_rate, params["mod_freq"], params["depth"])
+    elif definition.type == "noise":
+        return Noise(sample_rate, params["noise_level"])
+    else:
+        return RandomDropouts(sample_rate, params["dropout_rate"], params["dropout_length"], params["interval"])
+
+
+def compile_voice_effect(definition: VoiceEffectDefinition | None, sample_rate: int) -> EffectChain:
+    """Builds a ready-to-run chain from a voice effect definition. Explicit stages win over a
+    preset, and a missing definition, an unknown preset or stages that fail to compile fall
+    back to the default voice."""
+    if definition and definition.stages is not None:
+        try:
+            return EffectChain([compile_stage(stage, sample_rate) for stage in definition.stages])
+        except Exception as ex:
+            logging.warn(f"Failed to compile voice effect stages, using '{DEFAULT_VOICE_PRESET}': {ex}")
+            return EffectChain([compile_stage(stage, sample_rate) for stage in VOICE_PRESETS[DEFAULT_VOICE_PRESET]])
+
+    preset = definition.preset if definition and definition.preset else DEFAULT_VOICE_PRESET
+    if preset not in VOICE_PRESETS:
+        logging.warn(f"Unknown voice effect preset '{preset}', using '{DEFAULT_VOICE_PRESET}'")
+        preset = DEFAULT_VOICE_PRESET
+
+    return EffectChain([compile_stage(stage, sample_rate) for stage in VOICE_PRESETS[preset]])
+
+
+@lru_cache(maxsize=8)
+def get_haunted_effect(sample_rate: int) -> EffectChain:
+    """Returns the (cached) default ghost voice chain for the given sample rate."""
+    return compile_voice_effect(None, sample_rate)
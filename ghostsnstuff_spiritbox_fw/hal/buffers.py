@@ -0,0 +1,133 @@
+import threading
+import numpy as np
+from typing import Self
+
+
+class RingBuffer:
+    """Fixed-capacity FIFO of samples backed by a preallocated numpy array.
+
+    Writers block while the buffer is full and readers can wait for a given amount
+    of data, which makes it usable as a jitter buffer between two threads."""
+
+    def __init__(self, capacity: int, dtype=np.float32) -> Self:
+        self._data = np.zeros(capacity, dtype=dtype)
+        self._start = 0
+        self._length = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __len__(self) -> int:
+        return self._length
+
+    def write(self, samples: np.ndarray):
+        """Appends samples, blocking while there is no room for them."""
+        offset = 0
+        with self._condition:
+            while offset < len(samples):
+                while self._length == self.capacity and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+
+                count = min(len(samples) - offset, self.capacity - self._length)
+                end = (self._start + self._length) % self.capacity
+                first = min(count, self.capacity - end)
+                self._data[end:end + first] = samples[offset:offset + first]
+                self._data[:count - first] = samples[offset + first:offset + count]
+                self._length += count
+                offset += count
+                self._condition.notify_all()
+
+    def read(self, count: int) -> np.ndarray:
+        """Removes and returns up to count samples without blocking."""
+        with self._condition:
+            count = min(count, self._length)
+            first = min(count, self.capacity - self._start)
+            result = np.concatenate((self._data[self._start:self._start + first], self._data[:count - first]))
+            self._start = (self._start + count) % self.capacity
+            self._length -= count
+            self._condition.notify_all()
+            return result
+
+    def wait_for(self, count: int, timeout: float | None = None) -> bool:
+        """Blocks until at least count samples are buffered or the buffer is closed."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._length >= count or self._closed, timeout)
+
+    def close(self):
+        """Marks the end of the data. Buffered samples can still be read."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class HistoryBuffer:
+    """Keeps the most recent capacity samples, overwriting the oldest ones.
+
+    Every sample is stored twice, capacity apart, so any window of recent samples is
+    a contiguous slice and latest() can return a view instead of a copy."""
+
+    def __init__(self, capacity: int, dtype=np.int16) -> Self:
+        self.capacity = capacity
+        self._data = np.zeros(capacity * 2, dtype=dtype)
+        self._end = 0
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, samples: np.ndarray):
+        if len(samples) >= self.capacity:
+            samples = samples[-self.capacity:]
+
+        count = len(samples)
+        first = min(count, self.capacity - self._end)
+        for offset in (0, self.capacity):
+            self._data[offset + self._end:offset + self._end + first] = samples[:first]
+            self._data[offset:offset + count - first] = samples[first:]
+        self._end = (self._end + count) % self.capacity
+        self._length = min(self.capacity, self._length + count)
+
+    def latest(self, count: int) -> np.ndarray:
+        """Returns a view of the newest count samples (oldest first). Only valid until the next append."""
+        count = min(count, self._length)
+        end = self._end + self.capacity
+        return self._data[end - count:end]
+
+
+class GrowableBuffer:
+    """Append-only sample store with amortized O(1) appends.
+
+    The backing array doubles when it runs out of room instead of being copied on
+    every append, and clear() keeps the allocation around for the next recording."""
+
+    def __init__(self, initial_capacity: int, dtype=np.int16) -> Self:
+        self._data = np.zeros(max(1, initial_capacity), dtype=dtype)
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, samples: np.ndarray):
+        required = self._length + len(samples)
+        if required > len(self._data):
+            grown = np.zeros(max(required, len(self._data) * 2), dtype=self._data.dtype)
+            grown[:self._length] = self._data[:self._length]
+            self._data = grown
+        self._data[self._length:required] = samples
+        self._length = required
+
+    def view(self) -> np.ndarray:
+        """Returns a view of everything appended so far. Only valid until the next append."""
+        return self._data[:self._length]
+
+    def clear(self):
+        self._length = 0
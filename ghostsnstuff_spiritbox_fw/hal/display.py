@@ -1,8 +1,16 @@
 from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Self, Iterator
 import threading
 import time
 import random
-from PIL import Image, ImageDraw, ImageFont
+import hashlib
+import bisect
+import struct
+import zlib
+import numpy as np
+from collections import OrderedDict
+from PIL import Image, ImageDraw, ImageFont, ImageChops
 from .. import logging
 from . import platform
 from ..utils import clamp
@@ -19,6 +27,28 @@ ICON_PATHS = {
     "thinking_disabled": "./assets/icons/thinking_disabled.png",
 }
 DISPLAY_REFRESH_INTERVAL = 0.05
+DISPLAY_SIZE = (160, 80)
+DISPLAY_BACKGROUND = (248, 133, 18)
+DISPLAY_TEXT_CHARS = 6
+TEXT_COLOR = (0, 0, 0)
+TEXT_POSITION = (3, 45)
+TEXT_AREA_TOP = 43  # Icons end at this row, the text line takes the rest
+TEXT_CACHE_SIZE = 256
+ICON_ORDER = ["mic", "thinking", "no_response", "response"]
+ICON_POSITIONS = [(3, 3), (32, 3), (72, 3), (112, 3)]
+GLYPH_CHARSET = "".join(chr(code) for code in range(32, 127))
+GLYPH_PADDING = 4
+GLITCH_CHARACTERS = ['~', '-', 'X', '?', '+', 'F', 'M', '0', '1', '2', '3', '4', '5', '6', '7', '8', '9']
+SWEEP_MIN_FREQUENCY = 63
+SWEEP_MAX_FREQUENCY = 108
+RENDER_HISTOGRAM_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100]
+FRAME_MAX_DIVIDER = 4  # Under CPU pressure the display renders down to every 4th tick (5 fps)
+FRAME_BUDGET_FRACTION = 0.8  # Share of the frame interval rendering may take before the frame rate is lowered
+FRAME_RECOVERY_FRACTION = 0.4  # Render time, relative to the faster interval, below which the frame rate is raised again
+FRAME_ADJUST_MIN_FRAMES = 20
+FRAME_RENDER_TIME_SMOOTHING = 0.1
+TK_POLL_INTERVAL_MS = int(DISPLAY_REFRESH_INTERVAL * 1000 / 2)
+FRAME_LOG_HEADER = struct.Struct("<ddII")  # timestamp, render seconds, text length, compressed frame length
 
 # Initialize icons
 icons = {name: Image.open(path) for name, path in ICON_PATHS.items()}
@@ -33,15 +63,23 @@ except ImportError:
 try:
     import st7735
     ST7735_AVAILABLE = True
-    ST7735_PORT = 0
     ST7735_CS = st7735.BG_SPI_CS_BACK
-    ST7735_DC = "GPIO9"
-    ST7735_BACKLIGHT = "GPIO12"
-    ST7735_ROTATION = 90
-    ST7735_SPI_SPEED_HZ = 4000000
 except ImportError:
     ST7735_AVAILABLE = False
+
+ST7735_PORT = 0
+ST7735_DC = "GPIO9"
+ST7735_BACKLIGHT = "GPIO12"
+ST7735_ROTATION = 90
+ST7735_SPI_SPEED_HZ = 4000000
+# Display areas that are diffed and pushed separately, (left, top, right, bottom) in frame pixels
+ST7735_UPDATE_REGIONS = [(0, 0, DISPLAY_SIZE[0], TEXT_AREA_TOP), (0, TEXT_AREA_TOP, DISPLAY_SIZE[0], DISPLAY_SIZE[1])]
     
+def rgb_to_rgb565(pixels: np.ndarray) -> np.ndarray:
+    """Packs an (..., 3) uint8 RGB array into 16-bit 565 values, as the ST7735 expects them."""
+    pixels = pixels.astype(np.uint16)
+    return ((pixels[..., 0] & 0xF8) << 8) | ((pixels[..., 1] & 0xFC) << 3) | (pixels[..., 2] >> 3)
+
 def calculate_text_offset(
     text_length: int, 
     display_width: int, 
@@ -87,78 +125,248 @@ def calculate_text_offset(
     return offset if direction == 0 else max_offset - offset
 
 
+class GlyphAtlas:
+    """Coverage masks of single characters, rasterized once per font.
+
+    Text is composed by pasting glyph masks at the font's advances, which for the
+    monospaced DSEG14 font matches what ImageDraw.text lays out. Characters outside
+    the preloaded set are rasterized on first use."""
+
+    def __init__(self, font: ImageFont.FreeTypeFont, charset: str = GLYPH_CHARSET):
+        self.font = font
+        self._glyphs = {}
+        for char in charset:
+            self.get(char)
+
+    def get(self, char: str) -> tuple[Image.Image | None, int, int, int]:
+        """Returns (mask, x offset, y offset, advance) for a character. Blank glyphs have no mask."""
+        glyph = self._glyphs.get(char)
+        if glyph:
+            return glyph
+
+        left, top, right, bottom = self.font.getbbox(char)
+        advance = int(self.font.getlength(char))
+        mask = None
+        if right > left and bottom > top:
+            mask = Image.new("L", (right - left + 2 * GLYPH_PADDING, bottom - top + 2 * GLYPH_PADDING))
+            ImageDraw.Draw(mask).text((GLYPH_PADDING - left, GLYPH_PADDING - top), char, 255, self.font)
+        glyph = (mask, left - GLYPH_PADDING, top - GLYPH_PADDING, advance)
+        self._glyphs[char] = glyph
+        return glyph
+
+    def render(self, text: str, size: tuple[int, int], origin: tuple[int, int]) -> Image.Image:
+        """Composes the coverage mask of a whole string, with the pen starting at origin."""
+        coverage = Image.new("L", size)
+        x, y = origin
+        for char in text:
+            mask, offset_x, offset_y, advance = self.get(char)
+            if mask:
+                box = (x + offset_x, y + offset_y, x + offset_x + mask.width, y + offset_y + mask.height)
+                # Italic glyphs overlap their neighbours, so keep the stronger coverage
+                coverage.paste(ImageChops.lighter(coverage.crop(box), mask), box)
+            x += advance
+        return coverage
+
+
 class DisplayRenderer:
+    """Composes display frames from cached tiles into a single reused framebuffer.
+
+    The text line (everything below the icons) is a strip image cached per string:
+    all sweep frequencies are built up front and other strings go through an LRU cache.
+    Strips and icons are only pasted when they differ from what the framebuffer
+    already shows, so a frame where nothing changed costs next to nothing."""
+
     def __init__(self):
         # Shared display assets
-        self.font = ImageFont.truetype("./assets/fonts/DSEG14Modern-Italic.ttf", 30)
+        self.font = ImageFont.truetype(FONT_PATH, 30)
         self.icons = {
             "mic": (icons["mic"], icons["mic_disabled"]),
             "response": (icons["response"], icons["response_disabled"]),
             "no_response": (icons["no_response"], icons["no_response_disabled"]),
             "thinking": (icons["thinking"], icons["thinking_disabled"]),
         }
-
-    def render(self, display: 'Display'):
-        # Creates a single frame for the display
-        imgbuf = Image.new('RGB', (160, 80), color=(248, 133, 18))
-        draw = ImageDraw.Draw(imgbuf)
-
+        self.atlas = GlyphAtlas(self.font)
+        self._frame = Image.new("RGB", DISPLAY_SIZE, color=DISPLAY_BACKGROUND)
+        self._text_cache: OrderedDict[str, Image.Image] = OrderedDict()
+        self._sweep_strips = {
+            text: self._compose_strip(text)
+            for text in (self._sweep_text(tenths / 10) for tenths in range(SWEEP_MIN_FREQUENCY * 10, SWEEP_MAX_FREQUENCY * 10 + 1))
+        }
+        self._shown_text = None
+        self._shown_icons = {}
+        self.frame_version = 0  # Bumped whenever the framebuffer content changes
+
+    @staticmethod
+    def _sweep_text(frequency: float) -> str:
+        return f"{frequency:.1f} FM" if frequency >= 100 else f"    {frequency:.1f} FM"
+
+    def _compose_strip(self, text: str) -> Image.Image:
+        width, height = DISPLAY_SIZE
+        strip_size = (width, height - TEXT_AREA_TOP)
+        strip = Image.new("RGB", strip_size, color=DISPLAY_BACKGROUND)
+        if text:
+            origin = (TEXT_POSITION[0], TEXT_POSITION[1] - TEXT_AREA_TOP)
+            strip.paste(TEXT_COLOR, (0, 0), self.atlas.render(text, strip_size, origin))
+        return strip
+
+    def _text_strip(self, text: str) -> Image.Image:
+        strip = self._sweep_strips.get(text)
+        if strip:
+            return strip
+
+        strip = self._text_cache.get(text)
+        if strip:
+            self._text_cache.move_to_end(text)
+            return strip
+
+        strip = self._compose_strip(text)
+        self._text_cache[text] = strip
+        if len(self._text_cache) > TEXT_CACHE_SIZE:
+            self._text_cache.popitem(last=False)
+        return strip
+
+    def render(self, display: 'Display') -> Image.Image:
+        """Creates a single frame for the display. The image is reused, so it is only valid until the next call."""
         # Draw sweep or text
         if display._glitch_enabled:
-            self._draw_glitch(imgbuf, draw)
-        elif display._text:
-            offset = calculate_text_offset(
-                text_length=len(display._text),
-                display_width=6,
-                current_tick=display._text_ticks,
-                start_delay_seconds=0.5,
-                display_duration=display._text_duration * DISPLAY_REFRESH_INTERVAL 
-                if display._text_duration else None,
-                max_scroll_duration=5.0
-            )
-            self._draw_text(draw, display._text, offset)
-        elif display._sweep_enabled:
-            self._draw_sweep(draw, display._sweep_value)
-
-        # Draw icons
-        if not display._glitch_enabled:
+            self._draw_glitch()
+        else:
+            if display._text:
+                offset = calculate_text_offset(
+                    text_length=len(display._text),
+                    display_width=DISPLAY_TEXT_CHARS,
+                    current_tick=display._text_ticks,
+                    start_delay_seconds=0.5,
+                    display_duration=display._text_duration * DISPLAY_REFRESH_INTERVAL
+                    if display._text_duration else None,
+                    max_scroll_duration=5.0
+                )
+                self._draw_text(self._text_strip(display._text[offset:offset + DISPLAY_TEXT_CHARS]))
+            elif display._sweep_enabled:
+                self._draw_text(self._text_strip(self._sweep_text(display._sweep_value)))
+            else:
+                self._draw_text(self._text_strip(""))
+
+            # Draw icons
             self._draw_icons(
-                imgbuf=imgbuf,
                 mic_active=display._mic_active,
                 thinking_active=display._thinking_active,
                 no_response_active=display._no_response_active,
                 response_active=display._response_active,
             )
 
-        return imgbuf
+        return self._frame
 
-    def _draw_glitch(self, imgbuf: Image.Image, draw: ImageDraw.ImageDraw):
+    def _draw_glitch(self):
         self._draw_icons(
-            imgbuf=imgbuf,
             mic_active=bool(random.getrandbits(1)),
             no_response_active=bool(random.getrandbits(1)),
             response_active=bool(random.getrandbits(1)),
             thinking_active=bool(random.getrandbits(1))
         )
 
-        text = "".join([random.choice(['~', '-', 'X', '?', '+', 'F', 'M', '0', '1', '2', '3', '4', '5', '6', '7', '8', '9']) for _ in range(6)])
-        self._draw_text(draw, text, 0)
-
-    def _draw_sweep(self, draw: ImageDraw.ImageDraw, frequency: float):
-        freq_text = f"{frequency:.1f} FM" if frequency >= 100 else f"    {frequency:.1f} FM"
-        draw.text((3, 45), freq_text, (0, 0, 0), self.font)
+        # Random strings would only churn the text cache
+        text = "".join([random.choice(GLITCH_CHARACTERS) for _ in range(DISPLAY_TEXT_CHARS)])
+        self._draw_text(self._compose_strip(text))
 
-    def _draw_text(self, draw: ImageDraw.ImageDraw, text: str, offset: int):
-        text_to_display = text[offset:offset+6] if text else "----FM"
-        draw.text((3, 45), text_to_display, (0, 0, 0), self.font)
+    def _draw_text(self, strip: Image.Image):
+        if strip is self._shown_text:
+            return
+        self._frame.paste(strip, (0, TEXT_AREA_TOP))
+        self._shown_text = strip
+        self.frame_version += 1
 
-    def _draw_icons(self, imgbuf: Image.Image, mic_active: bool, thinking_active: bool, no_response_active: bool, response_active: bool):
-        positions = [(3, 3), (32, 3), (72, 3), (112, 3)]
-        icons = ["mic", "thinking", "no_response", "response"]
+    def _draw_icons(self, mic_active: bool, thinking_active: bool, no_response_active: bool, response_active: bool):
         states = [mic_active, thinking_active, no_response_active, response_active]
 
-        for pos, icon, active in zip(positions, icons, states):
-            imgbuf.paste(self.icons[icon][0] if active else self.icons[icon][1], pos)
+        for pos, icon, active in zip(ICON_POSITIONS, ICON_ORDER, states):
+            if self._shown_icons.get(icon) == active:
+                continue
+            self._frame.paste(self.icons[icon][0] if active else self.icons[icon][1], pos)
+            self._shown_icons[icon] = active
+            self.frame_version += 1
+
+class FrameScheduler:
+    """Paces the display on a fixed timestep using monotonic deadlines.
+
+    Animation ticks happen every tick_interval no matter how long rendering takes; a
+    frame late by more than a tick drops the frames in between, and wait_for_frame
+    reports how many ticks the caller has to catch up on. When rendering keeps using
+    most of the frame interval, frames are only rendered every few ticks (the frame
+    divider), and the rate is raised again once rendering gets cheap enough."""
+
+    def __init__(self, tick_interval: float = DISPLAY_REFRESH_INTERVAL, max_divider: int = FRAME_MAX_DIVIDER) -> Self:
+        self.tick_interval = tick_interval
+        self.max_divider = max_divider
+        self.divider = 1
+        self._lock = threading.Lock()
+        self._origin = None
+        self._tick = 0
+        self._render_time_average = 0.0
+        self._frames_since_adjust = 0
+        self.frames = 0
+        self.missed_deadlines = 0
+        self.dropped_frames = 0
+        self.render_time_total = 0.0
+        self.render_time_max = 0.0
+        self.render_histogram = [0] * (len(RENDER_HISTOGRAM_BOUNDS_MS) + 1)
+
+    def wait_for_frame(self) -> int:
+        """Sleeps until the next frame is due and returns the number of ticks since the previous one."""
+        if self._origin is None:
+            self._origin = time.monotonic()
+            return 1
+
+        deadline = self._origin + (self._tick + self.divider) * self.tick_interval
+        now = time.monotonic()
+        if now < deadline:
+            time.sleep(deadline - now)
+            now = time.monotonic()
+
+        tick = max(self._tick + self.divider, int((now - self._origin) / self.tick_interval))
+        elapsed = tick - self._tick
+        self._tick = tick
+        if elapsed > self.divider:
+            with self._lock:
+                self.missed_deadlines += 1
+                self.dropped_frames += (elapsed - self.divider) // self.divider
+        return elapsed
+
+    def record_render(self, seconds: float):
+        with self._lock:
+            self.frames += 1
+            self.render_time_total += seconds
+            self.render_time_max = max(self.render_time_max, seconds)
+            self.render_histogram[bisect.bisect_left(RENDER_HISTOGRAM_BOUNDS_MS, seconds * 1000)] += 1
+
+        self._render_time_average += FRAME_RENDER_TIME_SMOOTHING * (seconds - self._render_time_average)
+        self._frames_since_adjust += 1
+        if self._frames_since_adjust < FRAME_ADJUST_MIN_FRAMES:
+            return
+
+        frame_interval = self.divider * self.tick_interval
+        if self._render_time_average > FRAME_BUDGET_FRACTION * frame_interval and self.divider < self.max_divider:
+            self.divider += 1
+        elif self.divider > 1 and self._render_time_average < FRAME_RECOVERY_FRACTION * (self.divider - 1) * self.tick_interval:
+            self.divider -= 1
+        else:
+            return
+        self._frames_since_adjust = 0
+        logging.print(f"Display frame rate set to {1 / (self.divider * self.tick_interval):.1f} fps")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            labels = [f"<={bound}ms" for bound in RENDER_HISTOGRAM_BOUNDS_MS] + [f">{RENDER_HISTOGRAM_BOUNDS_MS[-1]}ms"]
+            return {
+                "frames": self.frames,
+                "target_fps": 1 / (self.divider * self.tick_interval),
+                "frame_divider": self.divider,
+                "missed_deadlines": self.missed_deadlines,
+                "dropped_frames": self.dropped_frames,
+                "render_time_mean_ms": self.render_time_total / self.frames * 1000 if self.frames else 0.0,
+                "render_time_max_ms": self.render_time_max * 1000,
+                "render_time_histogram": dict(zip(labels, self.render_histogram))
+            }
 
 class Display(ABC):
     def __init__(self):
@@ -173,6 +381,7 @@ class Display(ABC):
         self._text = None
         self._text_ticks = None
         self._text_duration = None
+        self.scheduler = FrameScheduler()
         self._update_thread = threading.Thread(target=self._update_loop, daemon=True)
 
     @abstractmethod
@@ -205,34 +414,55 @@ class Display(ABC):
     def _render(self):
         pass
 
-    def _update_loop(self):
-        while True:
-            self._render()
+    def get_frame_stats(self) -> dict:
+        return self.scheduler.get_stats()
+
+    def _tick(self):
+        # Update sweep frequency
+        if self._sweep_enabled:
+            sweep_factor = 0.1 if self._sweep_forward else -0.1
+            sweep_value = clamp(round(self._sweep_value + sweep_factor, 1), SWEEP_MIN_FREQUENCY, SWEEP_MAX_FREQUENCY)
+            if sweep_value == SWEEP_MIN_FREQUENCY or sweep_value == SWEEP_MAX_FREQUENCY:
+                self._sweep_forward = not self._sweep_forward
 
-            # Update sweep frequency
-            if self._sweep_enabled:
-                sweep_factor = 0.1 if self._sweep_forward else -0.1
-                sweep_value = clamp(round(self._sweep_value + sweep_factor, 1), 63, 108)
-                if sweep_value == 63 or sweep_value == 108:
-                    self._sweep_forward = not self._sweep_forward
+            self._sweep_value = sweep_value
 
-                self._sweep_value = sweep_value
+        if self._text:
+            self._text_ticks += 1
+            # Disable text after a while if it's supposed to be temporary
+            if self._text_duration and self._text_ticks > self._text_duration:
+                self._text = None
+                self._text_ticks = None
+                self._text_duration = None
 
-            if self._text:
-                self._text_ticks += 1
-                # Disable text after a while if it's supposed to be temporary
-                if self._text_duration and self._text_ticks > self._text_duration:
-                    self._text = None
-                    self._text_ticks = None
-                    self._text_duration = None
+    def _update_loop(self):
+        while True:
+            # Animations advance by every tick that passed, so they keep time even when frames are dropped
+            ticks = self.scheduler.wait_for_frame()
+            for _ in range(ticks - 1):
+                self._tick()
 
-            time.sleep(DISPLAY_REFRESH_INTERVAL)
+            start = time.monotonic()
+            self._render()
+            self.scheduler.record_render(time.monotonic() - start)
+            self._tick()
 
 class TkDisplay(Display):
+    """Shows the display in a Tk window, for desktop development.
+
+    Tk may only be touched from its own thread. The update thread puts a copy of each
+    changed frame in a single slot (a newer frame replaces one that was not shown yet),
+    and the Tk thread picks it up from a root.after() poll and pastes it into the one
+    PhotoImage the label shows."""
+
     def __init__(self):
         super().__init__()
         self.renderer = DisplayRenderer()
         self.root = None
+        self._photo = None
+        self._pending_frame = None
+        self._pending_lock = threading.Lock()
+        self._shown_version = None
         self._display_thread = threading.Thread(target=self._run_display, daemon=True)
 
     def begin(self):
@@ -241,25 +471,46 @@ class TkDisplay(Display):
 
     def _run_display(self):
         self.root = tk.Tk()
-        self.root.geometry("160x80")
+        self.root.geometry(f"{DISPLAY_SIZE[0]}x{DISPLAY_SIZE[1]}")
         self.root.title("GHOSTSNSTUFF-SPIRITBOX WINDISP")
-        self.tklabel = tk.Label(self.root)
+        self._photo = ImageTk.PhotoImage("RGB", DISPLAY_SIZE)
+        self.tklabel = tk.Label(self.root, image=self._photo)
         self.tklabel.pack()
+        self.root.after(TK_POLL_INTERVAL_MS, self._show_pending_frame)
         self.root.mainloop()
 
+    def _show_pending_frame(self):
+        # Runs on the Tk thread
+        with self._pending_lock:
+            frame, self._pending_frame = self._pending_frame, None
+        if frame is not None:
+            self._photo.paste(frame)
+        self.root.after(TK_POLL_INTERVAL_MS, self._show_pending_frame)
+
     def _render(self):
-        if not self.root:
+        frame = self.renderer.render(self)
+        if self.renderer.frame_version == self._shown_version:
             return
-        
-        buffer = ImageTk.PhotoImage(self.renderer.render(self))
-        self.tklabel.config(image=buffer)
-        self.tklabel.image = buffer
+
+        # The renderer reuses its framebuffer, so the Tk thread gets its own copy
+        frame = frame.copy()
+        with self._pending_lock:
+            self._pending_frame = frame
+        self._shown_version = self.renderer.frame_version
 
 class ST7735Display(Display):
-    def __init__(self):
+    """Drives the ST7735 panel, sending only what changed since the last frame.
+
+    The last frame sent is kept as a native (rotated) RGB565 framebuffer. A frame whose
+    hash matches the previous one is not sent at all; otherwise each update region is
+    diffed against the framebuffer and only the bounding box of its changed pixels is
+    written, through the panel's address window. device replaces the st7735 driver,
+    e.g. with debug.fake_st7735.FakeST7735 to run without the hardware."""
+
+    def __init__(self, device=None):
         super().__init__()
         self.renderer = DisplayRenderer()
-        self.display = st7735.ST7735(
+        self.display = device or st7735.ST7735(
             port=ST7735_PORT,
             cs=ST7735_CS,
             dc=ST7735_DC,
@@ -267,13 +518,140 @@ class ST7735Display(Display):
             rotation=ST7735_ROTATION,
             spi_speed_hz=ST7735_SPI_SPEED_HZ
         )
+        self._rotation_steps = ST7735_ROTATION // 90
+        self._framebuffer: np.ndarray | None = None
+        self._frame_hash = None
+        self._regions = [self._native_region(region) for region in ST7735_UPDATE_REGIONS]
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.bytes_sent = 0
+
+    def _native_region(self, region: tuple[int, int, int, int]) -> tuple[slice, slice]:
+        # Rotates a frame rectangle into panel coordinates the same way the frame itself is rotated
+        left, top, right, bottom = region
+        mask = np.zeros((DISPLAY_SIZE[1], DISPLAY_SIZE[0]), dtype=bool)
+        mask[top:bottom, left:right] = True
+        rows, columns = np.nonzero(np.rot90(mask, self._rotation_steps))
+        return slice(rows.min(), rows.max() + 1), slice(columns.min(), columns.max() + 1)
 
     def begin(self):
         return super().begin()
-    
+
+    def _send_window(self, framebuffer: np.ndarray, rows: slice, columns: slice):
+        pixels = np.ascontiguousarray(framebuffer[rows, columns], dtype=">u2").view(np.uint8)
+        self.display.set_window(columns.start, rows.start, columns.stop - 1, rows.stop - 1)
+        self.display.data(pixels.ravel().tolist())
+        self.bytes_sent += pixels.size
+
+    def _render(self):
+        frame = self.renderer.render(self)
+        frame_hash = hashlib.blake2b(frame.tobytes(), digest_size=16).digest()
+        if frame_hash == self._frame_hash:
+            self.frames_skipped += 1
+            return
+        self._frame_hash = frame_hash
+
+        framebuffer = np.rot90(rgb_to_rgb565(np.asarray(frame)), self._rotation_steps)
+        if self._framebuffer is None:
+            self._send_window(framebuffer, slice(0, framebuffer.shape[0]), slice(0, framebuffer.shape[1]))
+        else:
+            changed = framebuffer != self._framebuffer
+            for rows, columns in self._regions:
+                region_changed = changed[rows, columns]
+                changed_rows = np.flatnonzero(region_changed.any(axis=1))
+                if not len(changed_rows):
+                    continue
+                changed_columns = np.flatnonzero(region_changed.any(axis=0))
+                self._send_window(
+                    framebuffer,
+                    slice(rows.start + changed_rows[0], rows.start + changed_rows[-1] + 1),
+                    slice(columns.start + changed_columns[0], columns.start + changed_columns[-1] + 1)
+                )
+
+        self._framebuffer = framebuffer
+        self.frames_sent += 1
+
+class HeadlessDisplay(Display):
+    """Runs the real renderer without a screen, recording what would have been shown.
+
+    Changed frames go to a memory-mapped raw RGB888 framebuffer file (row-major, same
+    layout as DISPLAY_SIZE), which other processes can map and watch, and/or to an
+    append-only frame log of zlib-compressed frames with monotonic timestamps, the
+    render time and the text on screen; read_frame_log reads it back. wait_for_text
+    blocks until a frame showing some text was produced, for timing display latency."""
+
+    def __init__(self, framebuffer_path: Path | None = None, frame_log_path: Path | None = None):
+        super().__init__()
+        self.renderer = DisplayRenderer()
+        self.frames_recorded = 0
+        self._framebuffer = None
+        if framebuffer_path:
+            width, height = DISPLAY_SIZE
+            self._framebuffer = np.memmap(framebuffer_path, dtype=np.uint8, mode="w+", shape=(height, width, 3))
+        self._frame_log = open(frame_log_path, "ab") if frame_log_path else None
+        self._recorded_version = None
+        self._shown_text = None
+        self._shown_text_time = None
+        self._text_condition = threading.Condition()
+
+    def begin(self):
+        super().begin()
+
+    def _visible_text(self) -> str | None:
+        if self._glitch_enabled or not self._text:
+            return None
+        return self._text
+
     def _render(self):
-        buffer = self.renderer.render(self)
-        self.display.display(buffer)
+        start = time.monotonic()
+        text = self._visible_text()
+        frame = self.renderer.render(self)
+        render_time = time.monotonic() - start
+
+        with self._text_condition:
+            if text != self._shown_text:
+                self._shown_text = text
+                self._shown_text_time = start
+                self._text_condition.notify_all()
+
+        if self.renderer.frame_version == self._recorded_version:
+            return
+        self._recorded_version = self.renderer.frame_version
+
+        if self._framebuffer is not None:
+            self._framebuffer[:] = np.asarray(frame)
+        if self._frame_log:
+            encoded_text = (text or "").encode("utf-8")
+            compressed = zlib.compress(frame.tobytes(), 1)
+            self._frame_log.write(FRAME_LOG_HEADER.pack(start, render_time, len(encoded_text), len(compressed)))
+            self._frame_log.write(encoded_text)
+            self._frame_log.write(compressed)
+            self._frame_log.flush()
+        self.frames_recorded += 1
+
+    def wait_for_text(self, content: str, timeout: float | None = None) -> float | None:
+        """Waits until a frame with the given text (as passed to set_text) is recorded and returns its monotonic timestamp."""
+        content = content.replace(" ", "    ")
+        with self._text_condition:
+            if self._text_condition.wait_for(lambda: self._shown_text == content, timeout):
+                return self._shown_text_time
+            return None
+
+    def close(self):
+        if self._framebuffer is not None:
+            self._framebuffer.flush()
+        if self._frame_log:
+            self._frame_log.close()
+            self._frame_log = None
+
+def read_frame_log(path: Path) -> Iterator[tuple[float, float, str, Image.Image]]:
+    """Yields (timestamp, render seconds, text, frame) for every frame in a HeadlessDisplay frame log."""
+    with open(path, "rb") as log:
+        while header := log.read(FRAME_LOG_HEADER.size):
+            timestamp, render_time, text_length, frame_length = FRAME_LOG_HEADER.unpack(header)
+            text = log.read(text_length).decode("utf-8")
+            frame = Image.frombytes("RGB", DISPLAY_SIZE, zlib.decompress(log.read(frame_length)))
+            yield timestamp, render_time, text, frame
 
 class ConsoleDisplay(Display):
     def __init__(self):
@@ -308,7 +686,11 @@ class ConsoleDisplay(Display):
     def _render(self):
         pass
 
-def get_display() -> Display:
+def get_display(framebuffer_path: Path | None = None, frame_log_path: Path | None = None) -> Display:
+    """Passing a framebuffer file and/or frame log path selects the headless recording display."""
+    if framebuffer_path or frame_log_path:
+        return HeadlessDisplay(framebuffer_path, frame_log_path)
+
     if platform.isRaspberryPi():
         if ST7735_AVAILABLE:
             return ST7735Display()
@@ -1,9 +1,22 @@
-import gatt
 import threading
-from typing import Self
+import time
+import bisect
+import random
+import struct
+from collections import deque
+from importlib import metadata
+from typing import Self, Optional, Callable
 from . import platform
+from .. import logging
 from abc import ABC, abstractmethod
 
+try:
+    import gatt
+    import dbus
+    GATT_AVAILABLE = True
+except ImportError:
+    GATT_AVAILABLE = False
+
 SERVICE_UUID = "ad91b201-7347-4047-9e17-3bed82d75f9d"
 RECV_CHARACTERISTIC_UUID = "b6fccb50-87be-44f3-ae22-f85485ea42c4"
 EMF_MAC_ADDRESS = "64:e8:33:8a:2a:0a"
@@ -11,13 +24,83 @@ COMMAND_RESET = 0x00
 COMMAND_SLEEP = 0x01
 COMMAND_SET_ACTIVITY = 0x02
 COMMAND_GLITCH = 0x03
+COMMAND_PLAY_SEQUENCE = 0x04
+EMF_QUEUE_SIZE = 16
+EMF_WRITE_TIMEOUT = 1.0  # Seconds to wait for BlueZ to acknowledge a write before moving on
+WRITE_LATENCY_HISTOGRAM_BOUNDS_MS = [5, 10, 20, 50, 100, 200, 500]
+EMF_CONNECT_TIMEOUT = 15.0  # Seconds for a connection attempt to get to a resolved command characteristic
+EMF_RECONNECT_MIN_DELAY = 1.0
+EMF_RECONNECT_MAX_DELAY = 30.0
+# Largest sequence the meter firmware accepts (a 247 byte MTU minus the 3 byte ATT header).
+# Whether an upload fits a single write is checked against the MTU of the actual connection.
+EMF_SEQUENCE_MAX_BYTES = 244
+ATT_WRITE_HEADER_BYTES = 3
+SEQUENCE_STEP = struct.Struct("<BBH")  # step command, value, delay in ms since the previous step
+GATT_INTERNALS_VERSIONS = ("0.2.",)  # gatt releases whose private characteristic attributes GattCharacteristicAccess relies on
+GATT_INTERNALS = ("_properties", "_object", "_write_value_succeeded", "_write_value_failed")
+
+def _gatt_version() -> Optional[str]:
+    try:
+        return metadata.version("gatt")
+    except metadata.PackageNotFoundError:
+        return None
+
+class GattCharacteristicAccess:
+    """Reads BlueZ properties of a gatt.Characteristic and writes to it without response.
+
+    gatt exposes neither, so this is the one place that uses its private attributes. On a
+    gatt release they were not checked against, or when any is missing, it falls back to
+    the public API: no flags, no MTU and plain write requests, which the driver handles
+    like a meter that does not support writes without response."""
+
+    _fallback_logged = False
+
+    def __init__(self, characteristic) -> Self:
+        self.characteristic = characteristic
+        version = _gatt_version()
+        self.uses_internals = (
+            version is not None and version.startswith(GATT_INTERNALS_VERSIONS)
+            and all(hasattr(characteristic, name) for name in GATT_INTERNALS)
+        )
+        if not self.uses_internals and not GattCharacteristicAccess._fallback_logged:
+            GattCharacteristicAccess._fallback_logged = True
+            logging.warn(f"gatt {version or '(unknown version)'} does not expose the characteristic internals, EMF writes fall back to write requests")
+
+    def get_property(self, name: str, default=None):
+        if not self.uses_internals:
+            return default
+        try:
+            return self.characteristic._properties.Get("org.bluez.GattCharacteristic1", name)
+        except dbus.exceptions.DBusException as ex:
+            logging.warn(f"Could not read {name} of the EMF command characteristic: {ex}")
+            return default
 
-class EMFDevice(gatt.Device):
-    def __init__(self, mac_address, manager, connect_callback) -> Self:
+    def write(self, data: bytes, without_response: bool):
+        """Completes through the device's characteristic_write_value_succeeded or _failed either way."""
+        if not (without_response and self.uses_internals):
+            self.characteristic.write_value(data)
+            return
+
+        # gatt only sends write requests, BlueZ takes the write type as an option
+        self.characteristic._object.WriteValue(
+            [dbus.Byte(b) for b in data],
+            {"type": "command"},
+            reply_handler=self.characteristic._write_value_succeeded,
+            error_handler=self.characteristic._write_value_failed,
+            dbus_interface="org.bluez.GattCharacteristic1"
+        )
+
+class EMFDevice(gatt.Device if GATT_AVAILABLE else object):
+    def __init__(self, mac_address, manager, connect_callback, disconnect_callback, write_callback) -> Self:
         super().__init__(mac_address=mac_address, manager=manager)
         self.is_connected = False
         self.command_characteristic = None
+        self._command_access = None
+        self.supports_write_without_response = False
+        self.mtu = None  # Negotiated ATT MTU, None when BlueZ does not report it
         self.connect_callback = connect_callback
+        self.disconnect_callback = disconnect_callback
+        self.write_callback = write_callback
 
     def connect_succeeded(self):
         super().connect_succeeded()
@@ -27,11 +110,15 @@ class EMFDevice(gatt.Device):
     def connect_failed(self, error):
         super().connect_failed(error)
         print("[%s] Connection failed: %s" % (self.mac_address, str(error)))
+        self.disconnect_callback()
 
     def disconnect_succeeded(self):
         super().disconnect_succeeded()
         print("[%s] Disconnected" % (self.mac_address))
         self.is_connected = False
+        self.command_characteristic = None
+        self._command_access = None
+        self.disconnect_callback()
 
     def services_resolved(self):
         super().services_resolved()
@@ -45,9 +132,147 @@ class EMFDevice(gatt.Device):
                     print("Discovered command channel!")
                     print(self)
                     self.command_characteristic = characteristic
+                    self._command_access = GattCharacteristicAccess(characteristic)
+                    self.supports_write_without_response = "write-without-response" in [str(flag) for flag in self._command_access.get_property("Flags", [])]
+                    # BlueZ 5.62 and later report the MTU negotiated for the connection on the characteristic
+                    mtu = self._command_access.get_property("MTU")
+                    self.mtu = None if mtu is None else int(mtu)
                     self.connect_callback()
 
+    def write_command(self, data: bytes, without_response: bool):
+        """Starts a write to the command characteristic. write_callback is called from the gatt
+        thread with None once BlueZ acknowledges it, or with the error if it fails."""
+        try:
+            self._command_access.write(data, without_response)
+        except dbus.exceptions.DBusException as ex:
+            self.write_callback(ex)
+
+    def characteristic_write_value_succeeded(self, characteristic):
+        super().characteristic_write_value_succeeded(characteristic)
+        self.write_callback(None)
+
+    def characteristic_write_value_failed(self, characteristic, error):
+        super().characteristic_write_value_failed(characteristic, error)
+        self.write_callback(error)
+
+class EMFCommandQueue:
+    """Bounded queue of pending EMF commands that merges the ones a newer command makes pointless.
+
+    A new set_activity replaces a pending one, as only the last level matters, and a glitch
+    is not queued while another is still waiting. Reset and sleep discard everything queued
+    before them. When the queue is full anyway the oldest command is dropped, so callers
+    never wait for the radio."""
+
+    def __init__(self, max_size: int = EMF_QUEUE_SIZE) -> Self:
+        self.max_size = max_size
+        self._commands = deque()
+        self._condition = threading.Condition()
+        self.queued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self._unfinished = 0
+
+    def put(self, command: bytes):
+        with self._condition:
+            self.queued += 1
+            if command[0] in (COMMAND_RESET, COMMAND_SLEEP):
+                self.coalesced += len(self._commands)
+                self._unfinished -= len(self._commands)
+                self._commands.clear()
+            elif any(pending[0] == command[0] for pending, _ in self._commands):
+                if command[0] == COMMAND_GLITCH:
+                    self.coalesced += 1
+                    return
+                self._commands = deque((pending, queued_at) for pending, queued_at in self._commands if pending[0] != command[0])
+                self.coalesced += 1
+                self._unfinished -= 1
+
+            if len(self._commands) >= self.max_size:
+                self._commands.popleft()
+                self.dropped += 1
+                self._unfinished -= 1
+                logging.warn("EMF command queue is full, dropping the oldest command")
+            self._commands.append((command, time.monotonic()))
+            self._unfinished += 1
+            self.max_depth = max(self.max_depth, len(self._commands))
+            self._condition.notify_all()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[tuple[bytes, float]]:
+        """Returns the next command and when it was queued, or None after timeout."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._commands, timeout=timeout):
+                return None
+            return self._commands.popleft()
+
+    def task_done(self):
+        """Marks a command returned by get as handled, like queue.Queue.task_done."""
+        with self._condition:
+            self._unfinished -= 1
+            self._condition.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every queued command has been handled. Returns False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._unfinished == 0, timeout=timeout)
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._commands)
+
+class EMFSequence:
+    """A timed choreography of activity levels and glitches for the EMF meter.
+
+    Built with chained calls, e.g. EMFSequence().activity(6).wait(5).activity(0), and sent
+    with EMFDriver.play_sequence. Uploaded as a single COMMAND_PLAY_SEQUENCE write:
+    the command byte and step count, then per step its command (COMMAND_SET_ACTIVITY or
+    COMMAND_GLITCH), value and the delay in ms since the previous step, little endian.
+    The meter runs the steps with its own timer; any other command stops a running
+    sequence. Waits after the last step are not sent."""
+
+    def __init__(self) -> Self:
+        self.steps: list[tuple[int, int, float]] = []  # command, value, delay in seconds
+        self._pending_delay = 0.0
+
+    def wait(self, seconds: float) -> Self:
+        self._pending_delay += seconds
+        return self
+
+    def activity(self, level: int) -> Self:
+        return self._add(COMMAND_SET_ACTIVITY, level)
+
+    def glitch(self) -> Self:
+        return self._add(COMMAND_GLITCH, 0)
+
+    def _add(self, command: int, value: int) -> Self:
+        if round(self._pending_delay * 1000) > 0xFFFF:
+            raise Exception(f"EMF sequence steps can be at most {0xFFFF / 1000:.1f}s apart")
+        if SEQUENCE_STEP.size * (len(self.steps) + 1) + 2 > EMF_SEQUENCE_MAX_BYTES:
+            raise Exception(f"EMF sequence does not fit in a single {EMF_SEQUENCE_MAX_BYTES} byte write")
+        self.steps.append((command, value, self._pending_delay))
+        self._pending_delay = 0.0
+        return self
+
+    @property
+    def duration(self) -> float:
+        """Seconds from the start of the sequence to its last step."""
+        return sum(delay for _, _, delay in self.steps)
+
+    @property
+    def final_activity(self) -> Optional[int]:
+        levels = [value for command, value, _ in self.steps if command == COMMAND_SET_ACTIVITY]
+        return levels[-1] if levels else None
+
+    def encode(self) -> bytes:
+        return bytes([COMMAND_PLAY_SEQUENCE, len(self.steps)]) + b"".join(
+            SEQUENCE_STEP.pack(command, value, round(delay * 1000)) for command, value, delay in self.steps
+        )
+
 class EMFDriver(ABC):
+    def __init__(self) -> Self:
+        self._sequence_thread = None
+        self._sequence_stop = threading.Event()
+
     @abstractmethod
     def reset(self):
         pass
@@ -64,44 +289,326 @@ class EMFDriver(ABC):
     def glitch(self):
         pass
 
+    def play_sequence(self, sequence: EMFSequence):
+        """Starts a timed sequence and returns right away, stopping one that is still playing.
+        Drivers that cannot hand the whole sequence to the meter play it step by step from a
+        background thread."""
+        self.stop_sequence()
+        stop = self._sequence_stop = threading.Event()
+        self._sequence_thread = threading.Thread(target=self._play_sequence_steps, args=(sequence, stop), daemon=True, name="emf-sequence")
+        self._sequence_thread.start()
+
+    def wait_sequence(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the last sequence started with play_sequence has played its final step. Returns False on timeout."""
+        thread = self._sequence_thread
+        if thread:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def stop_sequence(self):
+        """Stops a sequence played step by step. No step of it is sent once this returns."""
+        self._sequence_stop.set()
+        thread = self._sequence_thread
+        if thread and thread is not threading.current_thread():
+            thread.join()
+
+    def _play_sequence_steps(self, sequence: EMFSequence, stop: threading.Event):
+        for command, value, delay in sequence.steps:
+            if stop.wait(delay):
+                return
+            if command == COMMAND_SET_ACTIVITY:
+                self.set_activity(value)
+            else:
+                self.glitch()
+
 class BluetoothEMFDriver(EMFDriver):
-    def __init__(self):
-        self.manager = gatt.DeviceManager(adapter_name='hci0')
-        self.device = EMFDevice(
-            mac_address=EMF_MAC_ADDRESS, 
-            manager=self.manager,
-            connect_callback=self._on_connect
-        )
-        self.thread = threading.Thread(target=self._run_loop)
-        self.thread.start()
+    """Sends commands to the EMF meter over BLE from a dedicated writer thread.
+
+    Commands are put on an EMFCommandQueue and return immediately; the writer sends one
+    at a time and waits for BlueZ to acknowledge it before the next, using write without
+    response when the characteristic allows it. device replaces the gatt device, e.g. with
+    debug.fake_gatt.FakeEMFDevice to run without the hardware.
+
+    A supervisor thread keeps the connection up: failed attempts and dropped connections
+    are retried with exponential backoff, and after every (re)connect the meter is reset
+    and put back to the last activity level (or sleep) it was asked for.
 
-    def _run_loop(self):
-        self.device.connect()
-        self.manager.run()
+    With sequence_upload, play_sequence sends the whole sequence in one write for the
+    meter to run on its own timer. Meter firmware from before COMMAND_PLAY_SEQUENCE does
+    not know the command, so this is off by default and sequences are played step by step.
+    Sequences that do not fit a single write at the negotiated MTU (or when the MTU is
+    unknown) are played step by step as well."""
+
+    def __init__(self, device=None, sequence_upload: bool = False) -> Self:
+        super().__init__()
+        self.sequence_upload = sequence_upload
+        self._uploaded_sequence_end = 0.0
+        self._uploaded_sequence_duration = 0.0
+        self.commands = EMFCommandQueue()
+        self._write_done = threading.Event()
+        self._write_error = None
+        self._closed = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.written = 0
+        self.write_failures = 0
+        self.write_timeouts = 0
+        self.write_latency_total = 0.0
+        self.write_latency_max = 0.0
+        self.write_latency_histogram = [0] * (len(WRITE_LATENCY_HISTOGRAM_BOUNDS_MS) + 1)
+        self.queue_wait_total = 0.0
+        self._connection = threading.Condition()
+        self._link_state = "disconnected"  # disconnected, connecting or connected
+        self._activity = None
+        self._asleep = False
+        self._started_at = time.monotonic()
+        self._connected_at = None
+        self.connected_time_total = 0.0
+        self.connect_attempts = 0
+        self.connect_failures = 0
+        self.connects = 0
+        self.disconnects = 0
+
+        if device is None:
+            if not GATT_AVAILABLE:
+                raise Exception("gatt is not installed")
+            self.manager = gatt.DeviceManager(adapter_name='hci0')
+            device = EMFDevice(
+                mac_address=EMF_MAC_ADDRESS,
+                manager=self.manager,
+                connect_callback=self._on_connect,
+                disconnect_callback=self._on_disconnect,
+                write_callback=self._on_write_done
+            )
+        else:
+            self.manager = None
+            device.connect_callback = self._on_connect
+            device.disconnect_callback = self._on_disconnect
+            device.write_callback = self._on_write_done
+        self.device = device
+        self.writer_thread = threading.Thread(target=self._write_loop, daemon=True, name="emf-writer")
+        self.writer_thread.start()
+        if self.manager:
+            self.thread = threading.Thread(target=self.manager.run, daemon=True, name="emf-gatt")
+            self.thread.start()
+        self.supervisor_thread = threading.Thread(target=self._supervise_loop, daemon=True, name="emf-supervisor")
+        self.supervisor_thread.start()
+
+    def _supervise_loop(self):
+        # Connecting never happens on the caller's thread, so startup and the game loop go on without the meter
+        delay = EMF_RECONNECT_MIN_DELAY
+        while not self._closed.is_set():
+            with self._connection:
+                self._connection.wait_for(lambda: self._link_state != "connected" or self._closed.is_set())
+                if self._closed.is_set():
+                    return
+
+            if self.connect_attempts:
+                self._release_device()
+            with self._connection:
+                self._link_state = "connecting"
+                self.connect_attempts += 1
+            self.device.connect()
+            with self._connection:
+                self._connection.wait_for(lambda: self._link_state != "connecting" or self._closed.is_set(), timeout=EMF_CONNECT_TIMEOUT)
+                connected = self._link_state == "connected"
+                if not connected:
+                    self.connect_failures += 1
+                    self._link_state = "disconnected"
+
+            if connected:
+                delay = EMF_RECONNECT_MIN_DELAY
+                continue
+            logging.warn(f"Could not connect to the EMF meter, retrying in {delay:.1f}s")
+            self._closed.wait(random.uniform(delay / 2, delay))
+            delay = min(delay * 2, EMF_RECONNECT_MAX_DELAY)
+
+    def _release_device(self):
+        # gatt.Device.connect() subscribes to BlueZ signals that only disconnect() removes, so every
+        # attempt after the first starts from a released device. This also drops a connection whose
+        # command characteristic never showed up.
+        try:
+            self.device.disconnect()
+        except Exception as ex:
+            logging.warn(f"Could not release the previous EMF meter connection: {ex}")
 
     def _on_connect(self):
-        print("Calling reset")
-        self.reset()
+        with self._connection:
+            if self._link_state == "connected":
+                return
+            self._link_state = "connected"
+            self._connected_at = time.monotonic()
+            self.connects += 1
+            self._connection.notify_all()
+
+        # The meter starts from scratch after a reconnect, so it gets the state it was last asked for
+        self.commands.put(bytes([COMMAND_RESET]))
+        if self._asleep:
+            self.commands.put(bytes([COMMAND_SLEEP]))
+        elif self._activity is not None:
+            self.commands.put(bytes([COMMAND_SET_ACTIVITY, self._activity]))
+        logging.print(f"EMF meter connected, restoring {'sleep' if self._asleep else f'activity level {self._activity}'}")
+
+    def _on_disconnect(self):
+        with self._connection:
+            if self._link_state == "connected":
+                self.disconnects += 1
+                self.connected_time_total += time.monotonic() - self._connected_at
+                self._connected_at = None
+                logging.warn("EMF meter disconnected")
+            self._link_state = "disconnected"
+            self._connection.notify_all()
+
+    def _on_write_done(self, error):
+        self._write_error = error
+        self._write_done.set()
+
+    def _write_loop(self):
+        while not self._closed.is_set():
+            item = self.commands.get(timeout=0.5)
+            if item is None:
+                continue
+
+            command, queued_at = item
+            try:
+                if self.device.command_characteristic:
+                    self._write(command, queued_at)
+            finally:
+                self.commands.task_done()
+
+    def _write(self, command: bytes, queued_at: float):
+        self._write_done.clear()
+        self._write_error = None
+        start = time.monotonic()
+        self.device.write_command(command, self.device.supports_write_without_response)
+        acknowledged = self._write_done.wait(EMF_WRITE_TIMEOUT)
+        latency = time.monotonic() - start
+
+        with self._stats_lock:
+            if not acknowledged:
+                self.write_timeouts += 1
+            elif self._write_error is not None:
+                self.write_failures += 1
+            else:
+                self.written += 1
+                if command[0] == COMMAND_PLAY_SEQUENCE:
+                    self._uploaded_sequence_end = time.monotonic() + self._uploaded_sequence_duration
+                self.queue_wait_total += start - queued_at
+                self.write_latency_total += latency
+                self.write_latency_max = max(self.write_latency_max, latency)
+                self.write_latency_histogram[bisect.bisect_left(WRITE_LATENCY_HISTOGRAM_BOUNDS_MS, latency * 1000)] += 1
+        if not acknowledged:
+            logging.warn(f"EMF command {command.hex()} was not acknowledged within {EMF_WRITE_TIMEOUT}s")
+        elif self._write_error is not None:
+            logging.warn(f"EMF command {command.hex()} failed: {self._write_error}")
 
     def _write_buffer(self, data: list[int]) -> bool:
-        arr = bytearray(data)
         if not self.device.command_characteristic:
             return False
-        
-        self.device.command_characteristic.write_value(arr)
+
+        self.commands.put(bytes(data))
         return True
 
     def reset(self):
+        self._activity = None
+        self._asleep = False
         return self._write_buffer([COMMAND_RESET])
     
     def sleep(self):
+        self._asleep = True
         return self._write_buffer([COMMAND_SLEEP])
     
     def set_activity(self, level):
+        # Remembered even while disconnected, it is restored once the meter is back
+        self._activity = level
+        self._asleep = False
         return self._write_buffer([COMMAND_SET_ACTIVITY, level])
     
     def glitch(self):
         return self._write_buffer([COMMAND_GLITCH])
+
+    def play_sequence(self, sequence: EMFSequence):
+        if not self.sequence_upload:
+            return super().play_sequence(sequence)
+
+        data = sequence.encode()
+        mtu = self.device.mtu
+        if mtu is None or len(data) > mtu - ATT_WRITE_HEADER_BYTES:
+            logging.warn(f"EMF sequence of {len(data)} bytes does not fit a single write at MTU {mtu or 'unknown'}, playing it step by step")
+            return super().play_sequence(sequence)
+
+        self.stop_sequence()
+        if sequence.final_activity is not None:
+            self._activity = sequence.final_activity
+            self._asleep = False
+        if not self._write_buffer(data):
+            return False
+        # The meter starts the sequence once the write gets through, _write moves the end once it is acknowledged
+        self._uploaded_sequence_duration = sequence.duration
+        self._uploaded_sequence_end = time.monotonic() + sequence.duration
+        return True
+
+    def wait_sequence(self, timeout: Optional[float] = None) -> bool:
+        # An uploaded sequence runs on the meter, so this waits for the write and then for its duration
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not super().wait_sequence(timeout) or not self.flush(None if deadline is None else max(0.0, deadline - time.monotonic())):
+            return False
+        end = self._uploaded_sequence_end if deadline is None else min(self._uploaded_sequence_end, deadline)
+        self._closed.wait(max(0.0, end - time.monotonic()))
+        return time.monotonic() >= self._uploaded_sequence_end
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Waits until every queued command has been written. Returns False on timeout."""
+        return self.commands.join(timeout)
+
+    def is_connected(self) -> bool:
+        with self._connection:
+            return self._link_state == "connected"
+
+    def close(self):
+        with self._connection:
+            self._closed.set()
+            self._connection.notify_all()
+        self.supervisor_thread.join()
+        self.writer_thread.join()
+
+    def get_connection_stats(self) -> dict:
+        with self._connection:
+            now = time.monotonic()
+            uptime = now - self._connected_at if self._connected_at is not None else 0.0
+            return {
+                "connected": self._link_state == "connected",
+                "uptime_seconds": uptime,
+                "connected_fraction": (self.connected_time_total + uptime) / max(now - self._started_at, 1e-9),
+                "connect_attempts": self.connect_attempts,
+                "connect_failures": self.connect_failures,
+                "reconnects": max(0, self.connects - 1),
+                "disconnects": self.disconnects,
+                "activity_level": self._activity,
+                "asleep": self._asleep
+            }
+
+    def get_stats(self) -> dict:
+        connection = self.get_connection_stats()
+        with self._stats_lock:
+            labels = [f"<={bound}ms" for bound in WRITE_LATENCY_HISTOGRAM_BOUNDS_MS] + [f">{WRITE_LATENCY_HISTOGRAM_BOUNDS_MS[-1]}ms"]
+            return {
+                **connection,
+                "write_without_response": self.device.supports_write_without_response,
+                "mtu": self.device.mtu,
+                "queue_depth": len(self.commands),
+                "max_queue_depth": self.commands.max_depth,
+                "queued": self.commands.queued,
+                "coalesced": self.commands.coalesced,
+                "dropped": self.commands.dropped,
+                "written": self.written,
+                "write_failures": self.write_failures,
+                "write_timeouts": self.write_timeouts,
+                "queue_wait_mean_ms": self.queue_wait_total / self.written * 1000 if self.written else 0.0,
+                "write_latency_mean_ms": self.write_latency_total / self.written * 1000 if self.written else 0.0,
+                "write_latency_max_ms": self.write_latency_max * 1000,
+                "write_latency_histogram": dict(zip(labels, self.write_latency_histogram))
+            }
     
 class DummyEMFDriver(EMFDriver):
     def reset(self):
@@ -116,9 +623,9 @@ class DummyEMFDriver(EMFDriver):
     def glitch(self):
         print(f"EMF glitch called")
     
-def get_emf_driver() -> EMFDriver:
+def get_emf_driver(sequence_upload: bool = False) -> EMFDriver:
     try:
-        return BluetoothEMFDriver()
+        return BluetoothEMFDriver(sequence_upload=sequence_upload)
     except Exception as ex:
         print(f"Failed to initialize bluetooth EMF driver: {ex}")
         print("Falling back to dummy EMF driver")
@@ -0,0 +1,110 @@
+import numpy as np
+from collections import deque
+from typing import Self, Literal, Optional
+
+EndpointEvent = Literal["start", "end"]
+
+ENDPOINT_START_WINDOW_FRAMES = 10
+ENDPOINT_START_VOICED_FRAMES = 6
+ENDPOINT_MIN_HANGOVER_MS = 600  # The learned hangover stays within 200 ms of the default at the very least
+ENDPOINT_DEFAULT_HANGOVER_MS = 800
+ENDPOINT_MAX_HANGOVER_MS = 1500
+ENDPOINT_ENERGY_MARGIN_DB = 6.0
+ENDPOINT_NOISE_FLOOR_RATE = 0.05
+ENDPOINT_PAUSE_HISTORY = 32
+ENDPOINT_PAUSE_HEADROOM = 1.5
+ENDPOINT_MIN_LEARNED_PAUSES = 8  # Pauses to see before the learned hangover replaces the default
+
+
+def frame_energy_db(frame: np.ndarray) -> float:
+    """RMS level of an int16 frame in dBFS."""
+    rms = np.sqrt(np.mean(np.square(frame, dtype=np.float32))) / 32768.0
+    return float(20 * np.log10(rms + 1e-10))
+
+
+class Endpointer:
+    """Decides where an utterance starts and ends from per-frame VAD decisions.
+
+    A frame only counts as voiced if the VAD says so and it is louder than the tracked
+    noise floor by a margin. Speech starts once most of a short window of frames is voiced.
+    The silence needed to end a turn (the hangover) is learned from the pauses the speaker
+    makes mid-utterance once enough of them were seen, and clamped between a minimum a
+    little below the default and the old fixed 1.5 s, so a few short pauses cannot cut a
+    slow speaker off. Until then every utterance gets the default hangover: pauses longer
+    than the hangover in use are never observed, so starting out shorter would keep the
+    learned value from ever growing past it."""
+
+    def __init__(
+        self,
+        frame_duration_ms: int,
+        start_window_frames: int = ENDPOINT_START_WINDOW_FRAMES,
+        start_voiced_frames: int = ENDPOINT_START_VOICED_FRAMES,
+        min_hangover_ms: int = ENDPOINT_MIN_HANGOVER_MS,
+        default_hangover_ms: int = ENDPOINT_DEFAULT_HANGOVER_MS,
+        max_hangover_ms: int = ENDPOINT_MAX_HANGOVER_MS,
+        energy_margin_db: float = ENDPOINT_ENERGY_MARGIN_DB
+    ) -> Self:
+        self.frame_duration_ms = frame_duration_ms
+        self.start_voiced_frames = start_voiced_frames
+        self.min_hangover_frames = self._frames(min_hangover_ms)
+        self.default_hangover_frames = self._frames(default_hangover_ms)
+        self.max_hangover_frames = self._frames(max_hangover_ms)
+        self.energy_margin_db = energy_margin_db
+        self.noise_floor_db: Optional[float] = None
+        self._recent = deque(maxlen=start_window_frames)
+        self._pauses = deque(maxlen=ENDPOINT_PAUSE_HISTORY)
+        self.reset()
+
+    def _frames(self, milliseconds: int) -> int:
+        return max(1, round(milliseconds / self.frame_duration_ms))
+
+    def reset(self):
+        """Forgets the current utterance. Noise floor and pause statistics are kept."""
+        self.in_speech = False
+        self._recent.clear()
+        self._silence_frames = 0
+        self._voiced_frames = 0
+
+    @property
+    def hangover_frames(self) -> int:
+        if len(self._pauses) < ENDPOINT_MIN_LEARNED_PAUSES:
+            return self.default_hangover_frames
+        # Pauses longer than the current hangover are never observed, so leave headroom
+        # above the 90th percentile; this lets the hangover grow for slow speakers
+        hangover = int(np.percentile(self._pauses, 90) * ENDPOINT_PAUSE_HEADROOM) + 2
+        return min(max(hangover, self.min_hangover_frames), self.max_hangover_frames)
+
+    def _update_noise_floor(self, energy_db: float):
+        if self.noise_floor_db is None or energy_db < self.noise_floor_db:
+            self.noise_floor_db = energy_db
+        else:
+            self.noise_floor_db += ENDPOINT_NOISE_FLOOR_RATE * (energy_db - self.noise_floor_db)
+
+    def process(self, frame: np.ndarray, is_speech: bool) -> Optional[EndpointEvent]:
+        """Feeds one frame and its VAD decision, returns "start"/"end" when the utterance state changes."""
+        energy_db = frame_energy_db(frame)
+        voiced = is_speech and (self.noise_floor_db is None or energy_db > self.noise_floor_db + self.energy_margin_db)
+        if not voiced:
+            self._update_noise_floor(energy_db)
+
+        if not self.in_speech:
+            self._recent.append(voiced)
+            if sum(self._recent) >= self.start_voiced_frames:
+                self.in_speech = True
+                self._voiced_frames = sum(self._recent)
+                self._silence_frames = 0
+                return "start"
+            return None
+
+        if voiced:
+            if self._silence_frames >= 2:
+                self._pauses.append(self._silence_frames)
+            self._silence_frames = 0
+            self._voiced_frames += 1
+            return None
+
+        self._silence_frames += 1
+        if self._silence_frames >= self.hangover_frames:
+            self.reset()
+            return "end"
+        return None
@@ -0,0 +1,150 @@
+import time
+import threading
+import numpy as np
+import webrtcvad
+from typing import Self, Optional, Dict, Tuple
+from .microphone import Microphone
+from .speaker import AudioDriver
+from .. import logging
+
+GATE_FRAME_DURATION_MS = 30
+GATE_VAD_MODE = 3
+GATE_RELEASE_SECONDS = 0.5
+GATE_MIN_DURATION_SECONDS = 0.3
+GATE_MIN_VOICED_RATIO = 0.3
+GATE_MIN_ENERGY_DB = -45.0
+
+
+class GatedMicrophone(Microphone):
+    """Filters what a microphone hears before it reaches STT.
+
+    While the speaker plays the box's own audio (ghost speech, beeps) and for a short
+    release time afterwards, the wrapped microphone is told to ignore its input, so the
+    box does not answer itself. The interference loop is not gated as it plays for the
+    whole game. Utterances that do get through are dropped when they are too short, too
+    quiet or mostly unvoiced, which catches coughs, bumps and bursts of interference.
+    A suppression callback registered on the gate is chained: input is also ignored
+    while it returns True."""
+
+    def __init__(
+        self,
+        mic: Microphone,
+        speaker: AudioDriver,
+        release_seconds: float = GATE_RELEASE_SECONDS,
+        min_duration_seconds: float = GATE_MIN_DURATION_SECONDS,
+        min_voiced_ratio: float = GATE_MIN_VOICED_RATIO,
+        min_energy_db: float = GATE_MIN_ENERGY_DB
+    ) -> Self:
+        self.mic = mic
+        self.speaker = speaker
+        self.release_seconds = release_seconds
+        self.min_duration_seconds = min_duration_seconds
+        self.min_voiced_ratio = min_voiced_ratio
+        self.min_energy_db = min_energy_db
+        self.vad = webrtcvad.Vad(GATE_VAD_MODE)
+        self.accepted = 0
+        self.suppressed_frames = 0
+        self.rejected_too_short = 0
+        self.rejected_low_energy = 0
+        self.rejected_low_voiced_ratio = 0
+        self._lock = threading.Lock()
+        self._release_until = 0.0
+        self._suppression_callback = None
+        self.mic.register_suppression_callback(self._is_suppressed)
+
+    def _is_suppressed(self) -> bool:
+        # Called by the microphone for every captured frame
+        now = time.monotonic()
+        playing = self.speaker.is_playing()
+        if playing:
+            self._release_until = now + self.release_seconds
+        callback = self._suppression_callback
+        if not playing and now >= self._release_until and not (callback and callback()):
+            return False
+
+        with self._lock:
+            self.suppressed_frames += 1
+        return True
+
+    def _voiced_ratio(self, buffer: np.ndarray, sample_rate: int) -> float:
+        frame_size = sample_rate * GATE_FRAME_DURATION_MS // 1000
+        frame_count = len(buffer) // frame_size
+        if not frame_count:
+            return 0.0
+
+        pcm = (np.clip(buffer[:frame_count * frame_size], -1.0, 1.0) * 32767).astype(np.int16)
+        voiced = sum(
+            self.vad.is_speech(frame.tobytes(), sample_rate)
+            for frame in pcm.reshape(frame_count, frame_size)
+        )
+        return voiced / frame_count
+
+    def _check(self, buffer: np.ndarray) -> Optional[str]:
+        """Returns why the buffer should be rejected, or None to accept it."""
+        sample_rate = self.mic.get_sample_rate()
+        duration = len(buffer) / sample_rate
+        if duration < self.min_duration_seconds:
+            return "too_short"
+
+        energy_db = 20 * np.log10(np.sqrt(np.mean(np.square(buffer, dtype=np.float32))) + 1e-10)
+        if energy_db < self.min_energy_db:
+            return "low_energy"
+
+        if self._voiced_ratio(buffer, sample_rate) < self.min_voiced_ratio:
+            return "low_voiced_ratio"
+        return None
+
+    def await_buffer(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            buffer = self.mic.await_buffer(timeout=remaining)
+            if buffer is None:
+                return None
+
+            reason = self._check(buffer)
+            with self._lock:
+                if reason is None:
+                    self.accepted += 1
+                    return buffer
+                elif reason == "too_short":
+                    self.rejected_too_short += 1
+                elif reason == "low_energy":
+                    self.rejected_low_energy += 1
+                else:
+                    self.rejected_low_voiced_ratio += 1
+            logging.print(f"Rejected a {len(buffer) / self.mic.get_sample_rate():.2f}s capture before STT ({reason})")
+
+    def discard_buffers(self):
+        self.mic.discard_buffers()
+
+    def get_last_utterance_span(self) -> Optional[Tuple[float, float]]:
+        return self.mic.get_last_utterance_span()
+
+    def get_speech_start(self) -> Optional[float]:
+        return self.mic.get_speech_start()
+
+    def register_icon_callback(self, callback):
+        self.mic.register_icon_callback(callback)
+
+    def unregister_icon_callback(self):
+        self.mic.unregister_icon_callback()
+
+    def register_suppression_callback(self, callback):
+        self._suppression_callback = callback
+
+    def unregister_suppression_callback(self):
+        self._suppression_callback = None
+
+    def get_sample_rate(self) -> int:
+        return self.mic.get_sample_rate()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "accepted": self.accepted,
+                "suppressed_frames": self.suppressed_frames,
+                "rejected_too_short": self.rejected_too_short,
+                "rejected_low_energy": self.rejected_low_energy,
+                "rejected_low_voiced_ratio": self.rejected_low_voiced_ratio
+            }
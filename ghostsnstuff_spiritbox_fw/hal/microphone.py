@@ -1,29 +1,63 @@
-import pyaudio
 import numpy as np
+import soundfile as sf
 import webrtcvad
-import collections
+import queue
 import threading
 import time
+from collections import deque
+from math import gcd
+from pathlib import Path
+from typing import Optional, Iterable, List, Tuple
 from abc import ABC, abstractmethod
+from scipy.signal import resample_poly
+from .buffers import HistoryBuffer, GrowableBuffer
+from .endpointing import Endpointer, ENDPOINT_START_WINDOW_FRAMES
+from .. import logging
+
+try:
+    import pyaudio
+    PYAUDIO_AVAILABLE = True
+except ImportError:
+    PYAUDIO_AVAILABLE = False
 
 # Constants for audio settings
 MIC_SAMPLE_RATE = 16000
 MIC_CHANNELS = 1
 MIC_PREBUFFER_SECONDS = 1
-MIC_PA_FORMAT = pyaudio.paInt16
+MIC_PA_FORMAT = pyaudio.paInt16 if PYAUDIO_AVAILABLE else None
 MIC_NP_FORMAT = np.int16
 MIC_FRAME_DURATION_MS = 30
 MIC_FRAME_SIZE = int(MIC_SAMPLE_RATE * (MIC_FRAME_DURATION_MS / 1000))
 MIC_CIRCULAR_BUFFER_SIZE = MIC_SAMPLE_RATE * MIC_PREBUFFER_SECONDS
 MIC_VAD_MODE = 3
-REQUIRED_VOICED_FRAMES = 30
-REQUIRED_UNVOICED_FRAMES = 50
+REQUIRED_UNVOICED_FRAMES = 50  # Upper bound for the adaptive end-of-turn hangover
+MIC_TRIM_MARGIN_SECONDS = 0.2
+MIC_RESULT_PREALLOC_SECONDS = 30
+MIC_UTTERANCE_QUEUE_SIZE = 8
+REPLAY_TRAILING_SILENCE_SECONDS = 2.0  # Longer than the maximum hangover, so every file ends its utterance
+REPLAY_POLL_INTERVAL = 0.1
+REPLAY_PLAYLIST_SUFFIXES = (".m3u", ".txt")
 
 
 class Microphone(ABC):
     @abstractmethod
-    def await_buffer(self):
-        """Waits for a voice-activated audio buffer and returns the captured audio."""
+    def await_buffer(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """Waits for a voice-activated audio buffer and returns the captured audio, or None after timeout seconds."""
+        pass
+
+    @abstractmethod
+    def discard_buffers(self):
+        """Drops utterances that were captured but not yet returned by await_buffer."""
+        pass
+
+    @abstractmethod
+    def get_last_utterance_span(self) -> Optional[Tuple[float, float]]:
+        """Returns when the speech in the last buffer returned by await_buffer started and ended, in seconds of capture time."""
+        pass
+
+    @abstractmethod
+    def get_speech_start(self) -> Optional[float]:
+        """Returns when the utterance being captured right now started, in seconds of capture time, or None while nobody speaks."""
         pass
 
     @abstractmethod
@@ -36,89 +70,205 @@ class Microphone(ABC):
         """Unregisters the VAD state change callback function."""
         pass
 
+    @abstractmethod
+    def register_suppression_callback(self, callback):
+        """Registers a callback polled for every captured frame. While it returns True the input is ignored."""
+        pass
+
+    @abstractmethod
+    def unregister_suppression_callback(self):
+        """Unregisters the suppression callback function."""
+        pass
+
     @abstractmethod
     def get_sample_rate(self) -> int:
         """returns the sample rate in Hz"""
         pass
 
 
-class PaMicrophone(Microphone):
-    def __init__(self):
-        self.pa = pyaudio.PyAudio()
+class VadMicrophone(Microphone):
+    """Turns a stream of 16 kHz int16 frames into a queue of utterances.
+
+    Subclasses only provide the frames: _open_source starts pushing raw frame bytes
+    through _push_frame (from any thread) and _close_source stops it. VAD, endpointing
+    and trimming run on a capture thread owned by this class. Capture time counts the
+    samples received since the microphone was created, so utterance timestamps stay
+    comparable even when a replay runs faster than real time."""
+
+    def __init__(self, trim_margin_seconds: float | None = MIC_TRIM_MARGIN_SECONDS):
+        """trim_margin_seconds is the silence kept around the voiced part of a capture, None disables trimming."""
+        self.trim_margin_seconds = trim_margin_seconds
         self.vad = webrtcvad.Vad(MIC_VAD_MODE)
-        self.circular_buffer = collections.deque(maxlen=MIC_CIRCULAR_BUFFER_SIZE)
+        self.endpointer = Endpointer(
+            frame_duration_ms=MIC_FRAME_DURATION_MS,
+            max_hangover_ms=REQUIRED_UNVOICED_FRAMES * MIC_FRAME_DURATION_MS
+        )
+        self.circular_buffer = HistoryBuffer(MIC_CIRCULAR_BUFFER_SIZE, dtype=MIC_NP_FORMAT)
         self._icon_callback = None
-        self._buffer_lock = threading.Lock()
-        self._recording_event = threading.Event()
-        self._result_buffer = np.array([], dtype=MIC_NP_FORMAT)
+        self._suppression_callback = None
+        self._frames = queue.Queue()
+        self._utterances = queue.Queue(maxsize=MIC_UTTERANCE_QUEUE_SIZE)
+        self._capture_thread = None
+        self._capture_stopped = threading.Event()
+        self._stream_lock = threading.Lock()
+        self._recording = False
+        self._result_buffer = GrowableBuffer(MIC_RESULT_PREALLOC_SECONDS * MIC_SAMPLE_RATE, dtype=MIC_NP_FORMAT)
+        self._samples_received = 0
+        self._recording_start = 0
+        self._voiced_frame_ends = deque()
+        self._speech_start = None  # Sample index, only set while an utterance is recorded
+        self._last_span = None
+        self.last_trim = (0.0, 0.0)
 
-    def _mic_callback(self, in_data, frame_count, time_info, status_flags):
-        audio_frame = np.frombuffer(in_data, dtype=MIC_NP_FORMAT)
-        
-        with self._buffer_lock:
-            self.circular_buffer.extend(audio_frame)
-        
-        if self._recording_event.is_set():
-            self._result_buffer = np.append(self._result_buffer, audio_frame)
+    @abstractmethod
+    def _open_source(self):
+        pass
 
-        return (None, pyaudio.paContinue)
+    @abstractmethod
+    def _close_source(self):
+        pass
+
+    def _push_frame(self, in_data: bytes | None):
+        # All processing happens on the capture thread, frame by frame, in capture order.
+        # None stops the capture thread once the frames before it are processed.
+        self._frames.put(in_data)
+
+    def _process_frame(self, audio_frame: np.ndarray) -> bool:
+        """Buffers one captured frame and runs VAD/endpointing on it. Returns True once the utterance has ended."""
+        self.circular_buffer.append(audio_frame)
+        self._samples_received += len(audio_frame)
+        if self._recording:
+            self._result_buffer.append(audio_frame)
+
+        # webrtcvad only accepts exact 10/20/30 ms frames
+        if len(audio_frame) != MIC_FRAME_SIZE:
+            return False
+
+        if self._suppression_callback and self._suppression_callback():
+            if self._recording:
+                self._recording = False
+                self._speech_start = None
+                logging.print("Discarded a capture that overlapped suppressed input")
+            self.endpointer.reset()
+            if self._icon_callback:
+                self._icon_callback(False)
+            return False
 
-    def _detect_vad(self):
-        num_voiced_frames = 0
-        num_unvoiced_frames = 0
+        is_speech = self.vad.is_speech(audio_frame.tobytes(), MIC_SAMPLE_RATE)
+        if is_speech:
+            self._voiced_frame_ends.append(self._samples_received)
+        if not self._recording:
+            # Only voiced frames still inside the pre-roll can end up in the next capture
+            while self._voiced_frame_ends and self._voiced_frame_ends[0] <= self._samples_received - self.circular_buffer.capacity:
+                self._voiced_frame_ends.popleft()
+        if self._icon_callback:
+            self._icon_callback(is_speech)
 
+        event = self.endpointer.process(audio_frame, is_speech)
+        if event == "start":
+            # The pre-roll (which already includes this frame) becomes the start of the recording
+            self._recording = True
+            self._recording_start = self._samples_received - len(self.circular_buffer)
+            self._result_buffer.clear()
+            self._result_buffer.append(self.circular_buffer.latest(len(self.circular_buffer)))
+            # Speech started with the first voiced frame of the window that triggered the start
+            window_start = self._samples_received - ENDPOINT_START_WINDOW_FRAMES * MIC_FRAME_SIZE
+            self._speech_start = next(end for end in self._voiced_frame_ends if end > window_start) - MIC_FRAME_SIZE
+        elif event == "end":
+            self._recording = False
+            return True
+        return False
+
+    def _capture_loop(self):
+        self.endpointer.reset()
         while True:
-            time.sleep(MIC_FRAME_DURATION_MS / 1000.0)
-            
-            with self._buffer_lock:
-                if len(self.circular_buffer) < MIC_FRAME_SIZE:
-                    continue
-                
-                frame = np.array(self.circular_buffer)[-MIC_FRAME_SIZE:]
-                is_speech = self.vad.is_speech(frame.tobytes(), MIC_SAMPLE_RATE)
-            
-            if is_speech:
-                if self._icon_callback:
-                    self._icon_callback(True)
-                num_voiced_frames += 1
-                num_unvoiced_frames = 0
-
-                if num_voiced_frames >= REQUIRED_VOICED_FRAMES and not self._recording_event.is_set():
-                    with self._buffer_lock:
-                        self._recording_event.set()
-                        self._result_buffer = np.append(np.array(self.circular_buffer, dtype=MIC_NP_FORMAT), self._result_buffer)
-            else:
-                if self._icon_callback:
-                    self._icon_callback(False)
-                if self._recording_event.is_set():
-                    num_unvoiced_frames += 1
-                    if num_unvoiced_frames >= REQUIRED_UNVOICED_FRAMES:
-                        self._recording_event.clear()
-                        break
-                else:
-                    num_unvoiced_frames += 1
-
-    def await_buffer(self):
-        self._result_buffer = np.array([], dtype=MIC_NP_FORMAT)
-        stream = self.pa.open(
-            format=MIC_PA_FORMAT,
-            channels=MIC_CHANNELS,
-            rate=MIC_SAMPLE_RATE,
-            input=True,
-            frames_per_buffer=MIC_FRAME_SIZE,
-            stream_callback=self._mic_callback
+            in_data = self._frames.get()
+            if in_data is None:
+                break
+            if self._process_frame(np.frombuffer(in_data, dtype=MIC_NP_FORMAT)):
+                span = (self._speech_start / MIC_SAMPLE_RATE, self._voiced_frame_ends[-1] / MIC_SAMPLE_RATE)
+                self._speech_start = None
+                self._queue_utterance(self._trim_silence(self._result_buffer.view()).astype(np.float32) / 32768.0, span)
+        self._recording = False
+        self._speech_start = None
+        self._capture_stopped.set()
+
+    def _queue_utterance(self, buffer: np.ndarray, span: Tuple[float, float]):
+        # Capture must never wait for the consumer, so a full queue loses its oldest utterance instead
+        while True:
+            try:
+                self._utterances.put_nowait((buffer, span))
+                return
+            except queue.Full:
+                try:
+                    self._utterances.get_nowait()
+                    logging.warn("Utterance queue is full, dropping the oldest utterance")
+                except queue.Empty:
+                    pass
+
+    def start(self):
+        """Starts capturing. Utterances keep being queued until close()."""
+        with self._stream_lock:
+            if self._capture_thread:
+                return
+
+            self._capture_stopped.clear()
+            self._capture_thread = threading.Thread(target=self._capture_loop, daemon=True, name="mic-capture")
+            self._capture_thread.start()
+            self._open_source()
+
+    def close(self):
+        with self._stream_lock:
+            if not self._capture_thread:
+                return
+
+            self._close_source()
+            self._push_frame(None)
+            self._capture_thread.join()
+            self._capture_thread = None
+
+    def _trim_silence(self, buffer: np.ndarray) -> np.ndarray:
+        """Cuts the pre-roll and the end-of-turn hangover down to the voiced frames plus a margin."""
+        voiced = [end - self._recording_start for end in self._voiced_frame_ends if end > self._recording_start]
+        if self.trim_margin_seconds is None or not voiced:
+            self.last_trim = (0.0, 0.0)
+            return buffer
+
+        margin = int(self.trim_margin_seconds * MIC_SAMPLE_RATE)
+        start = max(0, voiced[0] - MIC_FRAME_SIZE - margin)
+        end = min(len(buffer), voiced[-1] + margin)
+        if end <= start:
+            self.last_trim = (0.0, 0.0)
+            return buffer
+
+        self.last_trim = (start / MIC_SAMPLE_RATE, (len(buffer) - end) / MIC_SAMPLE_RATE)
+        logging.print(
+            f"Trimmed {self.last_trim[0] + self.last_trim[1]:.2f}s of silence from a {len(buffer) / MIC_SAMPLE_RATE:.2f}s capture "
+            f"({self.last_trim[0]:.2f}s leading, {self.last_trim[1]:.2f}s trailing)"
         )
+        return buffer[start:end]
 
-        stream.start_stream()
-        self._detect_vad()
+    def await_buffer(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        self.start()
+        try:
+            buffer, self._last_span = self._utterances.get(timeout=timeout)
+            return buffer
+        except queue.Empty:
+            return None
 
-        while self._recording_event.is_set():
-            time.sleep(0.1)
+    def discard_buffers(self):
+        while True:
+            try:
+                self._utterances.get_nowait()
+            except queue.Empty:
+                return
 
-        stream.stop_stream()
-        stream.close()
+    def get_last_utterance_span(self) -> Optional[Tuple[float, float]]:
+        return self._last_span
 
-        return self._result_buffer.astype(np.float32) / 32768.0
+    def get_speech_start(self) -> Optional[float]:
+        speech_start = self._speech_start
+        return None if speech_start is None else speech_start / MIC_SAMPLE_RATE
 
     def register_icon_callback(self, callback):
         self._icon_callback = callback
@@ -126,9 +276,145 @@ class PaMicrophone(Microphone):
     def unregister_icon_callback(self):
         self._icon_callback = None
 
+    def register_suppression_callback(self, callback):
+        self._suppression_callback = callback
+
+    def unregister_suppression_callback(self):
+        self._suppression_callback = None
+
     def get_sample_rate(self) -> int:
         return MIC_SAMPLE_RATE
 
 
-def get_microphone() -> Microphone:
+class PaMicrophone(VadMicrophone):
+    def __init__(self, trim_margin_seconds: float | None = MIC_TRIM_MARGIN_SECONDS):
+        super().__init__(trim_margin_seconds)
+        self.pa = pyaudio.PyAudio()
+        self._stream = None
+
+    def _mic_callback(self, in_data, frame_count, time_info, status_flags):
+        self._push_frame(in_data)
+        return (None, pyaudio.paContinue)
+
+    def _open_source(self):
+        self._stream = self.pa.open(
+            format=MIC_PA_FORMAT,
+            channels=MIC_CHANNELS,
+            rate=MIC_SAMPLE_RATE,
+            input=True,
+            frames_per_buffer=MIC_FRAME_SIZE,
+            stream_callback=self._mic_callback
+        )
+        self._stream.start_stream()
+
+    def _close_source(self):
+        self._stream.stop_stream()
+        self._stream.close()
+        self._stream = None
+
+
+class WavMicrophone(VadMicrophone):
+    """Replays audio files as if they were spoken into the microphone.
+
+    Files go through the same VAD, endpointing and trimming as live input, each followed
+    by enough silence to end its utterance. speed=1.0 paces frames in real time, larger
+    values replay faster and None replays as fast as the capture thread keeps up.
+    Once the playlist is done (and loop is off) await_buffer returns None right away."""
+
+    def __init__(
+        self,
+        source: str | Path | Iterable[str | Path],
+        speed: float | None = 1.0,
+        loop: bool = False,
+        trailing_silence_seconds: float = REPLAY_TRAILING_SILENCE_SECONDS,
+        trim_margin_seconds: float | None = MIC_TRIM_MARGIN_SECONDS
+    ):
+        super().__init__(trim_margin_seconds)
+        self.files = self._resolve_playlist(source)
+        if not self.files:
+            raise ValueError(f"No audio files to replay in {source}")
+        self.speed = speed
+        self.loop = loop
+        self.trailing_silence_seconds = trailing_silence_seconds
+        self.files_played = 0
+        self._stop_replay = threading.Event()
+        self._replay_thread = None
+
+    @staticmethod
+    def _resolve_playlist(source: str | Path | Iterable[str | Path]) -> List[Path]:
+        if not isinstance(source, (str, Path)):
+            return [Path(path) for path in source]
+
+        source = Path(source)
+        if source.is_dir():
+            return sorted(source.glob("*.wav"))
+        if source.suffix.lower() in REPLAY_PLAYLIST_SUFFIXES:
+            lines = [line.strip() for line in source.read_text().splitlines()]
+            return [source.parent / line for line in lines if line and not line.startswith("#")]
+        return [source]
+
+    @property
+    def finished(self) -> bool:
+        """True once every file has been replayed and all resulting utterances were taken."""
+        return self._capture_stopped.is_set() and self._utterances.empty()
+
+    def _load(self, path: Path) -> np.ndarray:
+        audio, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+        audio = audio.mean(axis=1)
+        if sample_rate != MIC_SAMPLE_RATE:
+            divisor = gcd(MIC_SAMPLE_RATE, sample_rate)
+            audio = resample_poly(audio, MIC_SAMPLE_RATE // divisor, sample_rate // divisor)
+        silence = np.zeros(int(self.trailing_silence_seconds * MIC_SAMPLE_RATE), dtype=np.float32)
+        return (np.clip(np.concatenate((audio, silence)), -1.0, 1.0) * 32767).astype(MIC_NP_FORMAT)
+
+    def _replay(self):
+        frame_duration = MIC_FRAME_DURATION_MS / 1000
+        next_frame_time = time.monotonic()
+        while not self._stop_replay.is_set():
+            for path in self.files:
+                logging.print(f"Replaying {path} into the microphone")
+                pcm = self._load(path)
+                for start in range(0, len(pcm) - MIC_FRAME_SIZE + 1, MIC_FRAME_SIZE):
+                    if self._stop_replay.is_set():
+                        return
+                    if self.speed:
+                        next_frame_time += frame_duration / self.speed
+                        time.sleep(max(0.0, next_frame_time - time.monotonic()))
+                    self._push_frame(pcm[start:start + MIC_FRAME_SIZE].tobytes())
+                self.files_played += 1
+
+            if not self.loop:
+                # Lets the capture thread finish the queued frames and stop
+                self._push_frame(None)
+                return
+
+    def _open_source(self):
+        self._stop_replay.clear()
+        self._replay_thread = threading.Thread(target=self._replay, daemon=True, name="mic-replay")
+        self._replay_thread.start()
+
+    def _close_source(self):
+        self._stop_replay.set()
+        self._replay_thread.join()
+        self._replay_thread = None
+
+    def await_buffer(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = REPLAY_POLL_INTERVAL if deadline is None else min(REPLAY_POLL_INTERVAL, max(0.0, deadline - time.monotonic()))
+            buffer = super().await_buffer(timeout=wait)
+            if buffer is not None or self.finished:
+                return buffer
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+
+
+def get_microphone(replay_source: str | Path | Iterable[str | Path] | None = None, replay_speed: float | None = 1.0) -> Microphone:
+    """Passing replay_source (a directory of WAV files, a playlist file or a list of files) replays it instead of using the sound card."""
+    if replay_source is not None:
+        return WavMicrophone(replay_source, speed=replay_speed)
+
+    if not PYAUDIO_AVAILABLE:
+        raise Exception("PyAudio is not available, pass replay_source to replay recordings instead")
     return PaMicrophone()
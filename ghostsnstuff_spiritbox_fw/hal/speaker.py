@@ -1,29 +1,436 @@
-import pygame
 import numpy as np
+import soundfile as sf
 import threading
 import time
-from scipy.signal import resample
+import math
+from abc import ABC, abstractmethod
+from math import gcd
+from pathlib import Path
+from typing import Self, List
+from scipy.signal import resample_poly
+from ..effects import design_resampling_window, PolyphaseStream
+from .buffers import RingBuffer
+from .. import logging
+
+try:
+    import pygame
+    PYGAME_AVAILABLE = True
+except ImportError:
+    PYGAME_AVAILABLE = False
+
+DEFAULT_MIXER_SAMPLE_RATE = 44100
+STREAM_PREBUFFER_SECONDS = 0.25
+STREAM_SEGMENT_SECONDS = 0.1
+STREAM_RING_SECONDS = 30
+STREAM_POLL_INTERVAL = 0.01
+STREAM_MAX_GAIN = 4.0  # Keeps a quiet start of an utterance (or plain noise) from being boosted to full scale
+
+class AudioBackend(ABC):
+    """What AudioDriver needs from a mixer. Sounds and channels follow the
+    pygame.mixer.Sound/Channel interface (play, get_length / play, queue, get_queue,
+    get_busy, stop, set_volume, get_volume)."""
+
+    @abstractmethod
+    def init(self, sample_rate: int, channels: int, playback_channels: int, reserved_channels: int):
+        pass
+
+    @abstractmethod
+    def load_sound(self, path: str):
+        """Loads a sound from a file."""
+        pass
+
+    @abstractmethod
+    def make_sound(self, samples: np.ndarray):
+        """Creates a sound from int16 samples in the mixer's layout."""
+        pass
+
+    @abstractmethod
+    def get_channel(self, index: int):
+        pass
+
+    @abstractmethod
+    def find_channel(self):
+        """Returns an idle unreserved channel, taking over the longest playing one if there is none."""
+        pass
+
+
+class PygameBackend(AudioBackend):
+    def init(self, sample_rate: int, channels: int, playback_channels: int, reserved_channels: int):
+        pygame.mixer.init(frequency=sample_rate, channels=channels)
+        pygame.mixer.set_num_channels(playback_channels)
+        pygame.mixer.set_reserved(reserved_channels)
+
+    def load_sound(self, path: str):
+        return pygame.mixer.Sound(path)
+
+    def make_sound(self, samples: np.ndarray):
+        return pygame.mixer.Sound(samples)
+
+    def get_channel(self, index: int):
+        return pygame.mixer.Channel(index)
+
+    def find_channel(self):
+        return pygame.mixer.find_channel(True)
+
+
+class CapturedSegment:
+    """One sound as it was (or would have been) heard on a channel. end is math.inf
+    for a loop that is still playing."""
+
+    def __init__(self, channel: int, start: float, end: float, samples: np.ndarray, sample_rate: int, loops: int, volume: float, source: str | None) -> Self:
+        self.channel = channel
+        self.start = start
+        self.end = end
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.loops = loops
+        self.volume = volume
+        self.source = source
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class CapturedSound:
+    def __init__(self, backend: 'CaptureBackend', samples: np.ndarray, source: str | None = None) -> Self:
+        self.backend = backend
+        self.samples = samples
+        self.source = source
+
+    def get_length(self) -> float:
+        return len(self.samples) / self.backend.sample_rate
+
+    def play(self):
+        self.backend.find_channel().play(self)
+
+
+class CapturedChannel:
+    def __init__(self, backend: 'CaptureBackend', index: int) -> Self:
+        self.backend = backend
+        self.index = index
+        self._volume = 1.0
+        self._end = 0.0  # When the last sound played or queued on this channel finishes
+        self._queue_start = 0.0  # When the queued sound starts, i.e. stops being "queued"
+        self._started = 0.0
+        self._queued = None
+
+    def _record(self, sound: CapturedSound, start: float, loops: int) -> float:
+        end = math.inf if loops < 0 else start + sound.get_length() * (loops + 1)
+        self.backend._record(CapturedSegment(
+            self.index, start, end, sound.samples.copy(), self.backend.sample_rate, loops, self._volume, sound.source
+        ))
+        return end
+
+    def play(self, sound: CapturedSound, loops: int = 0):
+        self.stop()
+        self._started = self.backend.now()
+        self._end = self._record(sound, self._started, loops)
+
+    def queue(self, sound: CapturedSound):
+        now = self.backend.now()
+        if self._end <= now:
+            self.play(sound)
+            return
+        # Without real-time playback the previous sound "ends" immediately, but the recording keeps them back to back
+        self._queue_start = self._end
+        self._queued = sound
+        self._end = self._record(sound, self._end, 0)
+
+    def get_queue(self):
+        if self._queued is not None and self.backend.realtime and self.backend.now() < self._queue_start:
+            return self._queued
+        self._queued = None
+        return None
+
+    def get_busy(self) -> bool:
+        if self.backend.realtime:
+            return self.backend.now() < self._end
+        # Loops are the only thing that keeps playing when nothing waits for real time
+        return self._end == math.inf
+
+    def stop(self):
+        self.backend._cut(self.index, self.backend.now())
+        self._end = min(self._end, self.backend.now())
+        self._queued = None
+
+    def set_volume(self, volume: float):
+        self._volume = volume
+
+    def get_volume(self) -> float:
+        return self._volume
+
+
+class CaptureBackend(AudioBackend):
+    """Plays nothing, but records every sound with the time it was heard.
+
+    Each sound started or queued on a channel becomes a CapturedSegment with its int16
+    samples, channel, volume, loop count and monotonic start/end times; stopping a
+    channel cuts its segments short. With realtime=True channels stay busy for as long
+    as their sounds would play, like the real mixer. With realtime=False every sound
+    finishes immediately as far as callers can tell, so nothing waits on playback, but
+    the recorded times still follow real playback (queued sounds start where the
+    previous one would have ended). Missing sound files are recorded as silence."""
+
+    def __init__(self, realtime: bool = True) -> Self:
+        self.realtime = realtime
+        self.sample_rate = DEFAULT_MIXER_SAMPLE_RATE
+        self.channels = 2
+        self.reserved_channels = 0
+        self._channels: List[CapturedChannel] = []
+        self._segments: List[CapturedSegment] = []
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def init(self, sample_rate: int, channels: int, playback_channels: int, reserved_channels: int):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.reserved_channels = reserved_channels
+        self._channels = [CapturedChannel(self, index) for index in range(playback_channels)]
+
+    def load_sound(self, path: str):
+        if not Path(path).exists():
+            # Recording what would be played shouldn't need every asset, so a missing one is recorded as silence
+            logging.warn(f"{path} does not exist, capturing it as one second of silence")
+            return CapturedSound(self, np.zeros((self.sample_rate, self.channels), dtype=np.int16).squeeze(), source=Path(path).name)
+
+        samples, sample_rate = sf.read(path, dtype="int16", always_2d=True)
+        if sample_rate != self.sample_rate:
+            # pygame converts files to the mixer rate on load, and so does this
+            divisor = gcd(self.sample_rate, sample_rate)
+            resampled = resample_poly(samples.astype(np.float32), self.sample_rate // divisor, sample_rate // divisor, axis=0)
+            samples = np.clip(resampled, -32768, 32767).astype(np.int16)
+        if samples.shape[1] != self.channels:
+            samples = np.repeat(samples[:, :1], self.channels, axis=1)
+        return CapturedSound(self, samples if self.channels > 1 else samples[:, 0], source=Path(path).name)
+
+    def make_sound(self, samples: np.ndarray):
+        # Callers pass the converter's shared output buffer, which the next conversion overwrites
+        samples = samples.copy()
+        return CapturedSound(self, samples.reshape(-1, self.channels) if self.channels > 1 else samples)
+
+    def get_channel(self, index: int):
+        return self._channels[index]
+
+    def find_channel(self):
+        unreserved = self._channels[self.reserved_channels:]
+        for channel in unreserved:
+            # Judged by when its sounds would end, so sounds never overlap on one channel in the recording
+            if channel._end <= self.now():
+                return channel
+        return min(unreserved, key=lambda channel: channel._started)
+
+    def _record(self, segment: CapturedSegment):
+        with self._lock:
+            self._segments.append(segment)
+
+    def _cut(self, channel: int, time: float):
+        with self._lock:
+            # Sounds that had not started yet never get heard
+            self._segments = [segment for segment in self._segments if segment.channel != channel or segment.start < time]
+            for segment in self._segments:
+                if segment.channel == channel and segment.end > time:
+                    segment.end = time
+
+    def get_segments(self, channel: int | None = None) -> List[CapturedSegment]:
+        with self._lock:
+            return [segment for segment in self._segments if channel is None or segment.channel == channel]
+
+    def clear(self):
+        with self._lock:
+            self._segments = []
+
+
+class PlaybackConverter:
+    """Turns float buffers into the mixer's interleaved int16 layout.
+
+    Resampling filters are designed once per source rate, and the result is written
+    straight into a single preallocated int16 buffer that only grows when a longer
+    buffer comes along. The returned array is a view into that buffer, so it is only
+    valid until the next call to convert."""
+
+    def __init__(self, sample_rate: int, enable_stereo: bool):
+        self.sample_rate = sample_rate
+        self.channels = 2 if enable_stereo else 1
+        self._resamplers = {}
+        self._output = np.empty(0, dtype=np.int16)
+
+    def _resample(self, buffer: np.ndarray, sample_rate: int) -> np.ndarray:
+        if sample_rate == self.sample_rate:
+            return buffer
+
+        if sample_rate not in self._resamplers:
+            divisor = gcd(self.sample_rate, sample_rate)
+            up, down = self.sample_rate // divisor, sample_rate // divisor
+            self._resamplers[sample_rate] = (up, down, design_resampling_window(up, down))
+
+        up, down, window = self._resamplers[sample_rate]
+        return resample_poly(buffer, up, down, window=window, axis=0)
+
+    def convert(self, buffer: np.ndarray, sample_rate: int, gain: float | None = None) -> np.ndarray:
+        """Pass a gain to use a fixed scale instead of normalizing the buffer to its own peak.
+        Samples the fixed gain pushes past full scale are clipped rather than wrapped."""
+        if buffer.ndim > 2 or (buffer.ndim == 2 and buffer.shape[1] != self.channels):
+            raise ValueError("Audio buffer must be either mono or match the mixer's channel count")
+
+        buffer = self._resample(buffer, sample_rate)
+        frames = len(buffer)
+        if len(self._output) < frames * self.channels:
+            self._output = np.empty(frames * self.channels, dtype=np.int16)
+
+        output = self._output[:frames * self.channels].reshape(frames, self.channels)
+        if gain is None:
+            peak = np.max(np.abs(buffer)) if frames else 0
+            scale = 32767 / peak if peak > 0 else 0
+        else:
+            scale = 32767 * gain
+            # Resampling overshoots the source peak, so a fixed gain can exceed the int16 range
+            buffer = np.clip(buffer * scale, -32767, 32767)
+            scale = 1
+
+        # Scale and cast straight into the interleaved buffer, then duplicate into the other channel
+        if buffer.ndim == 1:
+            np.multiply(buffer, scale, out=output[:, 0], casting="unsafe")
+            if self.channels == 2:
+                output[:, 1] = output[:, 0]
+        else:
+            np.multiply(buffer, scale, out=output, casting="unsafe")
+
+        return output if self.channels == 2 else output[:, 0]
+
+class AudioStream:
+    """Plays audio that is still being produced.
+
+    Samples written to the stream go into a ring buffer. A feeder thread waits for a
+    short prebuffer, then takes a free mixer channel and keeps it busy by queueing one
+    segment ahead, so network jitter is absorbed instead of heard. An underrun pauses
+    playback until the prebuffer has refilled. Since the peak of the whole utterance isn't
+    known up front, the gain follows the loudest sample seen so far (after resampling),
+    never goes up and is capped at STREAM_MAX_GAIN. Unlike play_buffer, which normalizes
+    the whole buffer to its peak, an utterance that gets louder partway through therefore
+    plays its quieter start louder (relative to the rest) than the original recording."""
+
+    def __init__(self, driver: 'AudioDriver', sample_rate: int, prebuffer_seconds: float = STREAM_PREBUFFER_SECONDS):
+        self.driver = driver
+        self.sample_rate = sample_rate
+        self._ring = RingBuffer(int(STREAM_RING_SECONDS * sample_rate))
+        self._converter = PlaybackConverter(driver.sample_rate, driver.enable_stereo)
+        self._resampler = None
+        if sample_rate != driver.sample_rate:
+            divisor = gcd(driver.sample_rate, sample_rate)
+            up, down = driver.sample_rate // divisor, sample_rate // divisor
+            self._resampler = PolyphaseStream(design_resampling_window(up, down), up, down)
+        self._prebuffer_samples = max(1, int(prebuffer_seconds * sample_rate))
+        self._segment_samples = max(1, int(STREAM_SEGMENT_SECONDS * sample_rate))
+        self._peak = 0.0
+        self._played_frames = 0
+        self.underruns = 0
+        self.first_audio_time: float | None = None
+        driver._stream_started()
+        self._thread = threading.Thread(target=self._feed_and_release, daemon=True)
+        self._thread.start()
+
+    def write(self, buffer: np.ndarray):
+        """Queues mono float samples at the stream's sample rate. Blocks if the ring buffer is full."""
+        if not len(buffer):
+            return
+        self._peak = max(self._peak, float(np.max(np.abs(buffer))))
+        self._ring.write(buffer)
+
+    def close(self):
+        """Marks the end of the utterance; whatever is buffered still gets played."""
+        self._ring.close()
+
+    def wait(self) -> float:
+        """Blocks until everything written has been played and returns the played duration."""
+        self._thread.join()
+        return self._played_frames / self.driver.sample_rate
+
+    def _make_sound(self, samples: np.ndarray):
+        if self._resampler:
+            samples = self._resampler.process(samples)
+        if not len(samples):
+            return None
+        self._peak = max(self._peak, float(np.max(np.abs(samples))))
+        gain = min(1 / self._peak, STREAM_MAX_GAIN) if self._peak > 0 else 0
+        self._played_frames += len(samples)
+        return self.driver.backend.make_sound(self._converter.convert(samples, self.driver.sample_rate, gain))
+
+    def _feed_and_release(self):
+        try:
+            self._feed()
+        finally:
+            self.driver._stream_finished()
+
+    def _feed(self):
+        channel = None
+        buffering = True
+        while True:
+            if buffering:
+                self._ring.wait_for(self._prebuffer_samples)
+                buffering = False
+
+            if channel is not None and channel.get_queue() is not None:
+                time.sleep(STREAM_POLL_INTERVAL)
+                continue
+
+            segment = self._ring.read(self._segment_samples)
+            if not len(segment):
+                if self._ring.closed:
+                    break
+                if channel is None or not channel.get_busy():
+                    self.underruns += 1
+                    buffering = True
+                else:
+                    time.sleep(STREAM_POLL_INTERVAL)
+                continue
+
+            sound = self._make_sound(segment)
+            if sound is None:
+                continue
+            if channel is None:
+                channel = self.driver.backend.find_channel()
+                channel.play(sound)
+                self.first_audio_time = time.monotonic()
+            else:
+                channel.queue(sound)
+
+        # Push out the resampler's latency tail, then let the channel run dry
+        if channel is not None and self._resampler:
+            tail = np.zeros(self._resampler.taps, dtype=np.float32)
+            while channel.get_queue() is not None:
+                time.sleep(STREAM_POLL_INTERVAL)
+            sound = self._make_sound(tail)
+            if sound is not None:
+                channel.queue(sound)
+        while channel is not None and channel.get_busy():
+            time.sleep(STREAM_POLL_INTERVAL)
 
 class AudioDriver:
-    def __init__(self, sample_rate: int = 44100, playback_channels: int = 4, enable_stereo: bool = True):
+    def __init__(self, sample_rate: int = DEFAULT_MIXER_SAMPLE_RATE, playback_channels: int = 4, enable_stereo: bool = True, backend: AudioBackend | None = None):
+        self.backend = backend or PygameBackend()
         self.sample_rate = sample_rate
         self.playback_channels = playback_channels
         self.enable_stereo = enable_stereo
+        self._converter = PlaybackConverter(sample_rate, enable_stereo)
+        self._converter_lock = threading.Lock()
+        self._active_streams = 0
+        self._streams_lock = threading.Lock()
 
-        pygame.mixer.init(frequency=sample_rate, channels=2 if enable_stereo else 1)
-        pygame.mixer.set_num_channels(playback_channels)
-        pygame.mixer.set_reserved(1) # reserved for interference
+        self.backend.init(sample_rate, 2 if enable_stereo else 1, playback_channels, 1) # 1 reserved for interference
         self.interference_sounds = [
             self.load_sound(f"./assets/sounds/interference_level{i}.wav") for i in range(1, 3)
         ]
         self.beeps = [
             self.load_sound(f"./assets/sounds/beep{i}.wav") for i in range(1, 4)
         ]
-        self.interference_channel = pygame.mixer.Channel(0)
+        self.interference_channel = self.backend.get_channel(0)
 
     def load_sound(self, path):
         """ Load a sound file and return the Sound object. """
-        return pygame.mixer.Sound(path)
+        return self.backend.load_sound(path)
 
     def set_interference_level(self, level):
         """ Set the level of interference sound (0-2). """
@@ -56,30 +463,40 @@ class AudioDriver:
 
     def play_buffer(self, buffer, buffer_sample_rate):
         """ Play a numpy buffer as sound. """
-        buffer = self.normalize_buffer(buffer, buffer_sample_rate)
-        sound = pygame.mixer.Sound(buffer)
+        with self._converter_lock:
+            # Sound copies the samples, so the shared conversion buffer is free again afterwards
+            sound = self.backend.make_sound(self.normalize_buffer(buffer, buffer_sample_rate))
         sound.play()
         return sound.get_length()  # Return duration of the sound
 
+    def open_stream(self, buffer_sample_rate: int, prebuffer_seconds: float = STREAM_PREBUFFER_SECONDS) -> AudioStream:
+        """ Start playing a buffer that arrives in chunks, see AudioStream. """
+        return AudioStream(self, buffer_sample_rate, prebuffer_seconds)
+
+    def _stream_started(self):
+        with self._streams_lock:
+            self._active_streams += 1
+
+    def _stream_finished(self):
+        with self._streams_lock:
+            self._active_streams -= 1
+
+    def is_playing(self) -> bool:
+        """ Whether the box is producing its own sound, not counting the interference loop.
+        An open stream counts as playing even while it is buffering. """
+        if self._active_streams:
+            return True
+        return any(self.backend.get_channel(i).get_busy() for i in range(1, self.playback_channels))
+
     def normalize_buffer(self, buffer: np.ndarray, sample_rate: int):
-        """ Normalize and adjust the numpy buffer to match Pygame's format. """
-        # Resample if needed
-        if sample_rate != self.sample_rate:
-            num_samples = round(len(buffer) * self.sample_rate / sample_rate)
-            buffer = resample(buffer, num_samples)
-        
-        # Normalize to int16 range
-        max_val = np.max(np.abs(buffer))
-        if max_val > 0:
-            buffer = (buffer / max_val * 32767).astype(np.int16)  # Convert to int16
-
-        # Convert to stereo if enabled
-        if buffer.ndim == 1 and self.enable_stereo:
-            buffer = np.column_stack((buffer, buffer))
-        elif buffer.ndim > 2:
-            raise ValueError("Audio buffer must be either mono or stereo")
-        
-        return buffer
+        """ Normalize and adjust the numpy buffer to match Pygame's format.
+        The result is only valid until the next call, see PlaybackConverter. """
+        return self._converter.convert(buffer, sample_rate)
     
-def get_audio() -> AudioDriver:
-    return AudioDriver()
\ No newline at end of file
+def get_audio(sample_rate: int = DEFAULT_MIXER_SAMPLE_RATE, backend: AudioBackend | None = None) -> AudioDriver:
+    """ Passing the TTS sample rate opens the mixer at that rate, skipping resampling entirely.
+    Pass a CaptureBackend to record playback instead of making sound. """
+    if backend is None and not PYGAME_AVAILABLE:
+        logging.warn("pygame is not available, recording audio with a capture backend instead")
+        backend = CaptureBackend()
+    return AudioDriver(sample_rate=sample_rate, backend=backend)
\ No newline at end of file
@@ -183,16 +183,20 @@ Your ultimate goal is to create a captivating experience for the users, balancin
 """
 
 CURATOR_USER_PROMPT = """
+### **Transcript So Far**:
+```
+{{ transcript or "(nothing has been said yet)" }}
+```
+### **Current Interaction**:
+```
+{{ current_interaction }}
+```
 ### **Current Game State**:
 - **Activity Level**: {{ game_state.activity_level }}
 - **Timer**: {% if game_state.get_remaining_time() == -1 %}N/A{% else %}{{ game_state.get_remaining_time() }} seconds remaining{% endif %}
 - **Curator Notes**:
   - **Primary Ghost**: {{ curator_notes.primary_ghost_note }}
   - **Secondary Ghost**: {{ curator_notes.secondary_ghost_note }}
-- **Transcript**:
-```
-{{ transcript }}
-```
 - **Ghost that is about to speak in this turn**: {{ ghost_turn }}
 - **User question**: {{ query }}
 """
@@ -210,6 +214,8 @@ You must choose the appropriate voice model and input it as tts_voice_model.
 
 ** IMPORTANT ** You must use appropriate voices for the appropriate genders i.e. do not use the onyx voice for a female ghost or the nova voice for a male ghost.
 
+The ghost voices are also passed through a radio-like voice effect. You may pick a preset for each ghost by setting voice_effect.preset to one of: haunted (the default spirit box sound), whisper (thin and airy), demonic (low, crushed and wobbling) or distant (narrow and frequently cutting out). Leave voice_effect empty to use the default.
+
 Based on the following scenario type, generate a complete scenario definition, including details about the primary and secondary ghosts, their identities, personalities, backstories, shared lore, and the ultimate goal of the group. Ensure that the final output is structured properly in JSON format. 
 
 The scenario you write must be complete. That is, you must leave as little information ambiguous as possible. Be even more thorough than the example below. If a piece of information is crucial to solving the scenario then you must include it in the lore and not leave it up to the ghosts or the Curator to make that information up on the fly. The scenario you write should include enough context for the ghosts to accurately roleplay their persona and answer all the questions the user might throw at them. Any riddles, rituals or key memories must be solvable. Additionally, you must always include the correct answers in your scenario definition. (So for key memories you must also define how they tie into the ghost's personality or identity and what the correct answer that the group must find is. This will help the ghosts guide the group towards this answer.)
@@ -400,14 +406,18 @@ This concludes your role instructions. Now, respond according to your identity,
 """
 
 GHOST_USER_PROMPT = """
+### **Transcript So Far**:
+```
+{{ transcript or "(nothing has been said yet)" }}
+```
+### **Current Interaction**:
+```
+{{ current_interaction }}
+```
 ### **Current Game State**:
 - **Activity Level**: {{ game_state.activity_level }}
 - **Timer**: {% if game_state.get_remaining_time() == -1 %}N/A{% else %}{{ game_state.get_remaining_time() }} seconds remaining{% endif %}
 - **Curator Note**: {{ curator_note }}
-- **Transcript**:
-```
-{{ transcript }}
-```
 - **User question**: {{ query }}
 """
 
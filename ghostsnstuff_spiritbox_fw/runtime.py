@@ -1,16 +1,19 @@
 import random
+from collections import deque
 from openai import OpenAI
-from typing import Self, Optional, List
+from typing import Self, Optional, List, Callable
 from .scenario import ScenarioDefinition
 from .models.curator import CuratorNotes, GameResult
 from .models.ghost import GhostResponse
 from .models.state import GameState
-from .agents import Curator, Ghost
+from .agents import Curator, Ghost, TokenUsage
 from . import logging
 from .events import Event, EventTimeline, EventActor
 from .conversation import Conversation, Message, MessageRole, GhostRole
 from .utils import sanitize_ghost_speech, weighted_ghost_choice
 
+TOKEN_USAGE_HISTORY_TURNS = 200
+
 class RuntimeConfig:
     curator_model: str = "gpt-4o-mini"
     writer_model: str = "gpt-4o"
@@ -42,6 +45,8 @@ class GhostActions:
     speech: List[str] | str | None = None
     reasoning: str
     
+GhostActionsCallback = Callable[[GhostRole, GhostActions], None]
+
 class RuntimeExecutionResult:
     curator_actions: CuratorActions
     primary_ghost_actions: Optional[GhostActions] = None
@@ -49,6 +54,7 @@ class RuntimeExecutionResult:
     ghost_order: str
     activity_level: float
     game_result: Optional[GameResult] = None
+    token_usage: Optional[dict] = None
 
 class SystemCallResult:
     curator_actions: CuratorActions
@@ -135,6 +141,9 @@ class GameRuntime:
             scaling_factor=config.activity_grow_factor,
             timer=config.timer_value or 0
         )
+        self.turns = 0
+        self.turn_usage = deque(maxlen=TOKEN_USAGE_HISTORY_TURNS)
+        self._current_turn_usage: dict[str, TokenUsage] | None = None
 
     def __push_message(self, role: MessageRole, content: list[str | str]):
         message = Message(role, content if isinstance(content, str) else ", ".join(content))
@@ -150,6 +159,28 @@ class GameRuntime:
         else:
             logging.warn(f"Attempted to set curator note for invalid ghost entity type: {ghost}")
 
+    def __record_usage(self, agent: str, usage: TokenUsage):
+        if self._current_turn_usage is not None:
+            self._current_turn_usage.setdefault(agent, TokenUsage()).add(usage)
+
+    def __finish_turn_usage(self, execution_result: RuntimeExecutionResult):
+        self.turns += 1
+        total = TokenUsage()
+        for usage in self._current_turn_usage.values():
+            total.add(usage)
+        record = {
+            "turn": self.turns,
+            "agents": {agent: usage.to_dict() for agent, usage in self._current_turn_usage.items()},
+            "total": total.to_dict()
+        }
+        self.turn_usage.append(record)
+        self._current_turn_usage = None
+        execution_result.token_usage = record
+        logging.print(
+            f"Turn {self.turns} used {total.prompt_tokens} prompt tokens ({total.cache_hit_ratio:.0%} cached) "
+            f"and {total.completion_tokens} completion tokens"
+        )
+
     def __execute_curator(self, query: str, agent_choice: GhostRole) -> CuratorActions:
         state = self.game_state
 
@@ -160,6 +191,7 @@ class GameRuntime:
             query=query,
             ghost_turn=agent_choice
         )
+        self.__record_usage("curator", self.curator.agent.last_usage)
 
         actions = CuratorActions()
         actions.game_result = response.game_result
@@ -233,6 +265,7 @@ class GameRuntime:
             note=note,
             query=query
         )
+        self.__record_usage(f"{agent_choice}_ghost", model.agent.last_usage)
 
         actions = GhostActions()
         actions.reasoning = response.reasoning
@@ -269,11 +302,14 @@ class GameRuntime:
         self.events.push(GhostCallEvent(agent_choice.capitalize(), actions))
         return actions
     
-    def execute(self, query: str) -> RuntimeExecutionResult:
+    def execute(self, query: str, on_ghost_actions: Optional[GhostActionsCallback] = None) -> RuntimeExecutionResult:
+        """Runs a full turn. If on_ghost_actions is given, it is called with each ghost's actions
+        as soon as that ghost has answered (in ghost_order), before the next ghost is asked."""
         state = self.game_state
         self.__push_message("user", query)
         agent_choice = weighted_ghost_choice(state.activity_level)
         execution_result = RuntimeExecutionResult()
+        self._current_turn_usage = {}
         
         curator_run = self.__execute_curator(query, agent_choice)
         if curator_run.corrected_user_prompt:
@@ -291,30 +327,31 @@ class GameRuntime:
         if curator_run.game_result:
             # End the iteration early
             execution_result.game_result = curator_run.game_result
+            self.__finish_turn_usage(execution_result)
             return execution_result
         
         execution_result.curator_actions = curator_run
-        if agent_choice == "primary":
-            ghost_order = "primary"
-            execution_result.primary_ghost_actions = self.__execute_ghost(query, agent_choice)
-        elif agent_choice == "secondary":
-            ghost_order = "secondary"
-            execution_result.secondary_ghost_actions = self.__execute_ghost(query, agent_choice)
-        elif agent_choice == "both":
-            order = random.choice([True, False])
-            if order:
-                ghost_order = "primary"
-                execution_result.primary_ghost_actions = self.__execute_ghost(query, "primary")
-                execution_result.secondary_ghost_actions = self.__execute_ghost(query, "secondary")
+        if agent_choice == "both":
+            ghost_order = random.choice(["primary", "secondary"])
+            ghosts = [ghost_order, "secondary" if ghost_order == "primary" else "primary"]
+        else:
+            ghost_order = agent_choice
+            ghosts = [agent_choice]
+
+        for ghost in ghosts:
+            actions = self.__execute_ghost(query, ghost)
+            if ghost == "primary":
+                execution_result.primary_ghost_actions = actions
             else:
-                ghost_order = "secondary"
-                execution_result.primary_ghost_actions = self.__execute_ghost(query, "secondary")
-                execution_result.secondary_ghost_actions = self.__execute_ghost(query, "primary")
+                execution_result.secondary_ghost_actions = actions
+            if on_ghost_actions and actions:
+                on_ghost_actions(ghost, actions)
         
         execution_result.ghost_order = ghost_order
         state.increment_activity()
         logging.print(f"Activity level is now {state.activity_level}")
         execution_result.activity_level = state.activity_level
+        self.__finish_turn_usage(execution_result)
         return execution_result
 
     def execute_command(self, command: str) -> SystemCallResult:
@@ -335,4 +372,19 @@ class GameRuntime:
         actions.curator_response = response.reasoning
 
         self.events.push(SystemCallEvent(command, actions))
-        return actions
\ No newline at end of file
+        return actions
+
+    def get_token_usage_stats(self) -> dict:
+        agents = {
+            "curator": self.curator.agent.usage,
+            "primary_ghost": self.primary_ghost.agent.usage,
+            "secondary_ghost": self.secondary_ghost.agent.usage
+        }
+        total = TokenUsage()
+        for usage in agents.values():
+            total.add(usage)
+        return {
+            "agents": {agent: usage.to_dict() for agent, usage in agents.items()},
+            "total": total.to_dict(),
+            "turns": list(self.turn_usage)
+        }
@@ -1,4 +1,4 @@
-from typing import List, Optional, Literal
+from typing import List, Optional, Literal, Union
 from pydantic import BaseModel, TypeAdapter
 
 class RitualDefinition(BaseModel):
@@ -11,6 +11,46 @@ class Memory(BaseModel):
     hint: str
     solution: str
 
+# Parameters left out (None) take the defaults in effects.STAGE_DEFAULTS. Defaults are not
+# declared here because OpenAI structured outputs reject "default" in the writer's schema
+class BitReductionEffect(BaseModel):
+    type: Literal["bit_reduction"]
+    bit_depth: Optional[int] = None
+    mix: Optional[float] = None
+
+class SampleRateReductionEffect(BaseModel):
+    type: Literal["sample_rate_reduction"]
+    target_rate: Optional[int] = None
+    mix: Optional[float] = None
+
+class BandpassEffect(BaseModel):
+    type: Literal["bandpass"]
+    lowcut: Optional[float] = None
+    highcut: Optional[float] = None
+    order: Optional[int] = None
+
+class AmplitudeModulationEffect(BaseModel):
+    type: Literal["amplitude_modulation"]
+    mod_freq: Optional[float] = None
+    depth: Optional[float] = None
+
+class NoiseEffect(BaseModel):
+    type: Literal["noise"]
+    noise_level: Optional[float] = None
+
+class DropoutsEffect(BaseModel):
+    type: Literal["dropouts"]
+    dropout_rate: Optional[float] = None
+    dropout_length: Optional[float] = None
+    interval: Optional[float] = None
+
+# Plain union (not a discriminated one) so the writer's structured output schema stays anyOf-only
+EffectStageDefinition = Union[BitReductionEffect, SampleRateReductionEffect, BandpassEffect, AmplitudeModulationEffect, NoiseEffect, DropoutsEffect]
+
+class VoiceEffectDefinition(BaseModel):
+    preset: Optional[str] = None  # Name of a preset from effects.VOICE_PRESETS
+    stages: Optional[List[EffectStageDefinition]] = None  # Explicit effect chain, applied in order (overrides the preset)
+
 class GhostDefinition(BaseModel):
     name: str
     personality: str
@@ -20,6 +60,7 @@ class GhostDefinition(BaseModel):
     ritual: Optional[RitualDefinition] = None  # This applies to ghosts with rituals
     key_memories: Optional[List[Memory]] = None  # This applies to ghosts with locked key memories
     tts_voice_model: str
+    voice_effect: Optional[VoiceEffectDefinition] = None  # Falls back to the scenario's voice effect
 
 
 class FinalGoalDefinition(BaseModel):
@@ -33,6 +74,7 @@ class ScenarioDefinition(BaseModel):
     secondary_ghost: GhostDefinition
     shared_lore: str
     final_goal: FinalGoalDefinition
+    voice_effect: Optional[VoiceEffectDefinition] = None  # Default voice effect for both ghosts
 
 def load_scenario(file: str) -> ScenarioDefinition:
     with open(file, "r") as f:
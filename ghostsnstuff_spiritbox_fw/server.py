@@ -1,33 +1,48 @@
 import time
 import random
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, Future
 from openai import OpenAI
 from pathlib import Path
-from typing import Self, List
+from typing import Self, List, Optional, Iterable
 from enum import Enum
 from datetime import datetime
-from .speech import STTClient, TTSClient, VOICE_MODELS
+from .speech import STTClient, TTSClient, TTSCache, VOICE_MODELS, STT_AUDIO_FORMATS
 from .runtime import RuntimeConfig
 from .hal.microphone import Microphone
+from .hal.gating import GatedMicrophone
 from .hal.display import Display
 from .hal.speaker import AudioDriver
-from .hal.emf import EMFDriver
+from .hal.emf import EMFDriver, EMFSequence, BluetoothEMFDriver
 from .events import EventTimeline
 from .agents import Writer
-from .scenario import ScenarioDefinition, load_scenario
+from .scenario import ScenarioDefinition, VoiceEffectDefinition, load_scenario
 from .runtime import GameRuntime, SystemCallResult, GhostActions, GhostRole
-from .utils import polish_to_english, haunted_effect
+from .effects import EffectChain, compile_voice_effect
+from .utils import polish_to_english
 from . import logging
 
 class ServerConfig:
     voice_speed: float = 0.75
     tts_sample_rate: int = 16000
+    tts_cache_dir: Optional[Path] = Path("./tts_cache/")  # None disables the TTS cache
+    tts_cache_max_bytes: int = 64 * 1024 * 1024
+    stt_audio_format: STT_AUDIO_FORMATS = "flac"
     base_scenarios_dir: Path = Path("./scenarios/")
     hint_buffer_min_length: float = 1.1
+    utterance_coalesce_window: float = 0.8  # Utterances starting within this many seconds of the previous one's end form one turn
+    utterance_poll_interval: float = 0.05  # How often a turn checks whether the speech in progress has ended
+    utterance_coalesce_gap: float = 0.3  # Silence inserted between coalesced utterances
+    capture_gate_enabled: bool = True  # Ignore the mic while the box plays audio and drop noise-like captures
+    capture_gate_release_seconds: float = 0.5
+    capture_gate_min_duration: float = 0.3
+    capture_gate_min_voiced_ratio: float = 0.3
+    capture_gate_min_energy_db: float = -45.0
     hint_display_duration: float = 2.0
     interference_volume: float = 0.5
     win_message: str = "Thank you..."
     lose_message: str = "You fool..."
+    lose_voice_effect: Optional[VoiceEffectDefinition] = None  # None plays the lose message unprocessed
     debug_api_enabled: bool = False
     debug_api_host: str = "0.0.0.0"
     debug_api_port: int = 8080
@@ -43,6 +58,15 @@ class Server:
     def __init__(self, client: OpenAI, mic: Microphone, display: Display, speaker: AudioDriver, emf: EMFDriver, timeline: EventTimeline, server_config: ServerConfig, runtime_config: RuntimeConfig) -> Self:
         self.client = client
         self.mic = mic
+        if server_config.capture_gate_enabled:
+            self.mic = GatedMicrophone(
+                mic=mic,
+                speaker=speaker,
+                release_seconds=server_config.capture_gate_release_seconds,
+                min_duration_seconds=server_config.capture_gate_min_duration,
+                min_voiced_ratio=server_config.capture_gate_min_voiced_ratio,
+                min_energy_db=server_config.capture_gate_min_energy_db
+            )
         self.display = display
         self.speaker = speaker
         self.emf = emf
@@ -51,14 +75,24 @@ class Server:
         self.runtime_config = runtime_config
         self.current_scenario: ScenarioDefinition | None = None
         self.runtime: GameRuntime | None = None
+        self.ghost_effects: dict[GhostRole, EffectChain] = {}
+        self.lose_effect: EffectChain | None = None
         self.scenario_writer = Writer(
             client=client,
             model=runtime_config.writer_model,
             temperature=runtime_config.curator_temperature
         )
-        self.tts_model = TTSClient(client)
-        self.stt_client = STTClient(client)
+        tts_cache = (
+            TTSCache(server_config.tts_cache_dir, server_config.tts_cache_max_bytes)
+            if server_config.tts_cache_dir else None
+        )
+        self.tts_model = TTSClient(client, tts_cache)
+        self.stt_client = STTClient(client, server_config.stt_audio_format)
         self._locked = False
+        # An utterance that was drained while coalescing but belongs to the next turn
+        self._next_turn_utterance: tuple[np.ndarray, tuple[float, float]] | None = None
+        # Ghost speech plays on its own worker so it can overlap the next ghost's LLM call
+        self._speech_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ghost-speech")
         if server_config.debug_api_enabled:
             from .debug.api import DebugAPI
             self._debug_api = DebugAPI(
@@ -83,6 +117,8 @@ class Server:
         self.display.enable_glitch(False)
         self.display.set_text(None)
         self.display.enable_sweep(False)
+        # A sequence still playing step by step would otherwise overwrite the level set here
+        self.emf.stop_sequence()
         self.emf.set_activity(1)
         
     def _enable_hardware(self):
@@ -98,43 +134,49 @@ class Server:
         self.speaker.set_interference_level(1)
         self.display.enable_glitch(False)
         
-    def _play_ghost_speech(self, content: str, buffer: np.ndarray):
+    def _play_ghost_speech(self, content: str, chunks: Iterable[np.ndarray], effect: EffectChain):
+        # Chunks go through the effect and into the speaker as they arrive from the TTS
         self.display.set_icon_state(response=True)
-        sound_length = self.speaker.play_buffer(buffer, self.server_config.tts_sample_rate)
+        stream = self.speaker.open_stream(self.server_config.tts_sample_rate)
+        effect_stream = effect.stream()
+        try:
+            for chunk in chunks:
+                stream.write(effect_stream.process(chunk))
+            stream.write(effect_stream.flush())
+        finally:
+            stream.close()
+
+        sound_length = stream.wait()
         text = polish_to_english(content) if sound_length > self.server_config.hint_buffer_min_length else "SYSTEM ERROR"
-        time.sleep(sound_length)
         self.display.set_text(text, duration=self.server_config.hint_display_duration)
         self.display.set_icon_state(response=False)
         
-    def _execute_ghost_actions(self, actions: GhostActions, voice: VOICE_MODELS):
+    def _execute_ghost_actions(self, actions: GhostActions, voice: VOICE_MODELS, effect: EffectChain):
         if actions.glitch:
             self._execute_glitch()
             
         if not actions.speech:
             return
         
+        speed = self.server_config.voice_speed
         if isinstance(actions.speech, list):
-            buffers = self.tts_model.synthesize_batch(actions.speech, voice, self.server_config.voice_speed)
+            # All words are requested up front, later ones synthesize while earlier ones play
+            buffers = self.tts_model.synthesize_batch(actions.speech, voice, speed)
             for word, buffer in zip(actions.speech, buffers):
-                buffer = haunted_effect(buffer, self.server_config.tts_sample_rate)
-                self._play_ghost_speech(word, buffer)
+                self._play_ghost_speech(word, [buffer], effect)
                 time.sleep(random.uniform(0.5, 1.5))
         else:
-            buffer = self.tts_model.synthesize(actions.speech, voice, self.server_config.voice_speed)
-            buffer = haunted_effect(buffer, self.server_config.tts_sample_rate)
-            self._play_ghost_speech("XXXXXX", buffer)
+            self._play_ghost_speech("XXXXXX", self.tts_model.synthesize_stream(actions.speech, voice, speed), effect)
             
     def _game_won(self):
         self.speaker.set_interference_level(2)
         self.display.enable_glitch(True)
-        self.emf.set_activity(6)
-        time.sleep(5)
+        sequence = EMFSequence().activity(6).wait(5)
         for i in range(5):
-            self.emf.set_activity(5 - i)
-            time.sleep(random.uniform(0.7, 1))
-        
-        time.sleep(2)
-        self.emf.set_activity(0)
+            sequence.activity(5 - i).wait(random.uniform(0.7, 1))
+        sequence.wait(2).activity(0)
+        self.emf.play_sequence(sequence)
+        self.emf.wait_sequence()
         self.display.enable_glitch(False)
         self.display.enable_sweep(False)
         self.speaker.set_interference_level(0)
@@ -145,6 +187,8 @@ class Server:
         
     def _game_lost(self):
         buffer = self.tts_model.synthesize(self.server_config.lose_message, "onyx", 0.65)
+        if self.lose_effect:
+            buffer = self.lose_effect.process(buffer)
         self.speaker.set_interference_level(2)
         time.sleep(1)
         self.emf.set_activity(6)
@@ -154,12 +198,12 @@ class Server:
         self.display.enable_glitch(True)
         self.display.enable_sweep(False)
         
+        sequence = EMFSequence()
         for _ in range(random.randint(20, 40)):
-            self.emf.glitch()
-            time.sleep(random.uniform(0.05, 0.15))
-            
-        time.sleep(4)
-        self.emf.set_activity(0)
+            sequence.glitch().wait(random.uniform(0.05, 0.15))
+        sequence.wait(4).activity(0)
+        self.emf.play_sequence(sequence)
+        self.emf.wait_sequence()
         self.speaker.set_interference_level(0)
         self.display.enable_glitch(False)
         
@@ -185,6 +229,8 @@ class Server:
             logging.warn("Attempted to start a new scenario, but one is already running")
             return False
         
+        # Compiled first, so a failure leaves no half-started scenario behind
+        self._compile_voice_effects(scenario)
         self.current_scenario = scenario
         self.runtime = GameRuntime(
             client=self.client,
@@ -197,9 +243,22 @@ class Server:
         self._enable_hardware()
         
         self.runtime.game_state.reset()
+        # Anything said before the scenario started is not meant for the ghosts
+        self.mic.discard_buffers()
+        self._next_turn_utterance = None
         logging.print("Scenario started")
         return True
     
+    def _compile_voice_effects(self, scenario: ScenarioDefinition):
+        # Filter design and noise tables are done once here rather than per utterance
+        sample_rate = self.server_config.tts_sample_rate
+        self.ghost_effects = {
+            "primary": compile_voice_effect(scenario.primary_ghost.voice_effect or scenario.voice_effect, sample_rate),
+            "secondary": compile_voice_effect(scenario.secondary_ghost.voice_effect or scenario.voice_effect, sample_rate),
+        }
+        lose_voice_effect = self.server_config.lose_voice_effect
+        self.lose_effect = compile_voice_effect(lose_voice_effect, sample_rate) if lose_voice_effect else None
+
     def stop_scenario(self):
         self.current_scenario = None
         self.runtime = None
@@ -218,24 +277,99 @@ class Server:
     
     def get_current_scenario(self) -> ScenarioDefinition | None:
         return self.current_scenario
+
+    def get_tts_cache_stats(self) -> dict | None:
+        cache = self.tts_model.cache
+        return cache.get_stats() if cache else None
+
+    def get_display_stats(self) -> dict:
+        return self.display.get_frame_stats()
+
+    def get_capture_gate_stats(self) -> dict | None:
+        return self.mic.get_stats() if isinstance(self.mic, GatedMicrophone) else None
+
+    def get_emf_stats(self) -> dict | None:
+        return self.emf.get_stats() if isinstance(self.emf, BluetoothEMFDriver) else None
+
+    def get_token_usage_stats(self) -> dict | None:
+        if not self.runtime:
+            return None
+        stats = self.runtime.get_token_usage_stats()
+        stats["agents"]["writer"] = self.scenario_writer.agent.usage.to_dict()
+        return stats
     
+    def _await_turn_audio(self) -> np.ndarray | None:
+        # The microphone keeps capturing while a turn is processed, so utterances that were
+        # said close together in the meantime are answered as a single turn. Queued ones are
+        # taken without waiting, only speech that is still in progress is waited for.
+        if self._next_turn_utterance:
+            buffer, span = self._next_turn_utterance
+            self._next_turn_utterance = None
+        else:
+            buffer = self.mic.await_buffer()
+            if buffer is None:
+                # Only happens when the microphone has run out of input (a finished replay)
+                return None
+            span = self.mic.get_last_utterance_span()
+
+        window = self.server_config.utterance_coalesce_window
+        buffers = [buffer]
+        last_end = span[1]
+        while True:
+            speech_start = self.mic.get_speech_start()
+            speaking = speech_start is not None and speech_start - last_end <= window
+            buffer = self.mic.await_buffer(timeout=self.server_config.utterance_poll_interval if speaking else 0)
+            if buffer is None:
+                if speaking:
+                    continue
+                break
+
+            span = self.mic.get_last_utterance_span()
+            if span[0] - last_end > window:
+                self._next_turn_utterance = (buffer, span)
+                break
+            buffers.append(buffer)
+            last_end = span[1]
+
+        if len(buffers) == 1:
+            return buffers[0]
+
+        logging.print(f"Coalescing {len(buffers)} utterances into one turn")
+        gap = np.zeros(int(self.server_config.utterance_coalesce_gap * self.mic.get_sample_rate()), dtype=np.float32)
+        parts = [gap] * (len(buffers) * 2 - 1)
+        parts[::2] = buffers
+        return np.concatenate(parts)
+
     def _execute(self) -> ExecutionState:
         if not self.current_scenario or not self.runtime:
             return ExecutionState.INVALID_STATE
         
-        buffer = self.mic.await_buffer()
+        buffer = self._await_turn_audio()
         
         scenario = self.current_scenario
         runtime = self.runtime
-        # Check again as await_buffer can block for long periods of time
-        if not scenario or not runtime:
+        # Check again as _await_turn_audio can block for long periods of time
+        if buffer is None or not scenario or not runtime:
             return ExecutionState.INVALID_STATE
         
         self.display.set_icon_state(thinking=True)
         user_query = self.stt_client.transcribe(buffer, self.mic.get_sample_rate())
         logging.print(f"Detected speech: {user_query}")
-        turn_result = runtime.execute(user_query)
-        self.display.set_icon_state(thinking=False)
+
+        # Each ghost starts speaking as soon as its answer exists, in ghost_order
+        speech_jobs: List[Future] = []
+        def play_ghost_actions(role: GhostRole, actions: GhostActions):
+            ghost = scenario.primary_ghost if role == "primary" else scenario.secondary_ghost
+            speech_jobs.append(self._speech_executor.submit(
+                self._execute_ghost_actions, actions, ghost.tts_voice_model, self.ghost_effects[role]
+            ))
+
+        try:
+            turn_result = runtime.execute(user_query, on_ghost_actions=play_ghost_actions)
+        finally:
+            self.display.set_icon_state(thinking=False)
+            for job in speech_jobs:
+                job.result()
         
         if turn_result.game_result:
             if turn_result.game_result == "win":
@@ -248,14 +382,6 @@ class Server:
         primary_has_content = primary_actions and primary_actions.speech
         secondary_actions = turn_result.secondary_ghost_actions
         secondary_has_content = secondary_actions and secondary_actions.speech
-        
-        primary_first = turn_result.ghost_order == "primary"
-        if primary_first and primary_actions:
-            self._execute_ghost_actions(primary_actions, scenario.primary_ghost.tts_voice_model)
-        if secondary_actions:
-            self._execute_ghost_actions(secondary_actions, scenario.secondary_ghost.tts_voice_model)
-        if not primary_first and primary_actions:
-            self._execute_ghost_actions(primary_actions, scenario.primary_ghost.tts_voice_model)
             
         if not primary_has_content and not secondary_has_content:
             self.display.set_icon_state(no_response=True)
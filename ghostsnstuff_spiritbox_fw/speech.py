@@ -1,21 +1,134 @@
 from openai import OpenAI
-from typing import Self, Literal
+from typing import Self, Literal, Dict, Iterator
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from scipy.io.wavfile import write
 import io
 import soundfile as sf
-from .utils import numpy_to_wav
+from .utils import numpy_to_audio_file
+from . import logging
 
 VOICE_MODELS = Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"]
+STT_AUDIO_FORMATS = Literal["wav", "flac"]
+TTS_MODEL = "tts-1-hd"
+TTS_STREAM_CHUNK_BYTES = 4096
+TTS_MAX_CONCURRENT_REQUESTS = 3
+
+class TTSCache:
+    """On-disk cache of synthesized speech.
+
+    Entries are raw 16-bit PCM files named after a hash of (text, voice, model, speed), so
+    they can be memory-mapped straight back into numpy. The least recently used entries
+    are evicted once the cache grows past max_bytes."""
+
+    def __init__(self, directory: Path, max_bytes: int) -> Self:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, int] = OrderedDict()  # key -> size, oldest first
+        self._size = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in sorted(self.directory.glob("*.pcm"), key=lambda p: p.stat().st_mtime):
+            size = path.stat().st_size
+            self._entries[path.stem] = size
+            self._size += size
+        self._evict()
+
+    @staticmethod
+    def make_key(content: str, voice_model: str, model: str, speed: float) -> str:
+        return hashlib.sha256(f"{model}\0{voice_model}\0{speed:.3f}\0{content}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pcm"
+
+    def get(self, key: str) -> np.ndarray | None:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            path = self._path(key)
+            try:
+                os.utime(path)  # Keeps the LRU order across restarts
+                if self._entries[key] == 0:
+                    return np.empty(0, dtype=np.int16)
+                return np.memmap(path, dtype=np.int16, mode="r")
+            except (OSError, ValueError) as ex:
+                # ValueError comes from memmap on a truncated or odd-sized file
+                logging.warn(f"TTS cache entry {key} is unreadable, dropping it: {ex}")
+                self._size -= self._entries.pop(key)
+                self.hits -= 1
+                self.misses += 1
+                return None
+
+    def put(self, key: str, pcm: bytes):
+        with self._lock:
+            if len(pcm) > self.max_bytes:
+                return
+
+            path = self._path(key)
+            temp_path = path.with_suffix(".tmp")
+            try:
+                temp_path.write_bytes(pcm)
+                os.replace(temp_path, path)
+            except OSError as ex:
+                logging.warn(f"Failed to write TTS cache entry {key}: {ex}")
+                return
+
+            self._size += len(pcm) - self._entries.get(key, 0)
+            self._entries[key] = len(pcm)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes
+            }
 
 class TTSClient:
-    def __init__(self, client: OpenAI) -> Self:
+    def __init__(self, client: OpenAI, cache: TTSCache | None = None, max_concurrent_requests: int = TTS_MAX_CONCURRENT_REQUESTS) -> Self:
         self.client = client
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_requests, thread_name_prefix="tts")
+
+    def _fetch_pcm(self, content: str, voice_model: str, speed: float) -> np.ndarray:
+        key = None
+        if self.cache:
+            key = TTSCache.make_key(content, voice_model, TTS_MODEL, speed)
+            pcm_data = self.cache.get(key)
+            if pcm_data is not None:
+                return pcm_data
 
-    def synthesize(self, content: str, voice_model: str, speed: float = 1.0) -> np.ndarray:
-        print(content)
         response = self.client.audio.speech.create(
-            model="tts-1-hd",
+            model=TTS_MODEL,
             voice=voice_model,
             input=content,
             response_format="pcm",
@@ -23,21 +136,76 @@ class TTSClient:
             timeout=5
         )
 
-        pcm_data = np.frombuffer(response.content, dtype=np.int16)  # assuming 16-bit PCM data
+        if self.cache:
+            self.cache.put(key, response.content)
+        return np.frombuffer(response.content, dtype=np.int16)  # assuming 16-bit PCM data
+
+    def synthesize(self, content: str, voice_model: str, speed: float = 1.0) -> np.ndarray:
+        logging.print(f"TTS: {content}")
+        pcm_data = self._fetch_pcm(content, voice_model, speed)
         audio_data = pcm_data.astype(np.float32) / 32768.0  # normalize to range -1.0 to 1.0
         return audio_data
 
-    def synthesize_batch(self, content: list[str], voice_model: str, speed: float = 1.0) -> list[np.ndarray]:
-        return [self.synthesize(text, voice_model, speed) for text in content]
+    def synthesize_stream(self, content: str, voice_model: str, speed: float = 1.0, chunk_size: int = TTS_STREAM_CHUNK_BYTES) -> Iterator[np.ndarray]:
+        """Yields normalized float chunks as the response body arrives. Cached lines come out as a single chunk."""
+        logging.print(f"TTS stream: {content}")
+        key = None
+        if self.cache:
+            key = TTSCache.make_key(content, voice_model, TTS_MODEL, speed)
+            pcm_data = self.cache.get(key)
+            if pcm_data is not None:
+                yield pcm_data.astype(np.float32) / 32768.0
+                return
+
+        received = bytearray()
+        remainder = b""
+        with self.client.audio.speech.with_streaming_response.create(
+            model=TTS_MODEL,
+            voice=voice_model,
+            input=content,
+            response_format="pcm",
+            speed=speed,
+            timeout=5
+        ) as response:
+            for data in response.iter_bytes(chunk_size):
+                if self.cache:
+                    received += data
+                # Chunks can split a sample in half, carry the odd byte over
+                data = remainder + data
+                usable = len(data) - len(data) % 2
+                remainder = data[usable:]
+                if usable:
+                    yield np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32) / 32768.0
+
+        if self.cache:
+            self.cache.put(key, bytes(received))
+
+    def synthesize_batch(self, content: list[str], voice_model: str, speed: float = 1.0) -> Iterator[np.ndarray]:
+        """Requests every entry at once on a bounded pool and yields the results in order, so the
+        first one can be played while the rest are still being synthesized."""
+        futures = [self._executor.submit(self.synthesize, text, voice_model, speed) for text in content]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
 
 class STTClient:
-    def __init__(self, client: OpenAI) -> Self:
+    def __init__(self, client: OpenAI, audio_format: STT_AUDIO_FORMATS = "flac") -> Self:
         self.client = client
+        self.audio_format = audio_format
 
     def transcribe(self, buffer, sample_rate):
-        wav_io = numpy_to_wav(buffer, sample_rate)
-        with open("output.wav", "wb") as f:
-            f.write(wav_io.read())
-        wav_io.seek(0)
-        audio_file = open("output.wav", "rb")
-        return self.client.audio.transcriptions.create(model="whisper-1", file=audio_file, response_format="text")
\ No newline at end of file
+        # Encoded straight into memory as 16-bit PCM (optionally FLAC compressed), nothing touches the disk
+        encode_start = time.perf_counter()
+        audio_file = numpy_to_audio_file(buffer, sample_rate, self.audio_format)
+        encode_ms = (time.perf_counter() - encode_start) * 1000
+        upload_bytes = audio_file.getbuffer().nbytes
+        logging.print(f"STT upload: {upload_bytes} bytes of {self.audio_format} for {len(buffer) / sample_rate:.2f}s of audio, encoded in {encode_ms:.1f} ms")
+
+        return self.client.audio.transcriptions.create(
+            model="whisper-1",
+            file=(f"speech.{self.audio_format}", audio_file),
+            response_format="text"
+        )
@@ -5,6 +5,7 @@ import soundfile as sf
 from scipy.io.wavfile import write
 from scipy.signal import butter, filtfilt, resample
 from . import logging
+from .effects import get_haunted_effect
 
 
 def clamp(n, minimum, maximum):
@@ -93,10 +94,15 @@ def polish_to_english(text):
     )
     return text.translate(polishenglish)
 
-def numpy_to_wav(buffer, sample_rate):
-    pcm_int16 = np.int16(buffer * 32767)
+AUDIO_FILE_FORMATS = {
+    "wav": ("WAV", "PCM_16"),
+    "flac": ("FLAC", "PCM_16"),
+}
+
+def numpy_to_audio_file(buffer, sample_rate, audio_format="wav"):
+    container, subtype = AUDIO_FILE_FORMATS[audio_format]
     memory_buffer = io.BytesIO()
-    sf.write(memory_buffer, buffer, sample_rate, format='WAV', subtype='FLOAT')
+    sf.write(memory_buffer, buffer, sample_rate, format=container, subtype=subtype)
     memory_buffer.seek(0)
     return memory_buffer
 
@@ -152,13 +158,5 @@ def variable_noise(audio, sample_rate, base_noise=0.00001, max_noise=0.01, chang
 
 
 def haunted_effect(audio, sample_rate):
-    # Apply each effect with a light touch
-    audio = bit_reduction(audio, bit_depth=5, mix=0.8)
-    audio = sample_rate_reduction(audio, sample_rate, 8000, mix=0.8)
-    audio = bandpass_filter(audio, 300, 3000, sample_rate)
-    audio = amplitude_modulation(audio, sample_rate, mod_freq=2, depth=0.2)
-    audio = add_noise(audio, noise_level=0.00001)
-    
-    # Add random dropouts and variable noise
-    audio = random_dropouts(audio, dropout_rate=0.2, dropout_length=0.05, sample_rate=sample_rate)    
-    return np.clip(audio, -1.0, 1.0)  # Ensure the signal stays within [-1.0, 1.0]
+    # Filters and resampling ratios are designed once per sample rate, see effects.py
+    return get_haunted_effect(sample_rate).process(audio)
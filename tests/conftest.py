@@ -0,0 +1,20 @@
+import pytest
+from ghostsnstuff_spiritbox_fw.hal.emf import BluetoothEMFDriver
+from tests.helpers import wait_until
+
+
+@pytest.fixture
+def connect_emf():
+    """Creates a BluetoothEMFDriver on a fake device and waits until the initial reset was written."""
+    drivers = []
+
+    def connect(device, **kwargs) -> BluetoothEMFDriver:
+        emf = BluetoothEMFDriver(device=device, **kwargs)
+        drivers.append(emf)
+        wait_until(emf.is_connected, message="fake device never connected")
+        assert emf.flush(timeout=2.0)
+        return emf
+
+    yield connect
+    for emf in drivers:
+        emf.close()
@@ -0,0 +1,8 @@
+import time
+
+
+def wait_until(condition, timeout: float = 2.0, message: str = "condition never became true"):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, message
+        time.sleep(0.01)
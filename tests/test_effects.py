@@ -0,0 +1,108 @@
+import threading
+import numpy as np
+import pytest
+from ghostsnstuff_spiritbox_fw import effects
+from ghostsnstuff_spiritbox_fw.effects import compile_stage, compile_voice_effect, stage_parameters
+from ghostsnstuff_spiritbox_fw.scenario import (
+    VoiceEffectDefinition, BitReductionEffect, SampleRateReductionEffect, BandpassEffect,
+    AmplitudeModulationEffect, NoiseEffect, DropoutsEffect
+)
+
+SAMPLE_RATE = 16000
+
+INVALID_STAGES = [
+    BandpassEffect(type="bandpass", highcut=9000),
+    BandpassEffect(type="bandpass", lowcut=4000, highcut=3000),
+    BandpassEffect(type="bandpass", lowcut=-10, highcut=0, order=0),
+    SampleRateReductionEffect(type="sample_rate_reduction", target_rate=0),
+    SampleRateReductionEffect(type="sample_rate_reduction", target_rate=-8000, mix=3),
+    BitReductionEffect(type="bit_reduction", bit_depth=40),
+    BitReductionEffect(type="bit_reduction", bit_depth=0),
+    AmplitudeModulationEffect(type="amplitude_modulation", mod_freq=-1, depth=5),
+    NoiseEffect(type="noise", noise_level=-1),
+    DropoutsEffect(type="dropouts", interval=0, dropout_length=-1),
+]
+
+
+def tone(seconds: float = 0.5) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+@pytest.mark.parametrize("definition", INVALID_STAGES, ids=lambda definition: definition.type)
+def test_invalid_stage_parameters_are_clamped(definition):
+    stage = compile_stage(definition, SAMPLE_RATE)
+    audio = stage.process(tone())
+    assert np.all(np.isfinite(audio))
+
+    state = stage.new_state()
+    block = stage.process_block(tone(0.05), state)
+    assert np.all(np.isfinite(block))
+
+
+def test_bandpass_is_kept_below_nyquist_and_open():
+    params = stage_parameters(BandpassEffect(type="bandpass", lowcut=7000, highcut=9000), SAMPLE_RATE)
+    assert params["highcut"] < SAMPLE_RATE / 2
+    assert params["lowcut"] < params["highcut"]
+
+
+def test_valid_parameters_are_left_alone():
+    definition = BandpassEffect(type="bandpass", lowcut=900, highcut=5000, order=3)
+    assert stage_parameters(definition, SAMPLE_RATE) == {"lowcut": 900, "highcut": 5000, "order": 3}
+
+
+def test_stages_that_fail_to_compile_fall_back_to_the_default_voice(monkeypatch):
+    def broken(*args, **kwargs):
+        raise ValueError("filter design failed")
+    monkeypatch.setattr(effects, "BandpassFilter", broken)
+    definition = VoiceEffectDefinition(stages=[NoiseEffect(type="noise"), BandpassEffect(type="bandpass")])
+    monkeypatch.setattr(effects, "VOICE_PRESETS", {effects.DEFAULT_VOICE_PRESET: [NoiseEffect(type="noise")]})
+
+    chain = compile_voice_effect(definition, SAMPLE_RATE)
+    assert [type(stage) for stage in chain.stages] == [effects.Noise]
+
+
+
+class InterleavedModulation(effects.AmplitudeModulation):
+    """Replaces the cached envelope with a short one right after a long call stored its own."""
+
+    SHORT, LONG = 100, 1000
+
+    def __init__(self):
+        self.computing_short = threading.Event()
+        self.stored_long = threading.Event()
+        self.stored_short = threading.Event()
+        super().__init__(SAMPLE_RATE)
+
+    def envelope(self, start, length):
+        if length == self.SHORT:
+            self.computing_short.set()
+            self.stored_long.wait(timeout=2)
+        return super().envelope(start, length)
+
+    @property
+    def _envelope(self):
+        return self._cached
+
+    @_envelope.setter
+    def _envelope(self, envelope):
+        self._cached = envelope
+        if len(envelope) == self.LONG:
+            self.stored_long.set()
+            self.stored_short.wait(timeout=2)
+        elif len(envelope) == self.SHORT:
+            self.stored_short.set()
+
+
+def test_shared_amplitude_modulation_is_thread_safe():
+    # Cached stages are shared by every thread that plays the same voice
+    stage = InterleavedModulation()
+    results = {}
+    short = threading.Thread(target=lambda: results.update(short=stage.process(np.ones(stage.SHORT, dtype=np.float32))))
+    short.start()
+    assert stage.computing_short.wait(timeout=2)
+    results["long"] = stage.process(np.ones(stage.LONG, dtype=np.float32))
+    short.join()
+
+    assert np.array_equal(results["long"], stage.envelope(0, stage.LONG))
+    assert np.array_equal(results["short"], stage.envelope(0, stage.SHORT))
@@ -0,0 +1,73 @@
+import types
+import pytest
+from ghostsnstuff_spiritbox_fw.hal import emf
+from ghostsnstuff_spiritbox_fw.hal.emf import GattCharacteristicAccess
+
+
+class PublicCharacteristic:
+    """Only the public gatt.Characteristic API."""
+
+    def __init__(self):
+        self.written = []
+
+    def write_value(self, value):
+        self.written.append(bytes(value))
+
+
+class BlueZCharacteristic(PublicCharacteristic):
+    """Has the private attributes gatt 0.2 characteristics carry."""
+
+    def __init__(self, properties):
+        super().__init__()
+        self.sent = []
+        self._properties = types.SimpleNamespace(Get=lambda interface, name: properties[name])
+        self._object = types.SimpleNamespace(WriteValue=lambda value, options, **kwargs: self.sent.append((bytes(value), options)))
+        self._write_value_succeeded = lambda: None
+        self._write_value_failed = lambda error: None
+
+
+@pytest.fixture
+def warnings(monkeypatch):
+    warned = []
+    monkeypatch.setattr(emf.logging, "warn", warned.append)
+    monkeypatch.setattr(GattCharacteristicAccess, "_fallback_logged", False)
+    monkeypatch.setattr(emf, "dbus", types.SimpleNamespace(Byte=int), raising=False)
+    return warned
+
+
+def test_known_gatt_uses_the_internals(monkeypatch, warnings):
+    monkeypatch.setattr(emf, "_gatt_version", lambda: "0.2.7")
+    characteristic = BlueZCharacteristic({"Flags": ["write", "write-without-response"], "MTU": 247})
+    access = GattCharacteristicAccess(characteristic)
+
+    assert access.uses_internals
+    assert access.get_property("Flags", []) == ["write", "write-without-response"]
+    assert access.get_property("MTU") == 247
+    access.write(b"\x03", without_response=True)
+    access.write(b"\x02\x05", without_response=False)
+    assert characteristic.sent == [(b"\x03", {"type": "command"})]
+    assert characteristic.written == [b"\x02\x05"]
+    assert warnings == []
+
+
+@pytest.mark.parametrize("version, characteristic", [
+    ("0.2.7", PublicCharacteristic()),  # Internals missing
+    ("0.3.0", BlueZCharacteristic({"Flags": ["write-without-response"], "MTU": 247})),  # Unchecked release
+    (None, BlueZCharacteristic({"Flags": ["write-without-response"], "MTU": 247})),  # Version unknown
+])
+def test_fallback_to_the_public_api(monkeypatch, warnings, version, characteristic):
+    monkeypatch.setattr(emf, "_gatt_version", lambda: version)
+    access = GattCharacteristicAccess(characteristic)
+
+    assert not access.uses_internals
+    assert access.get_property("Flags", []) == []
+    assert access.get_property("MTU") is None
+    access.write(b"\x03", without_response=True)
+    assert characteristic.written == [b"\x03"]
+
+
+def test_fallback_is_logged_once(monkeypatch, warnings):
+    monkeypatch.setattr(emf, "_gatt_version", lambda: None)
+    for _ in range(3):
+        GattCharacteristicAccess(PublicCharacteristic())
+    assert len(warnings) == 1
@@ -0,0 +1,97 @@
+import time
+from ghostsnstuff_spiritbox_fw.hal.emf import (
+    EMFCommandQueue, COMMAND_RESET, COMMAND_SLEEP, COMMAND_SET_ACTIVITY, COMMAND_GLITCH
+)
+from ghostsnstuff_spiritbox_fw.debug.fake_gatt import FakeEMFDevice
+
+
+def drain(commands: EMFCommandQueue) -> list[bytes]:
+    drained = []
+    while (item := commands.get(timeout=0)) is not None:
+        drained.append(item[0])
+        commands.task_done()
+    return drained
+
+
+def test_newer_activity_replaces_a_pending_one():
+    commands = EMFCommandQueue()
+    commands.put(bytes([COMMAND_SET_ACTIVITY, 2]))
+    commands.put(bytes([COMMAND_GLITCH]))
+    commands.put(bytes([COMMAND_SET_ACTIVITY, 5]))
+
+    assert drain(commands) == [bytes([COMMAND_GLITCH]), bytes([COMMAND_SET_ACTIVITY, 5])]
+    assert commands.coalesced == 1
+    assert commands.join(timeout=0)
+
+
+def test_pending_glitch_absorbs_new_ones():
+    commands = EMFCommandQueue()
+    for _ in range(5):
+        commands.put(bytes([COMMAND_GLITCH]))
+
+    assert drain(commands) == [bytes([COMMAND_GLITCH])]
+    assert commands.coalesced == 4
+
+
+def test_reset_and_sleep_discard_everything_before_them():
+    commands = EMFCommandQueue()
+    commands.put(bytes([COMMAND_SET_ACTIVITY, 3]))
+    commands.put(bytes([COMMAND_GLITCH]))
+    commands.put(bytes([COMMAND_RESET]))
+    commands.put(bytes([COMMAND_SET_ACTIVITY, 1]))
+    commands.put(bytes([COMMAND_SLEEP]))
+
+    assert drain(commands) == [bytes([COMMAND_SLEEP])]
+    assert commands.join(timeout=0)
+
+
+def test_full_queue_drops_the_oldest_command():
+    commands = EMFCommandQueue(max_size=2)
+    commands.put(bytes([COMMAND_SET_ACTIVITY, 3]))
+    commands.put(bytes([COMMAND_GLITCH]))
+    commands.put(bytes([0x7F]))
+
+    assert drain(commands) == [bytes([COMMAND_GLITCH]), bytes([0x7F])]
+    assert commands.dropped == 1
+
+
+def test_burst_does_not_block_and_ends_in_the_last_state(connect_emf):
+    device = FakeEMFDevice()
+    emf = connect_emf(device)
+    device.writes.clear()
+    written_before = emf.get_stats()["written"]
+    start = time.monotonic()
+    for level in range(40):
+        emf.set_activity(level % 6)
+        emf.glitch()
+    emf.set_activity(3)
+    # Every write takes several ms on the fake radio, queueing takes none of it
+    assert time.monotonic() - start < device.write_command_latency * 10
+    assert emf.flush(timeout=5.0)
+
+    assert device.activity == 3
+    assert len(device.writes) < 81
+    stats = emf.get_stats()
+    assert stats["coalesced"] > 0
+    assert stats["written"] - written_before == len(device.writes)
+
+
+def test_uses_write_without_response_when_the_characteristic_allows_it(connect_emf):
+    device = FakeEMFDevice(supports_write_without_response=True)
+    emf = connect_emf(device)
+    device.writes.clear()
+    emf.set_activity(4)
+    assert emf.flush(timeout=2.0)
+
+    assert [(data, without_response) for _, data, without_response in device.writes] == [(bytes([COMMAND_SET_ACTIVITY, 4]), True)]
+    assert emf.get_stats()["write_without_response"]
+
+
+def test_falls_back_to_write_requests(connect_emf):
+    device = FakeEMFDevice(supports_write_without_response=False)
+    emf = connect_emf(device)
+    device.writes.clear()
+    emf.set_activity(4)
+    assert emf.flush(timeout=2.0)
+
+    assert [(data, without_response) for _, data, without_response in device.writes] == [(bytes([COMMAND_SET_ACTIVITY, 4]), False)]
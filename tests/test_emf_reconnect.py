@@ -0,0 +1,74 @@
+from ghostsnstuff_spiritbox_fw.hal.emf import COMMAND_RESET, COMMAND_SET_ACTIVITY
+from ghostsnstuff_spiritbox_fw.debug.fake_gatt import FakeEMFDevice
+from tests.helpers import wait_until
+
+
+def reconnect(emf, device: FakeEMFDevice):
+    connects = emf.get_connection_stats()["reconnects"]
+    device.drop_connection()
+    wait_until(lambda: emf.get_connection_stats()["reconnects"] > connects, message="driver never reconnected")
+    assert emf.flush(timeout=2.0)
+
+
+def test_activity_is_restored_after_a_reconnect(connect_emf):
+    device = FakeEMFDevice()
+    emf = connect_emf(device)
+    emf.set_activity(4)
+    assert emf.flush(timeout=2.0)
+    device.writes.clear()
+
+    reconnect(emf, device)
+    assert [data for _, data, _ in device.writes] == [bytes([COMMAND_RESET]), bytes([COMMAND_SET_ACTIVITY, 4])]
+    assert device.activity == 4
+    stats = emf.get_connection_stats()
+    assert stats["connected"]
+    assert stats["disconnects"] == 1
+    assert stats["reconnects"] == 1
+
+
+def test_sleep_is_restored_after_a_reconnect(connect_emf):
+    device = FakeEMFDevice()
+    emf = connect_emf(device)
+    emf.set_activity(4)
+    emf.sleep()
+    assert emf.flush(timeout=2.0)
+
+    reconnect(emf, device)
+    assert device.asleep
+    assert device.activity is None
+
+
+def test_level_set_while_disconnected_is_sent_once_connected(connect_emf):
+    device = FakeEMFDevice()
+    emf = connect_emf(device)
+    device.connect_delay = 0.3
+    device.drop_connection()
+    wait_until(lambda: not emf.is_connected())
+
+    assert not emf.set_activity(5)
+    wait_until(emf.is_connected, message="driver never reconnected")
+    assert emf.flush(timeout=2.0)
+    assert device.activity == 5
+
+
+def test_failed_connects_are_retried(connect_emf):
+    device = FakeEMFDevice(failed_connects=1)
+    emf = connect_emf(device)
+    emf.set_activity(2)
+    assert emf.flush(timeout=2.0)
+
+    assert device.connect_attempts == 2
+    assert device.activity == 2
+    stats = emf.get_connection_stats()
+    assert stats["connect_failures"] == 1
+    assert stats["reconnects"] == 0
+
+
+def test_each_attempt_starts_from_a_released_device(connect_emf):
+    device = FakeEMFDevice(failed_connects=1)
+    emf = connect_emf(device)
+    reconnect(emf, device)
+    reconnect(emf, device)
+
+    assert device.connect_attempts == 4
+    assert device.max_signal_handlers == 1
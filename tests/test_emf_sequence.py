@@ -0,0 +1,101 @@
+import pytest
+from ghostsnstuff_spiritbox_fw.hal.emf import (
+    EMFSequence, COMMAND_PLAY_SEQUENCE, COMMAND_SET_ACTIVITY, COMMAND_GLITCH, EMF_SEQUENCE_MAX_BYTES, SEQUENCE_STEP
+)
+from ghostsnstuff_spiritbox_fw.debug.fake_gatt import FakeEMFDevice
+from tests.helpers import wait_until
+
+
+def short_sequence() -> EMFSequence:
+    # 26 bytes uploaded, too long for the default 23 byte MTU
+    sequence = EMFSequence().activity(6).wait(0.05)
+    for _ in range(4):
+        sequence.glitch().wait(0.02)
+    return sequence.wait(0.1).activity(0)
+
+
+def performed(device: FakeEMFDevice) -> list[tuple[int, int]]:
+    return [(command, value) for _, command, value in device.events]
+
+
+def test_encoding():
+    sequence = EMFSequence().wait(0.25).activity(6).wait(1.5).glitch().wait(3)
+    assert sequence.encode() == bytes([COMMAND_PLAY_SEQUENCE, 2]) + bytes([COMMAND_SET_ACTIVITY, 6, 250, 0, COMMAND_GLITCH, 0, 0xDC, 0x05])
+    assert sequence.duration == pytest.approx(1.75)
+    assert sequence.final_activity == 6
+    assert FakeEMFDevice.decode_sequence(sequence.encode()) == [(COMMAND_SET_ACTIVITY, 6, 250), (COMMAND_GLITCH, 0, 1500)]
+
+
+def test_limits():
+    with pytest.raises(Exception):
+        EMFSequence().wait(70).activity(1)
+
+    sequence = EMFSequence()
+    steps = (EMF_SEQUENCE_MAX_BYTES - 2) // SEQUENCE_STEP.size
+    for _ in range(steps):
+        sequence.glitch()
+    with pytest.raises(Exception):
+        sequence.glitch()
+    assert len(sequence.encode()) <= EMF_SEQUENCE_MAX_BYTES
+
+
+def test_upload_is_a_single_write(connect_emf):
+    device = FakeEMFDevice()
+    emf = connect_emf(device, sequence_upload=True)
+    device.writes.clear()
+    device.events.clear()
+    sequence = short_sequence()
+
+    emf.play_sequence(sequence)
+    assert emf.wait_sequence(timeout=2.0)
+    # The meter runs the steps on its own timer, which the host can only estimate
+    wait_until(lambda: len(device.events) == len(sequence.steps), timeout=0.5)
+    assert [data for _, data, _ in device.writes] == [sequence.encode()]
+    assert device.sequences == [FakeEMFDevice.decode_sequence(sequence.encode())]
+    assert performed(device) == [(command, value) for command, value, _ in sequence.steps]
+    assert emf.get_connection_stats()["activity_level"] == 0
+
+
+@pytest.mark.parametrize("upload, mtu", [(False, 247), (True, 23), (True, None)])
+def test_played_step_by_step(connect_emf, upload, mtu):
+    # Upload off, a sequence longer than the MTU allows and an unknown MTU all fall back
+    device = FakeEMFDevice(mtu=mtu)
+    emf = connect_emf(device, sequence_upload=upload)
+    device.writes.clear()
+    device.events.clear()
+    sequence = short_sequence()
+
+    emf.play_sequence(sequence)
+    assert emf.wait_sequence(timeout=2.0)
+    assert emf.flush(timeout=2.0)
+    assert not any(data[0] == COMMAND_PLAY_SEQUENCE for _, data, _ in device.writes)
+    assert not device.malformed_sequences
+    # Steps go through the command queue, which on a busy machine may merge glitches still waiting there
+    events = performed(device)
+    assert [value for command, value in events if command == COMMAND_SET_ACTIVITY] == [6, 0]
+    assert events[0] == (COMMAND_SET_ACTIVITY, 6) and events[-1] == (COMMAND_SET_ACTIVITY, 0)
+    assert 1 <= sum(command == COMMAND_GLITCH for command, _ in events) <= 4
+
+
+def test_reset_after_wait_sequence_is_not_overwritten(connect_emf):
+    device = FakeEMFDevice()
+    emf = connect_emf(device)
+    emf.play_sequence(short_sequence())
+    assert emf.wait_sequence(timeout=2.0)
+    emf.set_activity(1)
+    assert emf.flush(timeout=2.0)
+    assert device.activity == 1
+
+
+def test_stop_sequence_cancels_the_remaining_steps(connect_emf):
+    device = FakeEMFDevice()
+    emf = connect_emf(device)
+    device.events.clear()
+    emf.play_sequence(EMFSequence().activity(6).wait(0.3).activity(0))
+    emf.stop_sequence()
+    emf.set_activity(1)
+    assert emf.flush(timeout=2.0)
+    assert emf.wait_sequence(timeout=0.5)
+
+    assert device.activity == 1
+    assert (COMMAND_SET_ACTIVITY, 0) not in performed(device)
@@ -0,0 +1,38 @@
+import numpy as np
+from ghostsnstuff_spiritbox_fw.hal.endpointing import (
+    Endpointer, ENDPOINT_DEFAULT_HANGOVER_MS, ENDPOINT_MIN_HANGOVER_MS, ENDPOINT_MIN_LEARNED_PAUSES
+)
+
+FRAME_DURATION_MS = 30
+VOICED = np.full(480, 3000, dtype=np.int16)
+SILENT = np.full(480, 10, dtype=np.int16)
+
+
+def speak(endpointer: Endpointer, words: int, pause_frames: int, word_frames: int = 10) -> list:
+    events = []
+    for word in range(words):
+        if word:
+            events += [endpointer.process(SILENT, False) for _ in range(pause_frames)]
+        events += [endpointer.process(VOICED, True) for _ in range(word_frames)]
+    return [event for event in events if event]
+
+
+def test_a_few_short_pauses_keep_the_default_hangover():
+    endpointer = Endpointer(FRAME_DURATION_MS)
+    assert speak(endpointer, 3, pause_frames=2) == ["start"]
+    assert endpointer.hangover_frames == round(ENDPOINT_DEFAULT_HANGOVER_MS / FRAME_DURATION_MS)
+
+
+def test_learned_hangover_stays_above_the_minimum():
+    endpointer = Endpointer(FRAME_DURATION_MS)
+    assert speak(endpointer, ENDPOINT_MIN_LEARNED_PAUSES + 1, pause_frames=2) == ["start"]
+    assert endpointer.hangover_frames == round(ENDPOINT_MIN_HANGOVER_MS / FRAME_DURATION_MS)
+
+
+def test_hangover_grows_for_slow_speakers():
+    endpointer = Endpointer(FRAME_DURATION_MS)
+    pause_frames = round(ENDPOINT_DEFAULT_HANGOVER_MS / FRAME_DURATION_MS) - 2
+    assert speak(endpointer, ENDPOINT_MIN_LEARNED_PAUSES + 1, pause_frames=pause_frames) == ["start"]
+    assert endpointer.hangover_frames > pause_frames * 1.4
+    # A pause as long as the ones seen so far no longer ends the turn
+    assert speak(endpointer, 2, pause_frames=pause_frames) == []
@@ -0,0 +1,118 @@
+import time
+import numpy as np
+import pytest
+from ghostsnstuff_spiritbox_fw.hal.gating import GatedMicrophone
+from ghostsnstuff_spiritbox_fw.hal.microphone import Microphone
+
+SAMPLE_RATE = 16000
+
+
+class StubMicrophone(Microphone):
+    def __init__(self, buffers):
+        self.buffers = list(buffers)
+        self.suppression_callback = None
+
+    def await_buffer(self, timeout=None):
+        return self.buffers.pop(0) if self.buffers else None
+
+    def discard_buffers(self):
+        self.buffers.clear()
+
+    def get_last_utterance_span(self):
+        return None
+
+    def get_speech_start(self):
+        return None
+
+    def register_icon_callback(self, callback):
+        pass
+
+    def unregister_icon_callback(self):
+        pass
+
+    def register_suppression_callback(self, callback):
+        self.suppression_callback = callback
+
+    def unregister_suppression_callback(self):
+        self.suppression_callback = None
+
+    def get_sample_rate(self):
+        return SAMPLE_RATE
+
+
+class StubSpeaker:
+    def __init__(self):
+        self.playing = False
+
+    def is_playing(self):
+        return self.playing
+
+
+def voice(seconds: float, level: float = 0.3) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    buzz = sum(np.sin(2 * np.pi * 130 * k * t) / k for k in range(1, 20))
+    return (level * buzz / np.abs(buzz).max() * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))).astype(np.float32)
+
+
+def bump(seconds: float) -> np.ndarray:
+    # A short loud knock followed by near silence: loud enough overall, but hardly any voiced frames
+    audio = np.random.default_rng(0).uniform(-0.002, 0.002, int(seconds * SAMPLE_RATE)).astype(np.float32)
+    audio[:int(0.05 * SAMPLE_RATE)] += np.random.default_rng(1).uniform(-0.8, 0.8, int(0.05 * SAMPLE_RATE)).astype(np.float32)
+    return audio
+
+
+def gate(buffers, release_seconds: float = 0.5):
+    mic = StubMicrophone(buffers)
+    speaker = StubSpeaker()
+    return GatedMicrophone(mic, speaker, release_seconds=release_seconds), mic, speaker
+
+
+@pytest.mark.parametrize("buffer, reason", [
+    (voice(0.1), "too_short"),
+    (voice(1.0, level=0.001), "low_energy"),
+    (bump(1.0), "low_voiced_ratio"),
+])
+def test_noise_like_captures_are_rejected(buffer, reason):
+    gated, _, _ = gate([buffer])
+    assert gated.await_buffer(timeout=0) is None
+    stats = gated.get_stats()
+    assert stats[f"rejected_{reason}"] == 1
+    assert stats["accepted"] == 0
+
+
+def test_speech_gets_through_after_rejections():
+    speech = voice(1.0)
+    gated, _, _ = gate([voice(0.1), bump(1.0), speech])
+    assert gated.await_buffer(timeout=0) is speech
+    stats = gated.get_stats()
+    assert stats["accepted"] == 1
+    assert stats["rejected_too_short"] == 1
+    assert stats["rejected_low_voiced_ratio"] == 1
+
+
+def test_input_is_suppressed_during_playback_and_the_release_time():
+    gated, mic, speaker = gate([], release_seconds=0.2)
+    assert not mic.suppression_callback()
+
+    speaker.playing = True
+    assert mic.suppression_callback()
+    speaker.playing = False
+    assert mic.suppression_callback()
+    time.sleep(0.25)
+    assert not mic.suppression_callback()
+    assert gated.get_stats()["suppressed_frames"] == 2
+
+
+def test_registered_suppression_callback_is_chained():
+    gated, mic, speaker = gate([], release_seconds=0.0)
+    suppressed = False
+    gated.register_suppression_callback(lambda: suppressed)
+    assert not mic.suppression_callback()
+    suppressed = True
+    assert mic.suppression_callback()
+
+    # Unregistering only removes the chained callback, playback still suppresses the input
+    gated.unregister_suppression_callback()
+    assert not mic.suppression_callback()
+    speaker.playing = True
+    assert mic.suppression_callback()
@@ -0,0 +1,71 @@
+import types
+import random
+from benchmarks.prompt_prefix import QUERIES, SCENARIO, RecordingCompletions
+from ghostsnstuff_spiritbox_fw.agents import TokenUsage
+from ghostsnstuff_spiritbox_fw.conversation import Conversation, Message
+from ghostsnstuff_spiritbox_fw.events import EventTimeline
+from ghostsnstuff_spiritbox_fw.runtime import GameRuntime, RuntimeConfig
+from ghostsnstuff_spiritbox_fw.scenario import load_scenario
+
+TRANSCRIPT_END = "\n```\n### **Current Interaction**"
+EMPTY_TRANSCRIPT = "(nothing has been said yet)"
+
+
+def play(turns: int) -> list:
+    completions = RecordingCompletions()
+    client = types.SimpleNamespace(beta=types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions)))
+    config = RuntimeConfig()
+    config.initial_activity_level = 7
+    random.seed(0)
+    runtime = GameRuntime(client, load_scenario(SCENARIO), config, EventTimeline())
+    for turn in range(turns):
+        runtime.execute(QUERIES[turn % len(QUERIES)])
+    return completions.requests
+
+
+def test_prompt_prefix_is_identical_across_turns():
+    previous = {}
+    compared = 0
+    for system_prompt, prompt in play(8):
+        if system_prompt in previous:
+            # Up to the end of its transcript, the previous request is repeated byte for byte
+            last = previous[system_prompt]
+            prefix = last[:last.index(TRANSCRIPT_END)].removesuffix(EMPTY_TRANSCRIPT)
+            assert prompt.startswith(prefix)
+            compared += 1
+        previous[system_prompt] = prompt
+    assert compared >= 8
+
+
+def test_transcript_only_grows():
+    conv = Conversation()
+    conv.push(Message("user", "Is anybody here?"))
+    conv.push(Message("primary", "Leave"))
+    assert conv.transcript() == ""
+    assert conv.current_interaction() == "user: Is anybody here?\nprimary: Leave"
+
+    conv.push(Message("user", "Who are you?"))
+    conv.push(Message("curator", "Make the ghost hesitate"))
+    assert conv.transcript() == "user: Is anybody here?\nprimary: Leave"
+    assert conv.current_interaction() == "user: Who are you?\ncurator: Make the ghost hesitate"
+
+
+def test_token_usage_from_response():
+    details = types.SimpleNamespace(cached_tokens=1024)
+    usage = TokenUsage.from_response(types.SimpleNamespace(prompt_tokens=2000, completion_tokens=50, prompt_tokens_details=details))
+    assert (usage.prompt_tokens, usage.cached_tokens, usage.completion_tokens, usage.requests) == (2000, 1024, 50, 1)
+    assert usage.cache_hit_ratio == 1024 / 2000
+
+    # Providers without prompt caching leave out the details or the cached count
+    for details in ({}, {"prompt_tokens_details": None}, {"prompt_tokens_details": types.SimpleNamespace(cached_tokens=None)}):
+        usage = TokenUsage.from_response(types.SimpleNamespace(prompt_tokens=300, completion_tokens=20, **details))
+        assert (usage.prompt_tokens, usage.cached_tokens, usage.completion_tokens) == (300, 0, 20)
+
+    missing = TokenUsage.from_response(None)
+    assert (missing.prompt_tokens, missing.requests, missing.cache_hit_ratio) == (0, 1, 0.0)
+
+    total = TokenUsage()
+    total.add(TokenUsage(100, 50, 10, 1))
+    total.add(TokenUsage(300, 0, 30, 1))
+    assert (total.prompt_tokens, total.cached_tokens, total.completion_tokens, total.requests) == (400, 50, 40, 2)
+    assert total.cache_hit_ratio == 50 / 400
@@ -0,0 +1,124 @@
+import time
+import numpy as np
+import pytest
+from openai import OpenAI
+from ghostsnstuff_spiritbox_fw.speech import TTSClient, TTSCache, TTS_MODEL
+from ghostsnstuff_spiritbox_fw.hal.speaker import get_audio, CaptureBackend, STREAM_MAX_GAIN
+from ghostsnstuff_spiritbox_fw.debug.fake_tts import FakeTTSServer
+
+SAMPLE_RATE = 16000
+LINE = "Who is there?"
+VOICE = "onyx"
+
+
+@pytest.fixture
+def make_server():
+    servers = []
+
+    def make(**kwargs) -> FakeTTSServer:
+        server = FakeTTSServer(sample_rate=SAMPLE_RATE, **kwargs)
+        server.start()
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.stop()
+
+
+def client_for(server: FakeTTSServer) -> OpenAI:
+    return OpenAI(base_url=server.base_url, api_key="fake")
+
+
+def captured_stream(backend: CaptureBackend) -> np.ndarray:
+    segments = [segment for segment in backend.get_segments() if segment.source is None]
+    return np.concatenate([segment.samples[:, 0] for segment in segments]).astype(np.float64)
+
+
+def expected_playback(pcm: np.ndarray) -> np.ndarray:
+    # The stream plays the utterance at the gain that brings its peak to full scale
+    audio = pcm.astype(np.float64) / 32768.0
+    gain = min(1 / np.abs(audio).max(), STREAM_MAX_GAIN)
+    return audio * gain * 32767
+
+
+def play(tts: TTSClient, backend: CaptureBackend, **kwargs):
+    driver = get_audio(sample_rate=SAMPLE_RATE, backend=backend)
+    backend.clear()
+    stream = driver.open_stream(SAMPLE_RATE)
+    chunks = list(tts.synthesize_stream(LINE, VOICE, **kwargs))
+    for chunk in chunks:
+        stream.write(chunk)
+    stream.close()
+    stream.wait()
+    return stream, chunks
+
+
+def test_stream_plays_exactly_the_synthesized_audio(make_server):
+    server = make_server(first_chunk_latency=0.05, realtime_factor=8.0, jitter=0.004)
+    backend = CaptureBackend(realtime=False)
+    # An odd chunk size splits samples across chunks
+    stream, chunks = play(TTSClient(client_for(server)), backend, chunk_size=1001)
+
+    pcm = server.synthesize(LINE)
+    assert len(chunks) > 1
+    assert np.array_equal(np.concatenate(chunks), pcm.astype(np.float32) / 32768.0)
+    assert np.allclose(captured_stream(backend), expected_playback(pcm), atol=1.0)
+
+
+def test_slow_stream_underruns_and_still_plays_everything(make_server):
+    # Slower than real time, so playback catches up with the download
+    server = make_server(first_chunk_latency=0.0, realtime_factor=0.5)
+    backend = CaptureBackend(realtime=True)
+    tts = TTSClient(client_for(server))
+    driver = get_audio(sample_rate=SAMPLE_RATE, backend=backend)
+    backend.clear()
+    stream = driver.open_stream(SAMPLE_RATE, prebuffer_seconds=0.05)
+    for chunk in tts.synthesize_stream(LINE, VOICE):
+        stream.write(chunk)
+    stream.close()
+    stream.wait()
+
+    assert stream.underruns > 0
+    assert np.allclose(captured_stream(backend), expected_playback(server.synthesize(LINE)), atol=1.0)
+
+
+def test_stream_is_cached_once_complete(make_server, tmp_path):
+    server = make_server(first_chunk_latency=0.0, realtime_factor=20.0)
+    cache = TTSCache(tmp_path, max_bytes=1024 * 1024)
+    tts = TTSClient(client_for(server), cache)
+    pcm = server.synthesize(LINE)
+
+    first = list(tts.synthesize_stream(LINE, VOICE, chunk_size=999))
+    key = TTSCache.make_key(LINE, VOICE, TTS_MODEL, 1.0)
+    assert np.array_equal(cache.get(key), pcm)
+
+    second = list(tts.synthesize_stream(LINE, VOICE))
+    assert len(second) == 1
+    assert np.array_equal(second[0], np.concatenate(first))
+    assert len(server.requests) == 1
+
+
+def test_stream_gain_follows_the_running_peak():
+    backend = CaptureBackend(realtime=False)
+    driver = get_audio(sample_rate=SAMPLE_RATE, backend=backend)
+    backend.clear()
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    quiet = (0.05 * np.sin(2 * np.pi * 300 * t)).astype(np.float32)
+    loud = (0.5 * np.sin(2 * np.pi * 300 * t)).astype(np.float32)
+
+    stream = driver.open_stream(SAMPLE_RATE)
+    stream.write(quiet)
+    # The loud part only arrives once the quiet start has been played
+    deadline = time.monotonic() + 2.0
+    while not backend.get_segments() or len(captured_stream(backend)) < SAMPLE_RATE:
+        assert time.monotonic() < deadline, "quiet start was never played"
+        time.sleep(0.01)
+    stream.write(loud)
+    stream.close()
+    stream.wait()
+
+    played = captured_stream(backend)
+    # The quiet start is boosted as far as the cap allows, the loud part is brought to full scale
+    assert np.abs(played[:SAMPLE_RATE]).max() == pytest.approx(0.05 * STREAM_MAX_GAIN * 32767, rel=0.01)
+    assert np.abs(played[SAMPLE_RATE:]).max() == pytest.approx(32767, rel=0.01)
@@ -0,0 +1,87 @@
+import numpy as np
+from ghostsnstuff_spiritbox_fw.hal.display import ST7735Display, ST7735_UPDATE_REGIONS, DISPLAY_SIZE
+from ghostsnstuff_spiritbox_fw.debug.fake_st7735 import FakeST7735
+
+# CASET and RASET with four parameter bytes each, then RAMWR
+WINDOW_SETUP_BYTES = 11
+
+
+def make_display():
+    panel = FakeST7735()
+    display = ST7735Display(device=panel)
+    rendered = []
+    render = display.renderer.render
+    display.renderer.render = lambda state: rendered.append(render(state).copy()) or rendered[-1]
+    return panel, display, rendered
+
+
+def window_bytes(window):
+    x0, y0, x1, y1 = window
+    return (x1 - x0 + 1) * (y1 - y0 + 1) * 2
+
+
+def assert_shows(panel, frame):
+    reference = FakeST7735()
+    reference.display(frame)
+    assert np.array_equal(panel.framebuffer, reference.framebuffer)
+
+
+def test_first_frame_is_sent_whole():
+    panel, display, rendered = make_display()
+    display._render()
+
+    assert panel.windows == [(0, 0, panel._width - 1, panel._height - 1)]
+    assert panel.pixel_bytes_sent == panel._width * panel._height * 2
+    assert panel.bytes_sent == panel.pixel_bytes_sent + WINDOW_SETUP_BYTES
+    assert display.bytes_sent == panel.pixel_bytes_sent
+    assert_shows(panel, rendered[-1])
+
+
+def test_unchanged_frame_is_not_sent():
+    panel, display, _ = make_display()
+    display._render()
+    bytes_sent = panel.bytes_sent
+
+    display._render()
+    assert panel.bytes_sent == bytes_sent
+    assert len(panel.windows) == 1
+    assert display.frames_skipped == 1
+
+
+def test_only_the_changed_region_is_sent():
+    panel, display, rendered = make_display()
+    display._render()
+    panel.windows.clear()
+    panel.bytes_sent = panel.pixel_bytes_sent = 0
+
+    display.set_text("HELLO")
+    display._render()
+
+    # The text line is below the icons, which stay untouched
+    left, top, right, bottom = ST7735_UPDATE_REGIONS[1]
+    text_region = display._regions[1]
+    assert len(panel.windows) == 1
+    x0, y0, x1, y1 = panel.windows[0]
+    assert text_region[1].start <= x0 <= x1 < text_region[1].stop
+    assert text_region[0].start <= y0 <= y1 < text_region[0].stop
+    assert window_bytes(panel.windows[0]) < (right - left) * (bottom - top) * 2
+    assert panel.pixel_bytes_sent == window_bytes(panel.windows[0])
+    assert panel.bytes_sent == panel.pixel_bytes_sent + WINDOW_SETUP_BYTES
+    assert_shows(panel, rendered[-1])
+
+
+def test_partial_updates_keep_the_panel_in_sync():
+    panel, display, rendered = make_display()
+    full_frame_bytes = DISPLAY_SIZE[0] * DISPLAY_SIZE[1] * 2
+    display.set_text("THE ANSWER IS IN THE BASEMENT")
+    display._sweep_enabled = True
+    for tick in range(60):
+        display._text_ticks = tick
+        display._sweep_value = round(63 + tick / 10, 1)
+        display._mic_active = tick % 20 < 10
+        display._render()
+        assert_shows(panel, rendered[-1])
+
+    assert display.frames_sent + display.frames_skipped == 60
+    assert panel.pixel_bytes_sent < full_frame_bytes * 60
+    assert sum(window_bytes(window) for window in panel.windows) == panel.pixel_bytes_sent
@@ -0,0 +1,92 @@
+import os
+import numpy as np
+from ghostsnstuff_spiritbox_fw.speech import TTSCache
+
+
+def pcm(samples: int, value: int = 1) -> bytes:
+    return np.full(samples, value, dtype=np.int16).tobytes()
+
+
+def test_round_trip(tmp_path):
+    cache = TTSCache(tmp_path, max_bytes=1024)
+    cache.put("a", pcm(4, 7))
+    assert np.array_equal(cache.get("a"), np.full(4, 7, dtype=np.int16))
+    assert cache.get("b") is None
+    assert cache.get_stats()["hits"] == 1
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = TTSCache(tmp_path, max_bytes=250)
+    cache.put("a", pcm(50))
+    cache.put("b", pcm(50))
+    cache.get("a")
+    cache.put("c", pcm(50))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert not (tmp_path / "b.pcm").exists()
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["size_bytes"] == 200
+
+
+def test_entries_larger_than_the_cache_are_not_stored(tmp_path):
+    cache = TTSCache(tmp_path, max_bytes=100)
+    cache.put("a", pcm(51))
+    assert cache.get("a") is None
+    assert cache.get_stats()["size_bytes"] == 0
+
+
+def test_size_cap_applies_to_existing_files(tmp_path):
+    for index, key in enumerate(("old", "middle", "new")):
+        (tmp_path / f"{key}.pcm").write_bytes(pcm(50))
+        os.utime(tmp_path / f"{key}.pcm", (1000 + index, 1000 + index))
+
+    cache = TTSCache(tmp_path, max_bytes=200)
+    assert cache.get("old") is None
+    assert cache.get("middle") is not None
+    assert cache.get("new") is not None
+    assert cache.get_stats()["size_bytes"] == 200
+
+
+def test_keys_differ_by_every_parameter():
+    keys = {
+        TTSCache.make_key("hello", "onyx", "tts-1-hd", 1.0),
+        TTSCache.make_key("hello", "alloy", "tts-1-hd", 1.0),
+        TTSCache.make_key("hello", "onyx", "tts-1", 1.0),
+        TTSCache.make_key("hello", "onyx", "tts-1-hd", 0.75),
+        TTSCache.make_key("hello ", "onyx", "tts-1-hd", 1.0),
+        # Fields are separated, so moving text from one field to the next changes the key
+        TTSCache.make_key("x\0hello", "onyx", "tts-1-hd", 1.0),
+        TTSCache.make_key("hello", "onyx\0x", "tts-1-hd", 1.0),
+    }
+    assert len(keys) == 7
+    assert TTSCache.make_key("hello", "onyx", "tts-1-hd", 1.0) == TTSCache.make_key("hello", "onyx", "tts-1-hd", 1.0001)
+
+
+def test_odd_length_file_is_dropped(tmp_path):
+    (tmp_path / "odd.pcm").write_bytes(b"\x01\x02\x03")
+    cache = TTSCache(tmp_path, max_bytes=1024)
+
+    assert cache.get("odd") is None
+    stats = cache.get_stats()
+    assert stats["entries"] == 0
+    assert stats["size_bytes"] == 0
+    assert stats["misses"] == 1
+
+
+def test_file_removed_behind_the_cache_is_dropped(tmp_path):
+    cache = TTSCache(tmp_path, max_bytes=1024)
+    cache.put("a", pcm(10))
+    (tmp_path / "a.pcm").unlink()
+
+    assert cache.get("a") is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_empty_entry(tmp_path):
+    cache = TTSCache(tmp_path, max_bytes=1024)
+    cache.put("a", b"")
+    assert len(cache.get("a")) == 0
@@ -0,0 +1,125 @@
+import time
+import types
+import numpy as np
+import soundfile as sf
+from ghostsnstuff_spiritbox_fw.server import Server, ServerConfig
+from ghostsnstuff_spiritbox_fw.hal.microphone import WavMicrophone
+
+SAMPLE_RATE = 16000
+
+
+class ScriptedMicrophone:
+    """Hands out (buffer, span) utterances; speech_start is what get_speech_start reports."""
+
+    def __init__(self, utterances):
+        self.utterances = list(utterances)
+        self.speech_start = None
+        self.in_progress = None  # Utterance that becomes available once waited for
+        self.timeouts = []
+        self._span = None
+
+    def await_buffer(self, timeout=None):
+        self.timeouts.append(timeout)
+        if not self.utterances and self.in_progress and timeout:
+            self.utterances.append(self.in_progress)
+            self.in_progress = self.speech_start = None
+        if not self.utterances:
+            return None
+        buffer, self._span = self.utterances.pop(0)
+        return buffer
+
+    def get_last_utterance_span(self):
+        return self._span
+
+    def get_speech_start(self):
+        return self.speech_start
+
+    def get_sample_rate(self):
+        return SAMPLE_RATE
+
+
+def server_for(mic) -> types.SimpleNamespace:
+    return types.SimpleNamespace(mic=mic, server_config=ServerConfig(), _next_turn_utterance=None)
+
+
+def await_turn(server) -> np.ndarray | None:
+    return Server._await_turn_audio(server)
+
+
+def utterance(value: float, start: float, end: float):
+    return np.full(int((end - start) * SAMPLE_RATE), value, dtype=np.float32), (start, end)
+
+
+def test_utterances_within_the_window_form_one_turn():
+    first, second = utterance(0.1, 0.0, 1.0), utterance(0.2, 1.5, 2.0)
+    server = server_for(ScriptedMicrophone([first, second]))
+
+    turn = await_turn(server)
+    gap = int(ServerConfig.utterance_coalesce_gap * SAMPLE_RATE)
+    assert np.array_equal(turn, np.concatenate([first[0], np.zeros(gap, dtype=np.float32), second[0]]))
+
+
+def test_later_utterance_opens_the_next_turn():
+    first, second = utterance(0.1, 0.0, 1.0), utterance(0.2, 1.0 + ServerConfig.utterance_coalesce_window + 0.1, 3.0)
+    mic = ScriptedMicrophone([first, second])
+    server = server_for(mic)
+
+    assert np.array_equal(await_turn(server), first[0])
+    assert server._next_turn_utterance is not None
+    assert np.array_equal(await_turn(server), second[0])
+    assert server._next_turn_utterance is None
+    # The held back utterance did not wait for the microphone
+    assert mic.timeouts == [None, 0, 0]
+
+
+def test_queued_utterances_are_taken_without_waiting():
+    mic = ScriptedMicrophone([utterance(0.1, 0.0, 1.0)])
+    start = time.monotonic()
+    await_turn(server_for(mic))
+    assert time.monotonic() - start < 0.1
+    assert mic.timeouts == [None, 0]
+
+
+def test_speech_in_progress_within_the_window_is_waited_for():
+    first = utterance(0.1, 0.0, 1.0)
+    mic = ScriptedMicrophone([first])
+    mic.speech_start = 1.4
+    mic.in_progress = utterance(0.2, 1.4, 2.5)
+
+    second = mic.in_progress
+    turn = await_turn(server_for(mic))
+    assert len(turn) == len(first[0]) + int(ServerConfig.utterance_coalesce_gap * SAMPLE_RATE) + len(second[0])
+    assert mic.timeouts[1] == ServerConfig.utterance_poll_interval
+
+
+def test_speech_starting_after_the_window_is_not_waited_for():
+    mic = ScriptedMicrophone([utterance(0.1, 0.0, 1.0)])
+    mic.speech_start = 1.0 + ServerConfig.utterance_coalesce_window + 0.5
+    mic.in_progress = utterance(0.2, mic.speech_start, 4.0)
+
+    await_turn(server_for(mic))
+    assert mic.timeouts == [None, 0]
+
+
+def voice(seconds: float) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    buzz = sum(np.sin(2 * np.pi * 130 * k * t) / k for k in range(1, 20))
+    return (0.3 * buzz / np.abs(buzz).max() * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))).astype(np.float32)
+
+
+def test_replayed_utterances_are_coalesced_by_capture_time(tmp_path):
+    silence = lambda seconds: np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    # Two phrases half a second apart, then one after a long pause
+    sf.write(tmp_path / "turns.wav", np.concatenate([voice(1.0), silence(0.5), voice(0.8), silence(1.6), voice(1.0)]), SAMPLE_RATE)
+    mic = WavMicrophone(tmp_path / "turns.wav", speed=None)
+    server = server_for(mic)
+    server.server_config.utterance_coalesce_window = 1.0
+    try:
+        first = await_turn(server)
+        second = await_turn(server)
+        assert await_turn(server) is None
+    finally:
+        mic.close()
+
+    assert 2.3 < len(first) / SAMPLE_RATE < 3.8
+    assert 0.9 < len(second) / SAMPLE_RATE < 1.6
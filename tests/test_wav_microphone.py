@@ -0,0 +1,101 @@
+import time
+import numpy as np
+import pytest
+import soundfile as sf
+from ghostsnstuff_spiritbox_fw.hal.microphone import WavMicrophone, get_microphone
+
+SAMPLE_RATE = 16000
+TRAILING_SILENCE = 1.6  # Above the maximum hangover, so each file still ends its utterance
+
+
+def voice(seconds: float, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    buzz = sum(np.sin(2 * np.pi * 130 * k * t) / k for k in range(1, 20) if 130 * k < sample_rate / 2)
+    return (0.3 * buzz / np.abs(buzz).max() * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))).astype(np.float32)
+
+
+def write_voice(path, seconds: float, sample_rate: int = SAMPLE_RATE):
+    sf.write(path, voice(seconds, sample_rate), sample_rate)
+    return path
+
+
+def replay_all(mic: WavMicrophone, count: int | None = None) -> list:
+    """Collects utterances until the replay finishes, or until count were taken."""
+    utterances = []
+    try:
+        while count is None or len(utterances) < count:
+            buffer = mic.await_buffer(timeout=10)
+            if buffer is None:
+                break
+            utterances.append(buffer)
+    finally:
+        mic.close()
+    return utterances
+
+
+def seconds(buffer: np.ndarray) -> float:
+    return len(buffer) / SAMPLE_RATE
+
+
+def test_single_file_is_one_utterance(tmp_path):
+    mic = WavMicrophone(write_voice(tmp_path / "one.wav", 1.0), speed=None, trailing_silence_seconds=TRAILING_SILENCE)
+    buffer = mic.await_buffer(timeout=10)
+    assert 0.9 < seconds(buffer) < 1.6
+    assert mic.await_buffer(timeout=1) is None
+    assert mic.finished and mic.files_played == 1
+    mic.close()
+
+
+def test_playlist_is_replayed_in_order(tmp_path):
+    write_voice(tmp_path / "short.wav", 0.6)
+    write_voice(tmp_path / "long.wav", 1.5)
+    playlist = tmp_path / "session.m3u"
+    playlist.write_text("# recorded session\nlong.wav\n\nshort.wav\n")
+
+    mic = WavMicrophone(playlist, speed=None, trailing_silence_seconds=TRAILING_SILENCE)
+    assert mic.files == [tmp_path / "long.wav", tmp_path / "short.wav"]
+    first, second = replay_all(mic)
+    assert seconds(first) > seconds(second)
+    assert mic.files_played == 2
+
+
+def test_directory_and_list_sources(tmp_path):
+    paths = [write_voice(tmp_path / name, 0.6) for name in ("b.wav", "a.wav")]
+    (tmp_path / "notes.txt").write_text("not audio")
+    assert WavMicrophone(tmp_path).files == [tmp_path / "a.wav", tmp_path / "b.wav"]
+    assert WavMicrophone([str(path) for path in paths]).files == paths
+
+
+def test_loop_replays_the_playlist_again(tmp_path):
+    mic = WavMicrophone(write_voice(tmp_path / "one.wav", 0.6), speed=None, loop=True, trailing_silence_seconds=TRAILING_SILENCE)
+    utterances = replay_all(mic, count=3)
+    assert len(utterances) == 3
+    assert mic.files_played >= 2
+    assert not mic.finished
+
+
+@pytest.mark.parametrize("sample_rate", [8000, 44100])
+def test_other_sample_rates_are_resampled(tmp_path, sample_rate):
+    path = tmp_path / f"voice_{sample_rate}.wav"
+    sf.write(path, np.stack([voice(1.0, sample_rate)] * 2, axis=1), sample_rate)  # Stereo is mixed down too
+    mic = WavMicrophone(path, speed=None, trailing_silence_seconds=TRAILING_SILENCE)
+    assert len(mic._load(path)) == int((1.0 + TRAILING_SILENCE) * SAMPLE_RATE)
+    (buffer,) = replay_all(mic)
+    assert 0.9 < seconds(buffer) < 1.6
+
+
+def test_speed_paces_the_replay(tmp_path):
+    mic = WavMicrophone(write_voice(tmp_path / "one.wav", 1.0), speed=4.0, trailing_silence_seconds=TRAILING_SILENCE)
+    start = time.monotonic()
+    replay_all(mic)
+    # 2.6 seconds of audio at four times real time
+    assert time.monotonic() - start > 0.6
+
+
+def test_nothing_to_replay(tmp_path):
+    with pytest.raises(ValueError):
+        WavMicrophone(tmp_path)
+    empty = tmp_path / "empty.m3u"
+    empty.write_text("# nothing yet\n")
+    with pytest.raises(ValueError):
+        get_microphone(empty)